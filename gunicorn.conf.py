@@ -0,0 +1,34 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# По умолчанию - WSGI с sync-воркерами: основные страницы синхронные, и под ASGI они выполнялись бы
+# по одному в потоке каждого воркера. GUNICORN_ASGI=1 - ASGI-развертывание (uvicorn) для страниц /async/
+ASGI = os.environ.get('GUNICORN_ASGI', '') == '1'
+
+wsgi_app = 'tp_kurs.asgi:application' if ASGI else 'tp_kurs.wsgi:application'
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn_worker.UvicornWorker' if ASGI else 'sync')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+
+# Метрики prometheus_client в режиме нескольких процессов: воркеры пишут значения в mmap-файлы этого каталога,
+# и /metrics любого воркера отдает сумму по всем. Переменная задается до загрузки приложения в воркерах
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'students_scores_metrics'))
+
+
+def on_starting(server):
+    # Файлы прошлого запуска иначе попали бы в счетчики
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR)
+    if workers > 1 and not os.environ.get('REDIS_URL') and not os.environ.get('CACHE_BACKEND'):
+        # Без общего кэша у каждого воркера свой LocMemCache, и инвалидация не доходит до остальных
+        server.log.warning('REDIS_URL не задан: кэш не общий для %s воркеров', workers)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,4 +1,10 @@
-import random
+import argparse
+import csv
+import json
+import sys
+from math import gcd
+from typing import Iterator, List, Tuple
+import numpy as np
 import yaml
 
 # Список русских фамилий и имен
@@ -35,7 +41,7 @@ names = [
     "Фёдорова Надежа", "Дмитриева Александра", "Егорова Анастасия", "Ковалёва Екатерина", "Кузьмина Ксения",
     "Макарова Елена", "Мельникова Анастасия", "Назарова Екатерина", "Орлова Елена", "Павлова Анастасия",
     "Панова Екатерина", "Панфилова Дарьяна", "Петрова Екатерина", "Попова Елена", "Потапова Анастасия",
-    "Прокофьева Екатерина", "Родионова Елена","Щукина Екатерина", "Щукина Елена", "Щукина Анна"
+    "Прокофьева Екатерина", "Родионова Елена","Щукина Екатерина", "Щукина Елена", "Щукина Анна",
     "Романова Анастасия", "Рыжова Елена", "Савельева Анастасия", "Семёнова Дарьяна", "Сергеева Елена",
     "Соколова Екатерина", "Смирнова Дарьяна", "Тарасова Елена", "Тихонова Екатерина", "Толстова Дарьяна",
     "Трофимова Екатерина", "ТуроваСофия", "Тюменева Елена", "Уварова Екатерина", "Усманова Анастасия",
@@ -56,45 +62,154 @@ disciplines = [
     "Системная инжеренерия"
 ]
 
-def generate_data(num_records):
-    data = []
-    student_disciplines = {}
+# Размер блока, для которого баллы генерируются одним вызовом numpy
+SCORE_BLOCK = 65536
 
-    for _ in range(num_records):
-        name = random.choice(names)
-        if name not in student_disciplines:
-            student_disciplines[name] = set()
 
-        # Выбираем дисциплину, которая еще не была назначена этому студенту
-        available_disciplines = [d for d in disciplines if d not in student_disciplines[name]]
-        if not available_disciplines:
-            continue  # Если все дисциплины уже назначены, пропускаем эту итерацию
+# Генератор воспроизводим: одинаковые параметры и seed дают одинаковые данные.
+# Пары (name, discipline) уникальны: номер записи i переводится в номер пары (a * i + b) mod M,
+# где M = число студентов * число дисциплин, а a взаимно просто с M (перестановка без повторов).
+class DataGenerator:
+    def __init__(self, num_records: int, seed: int = 0, num_names: int = None, num_disciplines: int = None,
+                 debt_ratio: float = 0.1, distribution: str = 'uniform', mean: float = 80, std: float = 10):
+        base_names = list(dict.fromkeys(names))
+        self.disciplines = list(dict.fromkeys(disciplines))[:num_disciplines or None]
+        if num_names is None:
+            num_names = max(len(base_names), -(-num_records // len(self.disciplines)))
+        self.names = make_names(base_names, num_names)
+        self.pairs = len(self.names) * len(self.disciplines)
+        if num_records > self.pairs:
+            raise ValueError(f'Нельзя сгенерировать {num_records} уникальных пар из {self.pairs}')
+        if distribution not in ('uniform', 'normal'):
+            raise ValueError(f'{distribution} - неизвестное распределение')
 
-        discipline = random.choice(available_disciplines)
-        score = random.randint(61, 100)
+        self.num_records = num_records
+        self.seed = seed
+        self.debt_ratio = debt_ratio
+        self.distribution = distribution
+        self.mean = mean
+        self.std = std
 
-        record = {
-            "-model": "students_scores.student",
+    def batches(self, batch_size: int = 100000) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        # Возвращает пакеты (индексы студентов, индексы дисциплин, баллы) в виде массивов numpy
+        rng = np.random.default_rng(self.seed)
+        step = int(rng.integers(1, self.pairs)) if self.pairs > 1 else 1
+        while gcd(step, self.pairs) != 1:
+            step += 1
+        offset = int(rng.integers(0, self.pairs))
+
+        for start in range(0, self.num_records, batch_size):
+            end = min(start + batch_size, self.num_records)
+            index = np.arange(start, end, dtype=np.int64)
+            pair = (index * step + offset) % self.pairs
+            name_codes, discipline_codes = np.divmod(pair, len(self.disciplines))
+            yield name_codes, discipline_codes, self.sample_scores(start, end)
+
+    def sample_scores(self, start: int, end: int) -> np.ndarray:
+        # Баллы генерируются блоками фиксированного размера со своим seed,
+        # поэтому результат не зависит от размера пакета
+        parts = []
+        for block in range(start // SCORE_BLOCK, (end - 1) // SCORE_BLOCK + 1):
+            block_start = block * SCORE_BLOCK
+            scores = self.sample_block(block, min(SCORE_BLOCK, self.num_records - block_start))
+            parts.append(scores[max(start - block_start, 0):end - block_start])
+        return np.concatenate(parts)
+
+    def sample_block(self, block: int, size: int) -> np.ndarray:
+        rng = np.random.default_rng([self.seed, block])
+        if self.distribution == 'normal':
+            scores = np.clip(np.rint(rng.normal(self.mean, self.std, size)), 61, 100)
+        else:
+            scores = rng.integers(61, 101, size)
+        # Доля должников получает баллы 20-60
+        debts = rng.random(size) < self.debt_ratio
+        scores[debts] = rng.integers(20, 61, int(debts.sum()))
+        return scores.astype(np.int64)
+
+    def records(self, batch_size: int = 100000) -> Iterator[Tuple[str, str, int]]:
+        for name_codes, discipline_codes, scores in self.batches(batch_size):
+            for name_code, discipline_code, score in zip(name_codes.tolist(), discipline_codes.tolist(),
+                                                         scores.tolist()):
+                yield self.names[name_code], self.disciplines[discipline_code], score
+
+
+def make_names(base_names: List[str], count: int) -> List[str]:
+    # Если реальных имен не хватает, добавляем к ним номер: "Иванов Андрей 2"
+    result = base_names[:count]
+    index = len(result)
+    while len(result) < count:
+        result.append(f'{base_names[index % len(base_names)]} {index // len(base_names) + 1}')
+        index += 1
+    return result
+
+
+def write_csv(records, file):
+    writer = csv.writer(file)
+    writer.writerow(('name', 'discipline', 'score'))
+    writer.writerows(records)
+
+
+def write_ndjson(records, file):
+    for name, discipline, score in records:
+        file.write(json.dumps({'name': name, 'discipline': discipline, 'score': score}, ensure_ascii=False) + '\n')
+
+
+def generate_data(num_records, **kwargs):
+    return to_fixture(DataGenerator(num_records, **kwargs).records())
+
+
+def to_fixture(records):
+    return [
+        {
+            "model": "students_scores.student",
             "fields": {
                 "name": name,
                 "discipline": discipline,
                 "score": score
             }
         }
-        data.append(record)
-
-        # Добавляем дисциплину к списку уже назначенных для этого студента
-        student_disciplines[name].add(discipline)
+        for name, discipline, score in records
+    ]
 
-    return data
 
 def write_to_yaml(data, filename):
     with open(filename, 'w', encoding='utf-8') as file:
         yaml.dump(data, file, allow_unicode=True)
 
-# Генерируем 10 записей и записываем их в файл
-num_records = 10000
-data = generate_data(num_records)
-write_to_yaml(data, 'fixtures/students_scores.yaml')
 
-print(f"Сгенерировано {num_records} записей и записано в файл 'students_scores.yaml'")
\ No newline at end of file
+def add_arguments(parser):
+    parser.add_argument('--records', type=int, default=10000, help='Количество записей')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--names', type=int, help='Число различных студентов')
+    parser.add_argument('--disciplines', type=int, help='Число различных дисциплин')
+    parser.add_argument('--debt-ratio', type=float, default=0.1, help='Доля оценок ниже 61')
+    parser.add_argument('--distribution', choices=('uniform', 'normal'), default='uniform')
+    parser.add_argument('--mean', type=float, default=80)
+    parser.add_argument('--std', type=float, default=10)
+    parser.add_argument('--batch-size', type=int, default=100000)
+
+
+def create_generator(options) -> DataGenerator:
+    return DataGenerator(options['records'], seed=options['seed'], num_names=options['names'],
+                         num_disciplines=options['disciplines'], debt_ratio=options['debt_ratio'],
+                         distribution=options['distribution'], mean=options['mean'], std=options['std'])
+
+
+if __name__ == '__main__':
+    # python DataGenerator.py --records 10000 --format yaml --output fixtures/students_scores.yaml
+    parser = argparse.ArgumentParser(description='Генерация синтетических оценок студентов')
+    add_arguments(parser)
+    parser.add_argument('--format', choices=('csv', 'ndjson', 'yaml'), default='csv')
+    parser.add_argument('--output', default='-', help='Файл для записи или "-" для stdout')
+    options = vars(parser.parse_args())
+
+    generator = create_generator(options)
+    if options['format'] == 'yaml':
+        write_to_yaml(to_fixture(generator.records(options['batch_size'])), options['output'])
+    else:
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8', newline='')
+        writer = write_csv if options['format'] == 'csv' else write_ndjson
+        writer(generator.records(options['batch_size']), output)
+        if output is not sys.stdout:
+            output.close()
+    print(f"Сгенерировано {options['records']} записей", file=sys.stderr)
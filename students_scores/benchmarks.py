@@ -0,0 +1,217 @@
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import django
+import numpy as np
+from django.core.cache import cache as django_cache
+from django.db import connection, OperationalError
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from . import ranking, score_matrix, search, snapshot, stats, views
+from .DataGenerator import DataGenerator
+from .management.commands.generate_scores import load_generated
+from .models import Student, StudentWithDebts, ScoreSummary
+
+# Набор замеров: представления, источники статистики и синхронизация должников на данных заданного размера.
+# Для каждого случая - перцентили задержки, число запросов и пиковая память (tracemalloc) одного вызова
+
+Case = Tuple[Optional[Callable], Callable]
+
+
+def reset_process_state():
+    # Кэши процесса, которые иначе пережили бы откат транзакции с тестовыми данными
+    django_cache.clear()
+    score_matrix.clear_matrices()
+    ranking.clear_leaderboard()
+    search.clear_indexes()
+    snapshot.clear_snapshot()
+
+
+def clear_tables(*models):
+    # Очистка одним DELETE: queryset.delete() отправил бы post_delete для каждой строки
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+
+
+def seed_students(rows: int, seed: int = 0, batch_size: int = 10000) -> DataGenerator:
+    # Данные генерируются так же, как командой generate_scores --format db
+    clear_tables(Student, StudentWithDebts)
+    generator = DataGenerator(rows, seed=seed)
+    load_generated(generator, batch_size)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Student._meta.db_table}')
+    return generator
+
+
+def measure(function: Callable, setup: Optional[Callable], repeat: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        if setup:
+            setup()
+        function()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Отдельный прогон с подсчетом запросов и памяти, чтобы инструментирование не искажало время
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+            'mean_ms': float(np.mean(timings)), 'min_ms': float(np.min(timings)),
+            'queries': len(queries), 'peak_kb': peak / 1024, 'repeat': repeat}
+
+
+def view_case(view: Callable, path: str, calls: List[Tuple[dict, tuple]]) -> Case:
+    # calls - пары (GET-параметры, позиционные аргументы представления), перебираются по кругу
+    factory = RequestFactory()
+    position = [0]
+
+    def run():
+        params, args = calls[position[0] % len(calls)]
+        position[0] += 1
+        response = view(factory.get(path, params), *args)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path}: HTTP {response.status_code}')
+
+    # Страницы замеряются без кэша: он очищается перед каждым вызовом
+    return reset_page_cache, run
+
+
+def reset_page_cache():
+    django_cache.clear()
+
+
+def stats_case(backend: str, kind: str, keys: List[str]) -> Case:
+    calculator = stats.STATS_BACKENDS[backend]()
+    position = [0]
+
+    def run():
+        key = keys[position[0] % len(keys)]
+        position[0] += 1
+        calculator.calculate_group_stats(kind, key)
+
+    return None, run
+
+
+def get_table_sizes(models: Iterable) -> Dict[str, dict]:
+    # Размер данных таблицы и ее индексов в байтах. На SQLite - по виртуальной таблице dbstat
+    # (учитывает и незафиксированные страницы текущей транзакции); без нее размеры не считаются
+    sizes = {}
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_table_size(%s), pg_indexes_size(%s)', [table, table])
+                table_bytes, index_bytes = cursor.fetchone()
+            elif connection.vendor == 'sqlite':
+                try:
+                    cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [table])
+                    table_bytes = cursor.fetchone()[0] or 0
+                    cursor.execute("SELECT SUM(d.pgsize) FROM dbstat d JOIN sqlite_master m ON m.name = d.name "
+                                   "WHERE m.type = 'index' AND m.tbl_name = %s", [table])
+                    index_bytes = cursor.fetchone()[0] or 0
+                except OperationalError:
+                    return {}
+            else:
+                return {}
+            sizes[table] = {'table_bytes': int(table_bytes), 'index_bytes': int(index_bytes),
+                            'rows': model.objects.count()}
+    return sizes
+
+
+def build_cases(samples: int, seed: int) -> Dict[str, Case]:
+    rng = random.Random(seed)
+
+    def sample_keys(kind: str) -> List[str]:
+        keys = ScoreSummary.objects.filter(kind=kind).order_by('key').values_list('key', flat=True)
+        keys = list(keys[:samples * 20])
+        return rng.sample(keys, k=min(samples, len(keys)))
+
+    names = sample_keys(ScoreSummary.KIND_STUDENT)
+    disciplines = sample_keys(ScoreSummary.KIND_DISCIPLINE)
+    cases = {
+        'view:index': view_case(views.index, '/', [({}, ())]),
+        'view:student_info': view_case(views.student_info_page, '/student_info/',
+                                       [({'student': name}, ()) for name in names]),
+        'view:discipline_info': view_case(views.discipline_info_page, '/discipline_info/',
+                                          [({'discipline': discipline}, ()) for discipline in disciplines]),
+        'view:students_with_debts': view_case(views.list_students_with_debts, '/students_with_debts/', [({}, ())]),
+        'view:api_student_stats': view_case(views.api_student_stats, '/api/students/stats',
+                                            [({}, (name,)) for name in names]),
+        'view:api_ranking': view_case(views.api_ranking, '/api/ranking/students', [({'top': 10}, ())]),
+    }
+    for backend in stats.STATS_BACKENDS:
+        cases[f'stats:{backend}:student'] = stats_case(backend, ScoreSummary.KIND_STUDENT, names)
+        cases[f'stats:{backend}:discipline'] = stats_case(backend, ScoreSummary.KIND_DISCIPLINE, disciplines)
+
+    # Подсказки по первым буквам фамилии, как при вводе; индекс строится при прогреве
+    prefixes = [name[:length] for name in names for length in (1, 3, 5)]
+    cases['view:api_search'] = view_case(views.api_search, '/api/search', [({'q': prefix}, ()) for prefix in prefixes])
+
+    cases['debts:sync_full'] = (lambda: clear_tables(StudentWithDebts), views.update_students_with_debts)
+    cases['debts:sync_noop'] = (None, views.update_students_with_debts)
+    return cases
+
+
+def run_suite(rows: int, repeat: int = 20, warmup: int = 2, seed: int = 0, samples: int = 10,
+              only: Iterable[str] = ()) -> dict:
+    # Вызывается внутри транзакции, которую вызывающий код откатывает
+    reset_process_state()
+    started = time.perf_counter()
+    seed_students(rows, seed)
+    seed_seconds = time.perf_counter() - started
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, override_settings(SNAPSHOT_DIR=directory):
+        snapshot.write_snapshot(directory)
+        for name, (setup, function) in build_cases(samples, seed).items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            results[name] = measure(function, setup, repeat, warmup)
+        reset_process_state()
+    sizes = get_table_sizes((Student, StudentWithDebts))
+    return {'vendor': connection.vendor, 'rows': rows, 'seed_seconds': seed_seconds, 'sizes': sizes,
+            'cases': results}
+
+
+def get_environment() -> dict:
+    return {'python': platform.python_version(), 'django': django.get_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'processor': platform.processor() or platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float = 1.0) -> List[str]:
+    # Регрессия: медиана выросла больше чем на threshold (и больше чем на min_delta_ms - против шума
+    # на быстрых случаях) или выросло число запросов. Сравниваются только прогоны с той же СУБД и размером
+    base_runs = {(run['vendor'], run['rows']): run['cases'] for run in baseline.get('runs', [])}
+    regressions = []
+    for run in results['runs']:
+        base_cases = base_runs.get((run['vendor'], run['rows']))
+        if base_cases is None:
+            continue
+        for name, case in run['cases'].items():
+            base = base_cases.get(name)
+            if base is None:
+                continue
+            label = f"{run['vendor']}/{run['rows']}/{name}"
+            if case['p50_ms'] > base['p50_ms'] * (1 + threshold) and case['p50_ms'] - base['p50_ms'] > min_delta_ms:
+                regressions.append(f"{label}: p50 {base['p50_ms']:.2f} -> {case['p50_ms']:.2f} мс")
+            if case['queries'] > base['queries']:
+                regressions.append(f"{label}: запросов {base['queries']} -> {case['queries']}")
+    return regressions
@@ -0,0 +1,154 @@
+import hashlib
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from . import metrics
+from .lru import LRUCache
+
+# Типы закэшированных данных; для каждого объекта (студент, дисциплина, вся таблица)
+# хранится номер версии, который входит в ключи записей. Инвалидация = смена версии,
+# поэтому при изменении одного студента вытесняются только его записи. Версии должны быть видны
+# всем процессам, поэтому в развертывании кэш - общий Redis (REDIS_URL, settings.CACHES)
+KIND_STUDENT = 'student'
+KIND_DISCIPLINE = 'discipline'
+KIND_INDEX = 'index'
+KIND_DEBTS = 'debts'
+
+
+# LRU в памяти процесса перед общим кэшем: при попадании не нужно ни обращения к Redis, ни распаковки.
+# Ключ включает версию данных (DataVersion), которую запрос уже прочитал для ETag; поколение увеличивается
+# после фиксации транзакции записи, поэтому после любой записи в Student старые значения не выдаются
+local_cache = LRUCache(max_size=getattr(settings, 'STUDENTS_LOCAL_CACHE_SIZE', 1024),
+                       ttl=getattr(settings, 'STUDENTS_LOCAL_CACHE_TTL', 60))
+
+
+def get_cache():
+    return caches[getattr(settings, 'STUDENTS_CACHE_ALIAS', 'default')]
+
+
+def normalize(value) -> str:
+    # "  Петров   Иван " и "Петров Иван" - один и тот же ключ
+    return ' '.join(str(value).split())
+
+
+def _entity_key(kind: str, key: str) -> str:
+    digest = hashlib.md5(normalize(key).encode('utf-8')).hexdigest()
+    return f'students_scores:{kind}:{digest}'
+
+
+def _version_key(kind: str, key: str = '') -> str:
+    return _entity_key(kind, key) + ':version'
+
+
+# Общая версия входит в ключи всех записей: массовые загрузки сбрасывают весь кэш одним incr
+GLOBAL_VERSION_KEY = _version_key('all')
+
+
+def get_versions(kind: str, key: str = '') -> Tuple[int, int]:
+    # Общая версия и версия объекта одним обращением к кэшу
+    cache = get_cache()
+    version_key = _version_key(kind, key)
+    versions = cache.get_many([GLOBAL_VERSION_KEY, version_key])
+    for missing in {GLOBAL_VERSION_KEY, version_key} - versions.keys():
+        # Начальная версия от времени: если ключ версии вытеснен, старые записи не оживут
+        cache.add(missing, time.time_ns(), None)
+        versions[missing] = cache.get(missing, 0)
+    return versions[GLOBAL_VERSION_KEY], versions[version_key]
+
+
+async def aget_versions(kind: str, key: str = '') -> Tuple[int, int]:
+    cache = get_cache()
+    version_key = _version_key(kind, key)
+    versions = await cache.aget_many([GLOBAL_VERSION_KEY, version_key])
+    for missing in {GLOBAL_VERSION_KEY, version_key} - versions.keys():
+        await cache.aadd(missing, time.time_ns(), None)
+        versions[missing] = await cache.aget(missing, 0)
+    return versions[GLOBAL_VERSION_KEY], versions[version_key]
+
+
+def _bump(version_key: str):
+    cache = get_cache()
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, time.time_ns(), None)
+
+
+def invalidate(kind: str, key: str = ''):
+    # Вызывается после фиксации транзакции (transaction.on_commit): иначе параллельный запрос
+    # успеет закэшировать еще старые данные под новой версией
+    _bump(_version_key(kind, key))
+
+
+def invalidate_all():
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def invalidate_students(names: Iterable[str] = (), disciplines: Iterable[str] = ()):
+    for name in set(names):
+        invalidate(KIND_STUDENT, name)
+    for discipline in set(disciplines):
+        invalidate(KIND_DISCIPLINE, discipline)
+    invalidate(KIND_INDEX)
+
+
+def _count(kind: str, hit: bool):
+    metrics.registry.cache.labels(kind, 'hits' if hit else 'misses').inc()
+
+
+def _local_get(kind: str, local_key: Optional[Tuple]):
+    if local_key is None:
+        return None
+    value = local_cache.get(local_key)
+    metrics.registry.local_cache.labels(kind, 'misses' if value is None else 'hits').inc()
+    return value
+
+
+def _local_set(kind: str, local_key: Optional[Tuple], value):
+    if local_key is not None:
+        metrics.registry.local_cache.labels(kind, 'evictions').inc(local_cache.set(local_key, value))
+
+
+def get_or_compute(kind: str, key: str, part: str, compute: Callable, data_version: Optional[Tuple] = None):
+    # data_version - версия данных, уже прочитанная запросом; только с ней используется LRU процесса
+    local_key = (kind, normalize(key), part, data_version) if data_version is not None else None
+    value = _local_get(kind, local_key)
+    if value is not None:
+        return value
+    cache = get_cache()
+    global_version, version = get_versions(kind, key)
+    cache_key = f'{_entity_key(kind, key)}:{global_version}:{version}:{part}'
+    value = cache.get(cache_key)
+    hit = value is not None
+    if not hit:
+        value = compute()
+        cache.set(cache_key, value, getattr(settings, 'STUDENTS_CACHE_TIMEOUT', 300))
+    _count(kind, hit)
+    _local_set(kind, local_key, value)
+    return value
+
+
+async def aget_or_compute(kind: str, key: str, part: str, compute: Callable[[], Awaitable],
+                          data_version: Optional[Tuple] = None):
+    # То же для асинхронных обработчиков: compute - корутина, записи общие с синхронными страницами
+    local_key = (kind, normalize(key), part, data_version) if data_version is not None else None
+    value = _local_get(kind, local_key)
+    if value is not None:
+        return value
+    cache = get_cache()
+    global_version, version = await aget_versions(kind, key)
+    cache_key = f'{_entity_key(kind, key)}:{global_version}:{version}:{part}'
+    value = await cache.aget(cache_key)
+    hit = value is not None
+    if not hit:
+        value = await compute()
+        await cache.aset(cache_key, value, getattr(settings, 'STUDENTS_CACHE_TIMEOUT', 300))
+    _count(kind, hit)
+    _local_set(kind, local_key, value)
+    return value
+
+
+def get_counters() -> Dict[str, Dict[str, int]]:
+    # Сумма по всем воркерам, как и остальные метрики
+    return metrics.registry.cache_counters()
@@ -0,0 +1,147 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Generic, List, Optional, Set, Tuple, TypeVar
+from django.conf import settings
+from django.db import connection, connections, transaction
+from .data_version import bump_data_generation, get_data_version
+from .models import DataChange
+
+logger = logging.getLogger('students_scores.changes')
+
+FIELDS = ('name', 'discipline', 'score')
+# Как часто (в поколениях) удаляются старые строки журнала
+PRUNE_EVERY = 100
+
+T = TypeVar('T')
+
+
+def log_change(old: Optional[dict], new: Optional[dict]) -> DataChange:
+    # Вызывается сигналами в транзакции записи: изменение фиксируется вместе с данными
+    values = {f'old_{field}': old[field] for field in FIELDS} if old else {}
+    values.update({f'new_{field}': new[field] for field in FIELDS} if new else {})
+    return DataChange.objects.create(**values)
+
+
+def assign_generation(change: DataChange) -> Tuple[int, datetime]:
+    # После фиксации: новое поколение и его изменение в одной короткой транзакции - кто видит
+    # поколение, тот видит и изменение, которое к нему привело
+    with transaction.atomic():
+        version = bump_data_generation()
+        DataChange.objects.filter(pk=change.pk).update(generation=version[0])
+    if version[0] % PRUNE_EVERY == 0:
+        DataChange.objects.filter(generation__lte=version[0] - settings.DATA_CHANGES_KEEP).delete()
+    return version
+
+
+def change_values(change: DataChange, prefix: str) -> Optional[dict]:
+    if getattr(change, f'{prefix}_name') is None:
+        return None
+    return {field: getattr(change, f'{prefix}_{field}') for field in FIELDS}
+
+
+def load_changes(since: int, until: int) -> Optional[List[DataChange]]:
+    # Изменения поколений (since, until] по порядку; None - если какого-то нет: массовая загрузка
+    # увеличивает поколение без строк журнала, старые строки удалены
+    if until - since > settings.DATA_CHANGES_KEEP:
+        return None
+    changes = list(DataChange.objects.filter(generation__gt=since, generation__lte=until).order_by('generation'))
+    return changes if len(changes) == until - since else None
+
+
+def read_snapshot(build: Callable[[], T]) -> Tuple[T, Set[int]]:
+    # Структура (вместе с версией, которую build читает первой) и изменения, уже попавшие в данные,
+    # но еще без поколения, читаются одним снимком БД. Такие изменения потом не применяются повторно
+    outer = connection.in_atomic_block
+    with transaction.atomic():
+        if connection.vendor == 'postgresql' and not outer:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        pending = set(DataChange.objects.filter(generation__isnull=True).values_list('pk', flat=True))
+        return build(), pending
+
+
+class LiveStructure(Generic[T]):
+    # Структура в памяти процесса (матрица, рейтинг, индекс), которая следует за версией данных.
+    # Изменения всех процессов применяются на месте по журналу DataChange; если журнал неполон,
+    # структура перестраивается в фоновом потоке, а до конца перестроения отдается последняя построенная.
+    # Синхронно строится только первая структура процесса.
+    # build читает версию данных первой и строит структуру с атрибутами version и _lock,
+    # apply(структура, old, new) применяет одно изменение
+    def __init__(self, build: Callable[[], T], apply: Callable[[T, Optional[dict], Optional[dict]], None]):
+        self.build = build
+        self.apply = apply
+        self.value: Optional[T] = None
+        self.skip: Set[int] = set()
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def get(self, version: Optional[Tuple] = None) -> T:
+        version = version or get_data_version()
+        value = self.value
+        if value is not None and self._is_current(value, version):
+            return value
+        if value is None:
+            with self._lock:
+                if self.value is None:
+                    self._replace(*read_snapshot(self.build))
+            value = self.value
+            if self._is_current(value, version):
+                return value
+        # Догоняет один поток, остальные тем временем отдают текущую структуру
+        if not self._lock.acquire(blocking=False):
+            return value
+        try:
+            if not self._catch_up(self.value, version):
+                self._rebuild()
+            return self.value
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _is_current(value, version: Tuple) -> bool:
+        # Структура новее версии, прочитанной запросом раньше, тоже подходит
+        return value.version is not None and (
+            value.version == version or (value.version[0] > version[0] and value.version[1] >= version[1]))
+
+    def _catch_up(self, value, version: Tuple) -> bool:
+        if self._is_current(value, version):
+            return True
+        if value.version is None or value.version[0] >= version[0]:
+            return False
+        changes = load_changes(value.version[0], version[0])
+        if changes is None:
+            return False
+        for change in changes:
+            if change.pk in self.skip:
+                self.skip.discard(change.pk)
+            else:
+                self.apply(value, change_values(change, 'old'), change_values(change, 'new'))
+        with value._lock:
+            # apply сбрасывает версию, если изменение нельзя применить на месте
+            if value.version is None:
+                return False
+            value.version = version
+        return True
+
+    def _replace(self, value: T, skip: Set[int]):
+        self.value, self.skip = value, skip
+
+    def _rebuild(self):
+        # Фоновый поток не увидит записей открытой транзакции, поэтому внутри нее (и в тестах) - синхронно
+        if connection.in_atomic_block:
+            self._replace(*read_snapshot(self.build))
+        elif not self._rebuilding:
+            self._rebuilding = True
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    def _rebuild_in_background(self):
+        try:
+            value, skip = read_snapshot(self.build)
+            with self._lock:
+                self._replace(value, skip)
+        except Exception:
+            logger.exception('Не удалось перестроить структуру в памяти')
+        finally:
+            self._rebuilding = False
+            connections.close_all()
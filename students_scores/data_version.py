@@ -0,0 +1,35 @@
+from typing import Tuple
+from datetime import datetime
+from django.db import connection
+from django.utils import timezone
+from .models import DataVersion
+
+
+def get_data_version() -> Tuple[int, datetime]:
+    # (поколение, время последнего изменения) одним запросом по первичному ключу
+    version = DataVersion.objects.filter(pk=1).values_list('generation', 'updated_at').first()
+    if version is None:
+        version = DataVersion.objects.get_or_create(pk=1)[0]
+        return version.generation, version.updated_at
+    return version
+
+
+def get_data_generation() -> int:
+    return get_data_version()[0]
+
+
+def bump_data_generation() -> Tuple[int, datetime]:
+    # Один UPDATE ... RETURNING. Сигналы Student вызывают его после фиксации транзакции (в автокоммите),
+    # поэтому строка блокируется на время одного оператора, а не всей транзакции записи
+    now = timezone.now()
+    table = connection.ops.quote_name(DataVersion._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'UPDATE {table} SET generation = generation + 1, updated_at = %s WHERE id = 1 '
+                       f'RETURNING generation', [now])
+        row = cursor.fetchone()
+    if row is None:
+        version, created = DataVersion.objects.get_or_create(pk=1, defaults={'generation': 1})
+        if not created:
+            return bump_data_generation()
+        return version.generation, version.updated_at
+    return row[0], now
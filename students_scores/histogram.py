@@ -0,0 +1,99 @@
+from typing import Dict, Iterable, List, Sequence
+import numpy as np
+from .models import DEBT_SCORE, MAX_SCORE
+
+# Баллы - целые числа 0-100, поэтому гистограмма из 101 ячейки хранит распределение без потерь:
+# перцентили по ней точные для групп любого размера, а гистограммы групп складываются поячеечно
+SCORE_BUCKETS = MAX_SCORE + 1
+
+# Диапазоны для гистограммы: задолженность и десятибалльные полосы 61-100
+SCORE_BANDS = ((0, 60), (61, 70), (71, 80), (81, 90), (91, 100))
+# Пороги оценок по 100-балльной шкале
+GRADES = (
+    ('неудовлетворительно', 0, 60),
+    ('удовлетворительно', 61, 75),
+    ('хорошо', 76, 90),
+    ('отлично', 91, 100),
+)
+
+
+class ScoreHistogram:
+    def __init__(self, counts: Sequence[int] = None):
+        self.counts = np.zeros(SCORE_BUCKETS, dtype=np.int64)
+        if counts is not None:
+            self._ensure_size(len(counts))
+            self.counts[:len(counts)] += np.asarray(counts, dtype=np.int64)
+
+    @classmethod
+    def from_scores(cls, scores: Iterable[int]) -> 'ScoreHistogram':
+        scores = np.asarray(list(scores), dtype=np.int64)
+        return cls(np.bincount(scores, minlength=SCORE_BUCKETS) if len(scores) else None)
+
+    @classmethod
+    def from_buckets(cls, buckets: Iterable) -> 'ScoreHistogram':
+        # buckets - пары (балл, количество)
+        histogram = cls()
+        for score, count in buckets:
+            histogram.add(score, count)
+        return histogram
+
+    def _ensure_size(self, size: int):
+        # Баллы выше 100 не ожидаются, но не теряются: массив просто расширяется
+        if size > len(self.counts):
+            self.counts = np.concatenate([self.counts, np.zeros(size - len(self.counts), dtype=np.int64)])
+
+    def add(self, score: int, count: int = 1):
+        self._ensure_size(score + 1)
+        self.counts[score] += count
+
+    def merge(self, other: 'ScoreHistogram') -> 'ScoreHistogram':
+        result = ScoreHistogram(self.counts)
+        result._ensure_size(len(other.counts))
+        result.counts[:len(other.counts)] += other.counts
+        return result
+
+    __add__ = merge
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def percentile(self, q: float) -> float:
+        # Совпадает с np.percentile(scores, q) (линейная интерполяция между соседними по рангу значениями)
+        n = self.total
+        if not n:
+            return float('nan')
+        position = (n - 1) * q / 100
+        lower, upper = int(np.floor(position)), int(np.ceil(position))
+        cumulative = np.cumsum(self.counts)
+        lower_value, upper_value = np.searchsorted(cumulative, [lower + 1, upper + 1])
+        return float(lower_value + (upper_value - lower_value) * (position - lower))
+
+    def percentiles(self, qs: Iterable[float]) -> Dict[str, float]:
+        return {f'p{q:g}': self.percentile(q) for q in qs}
+
+    def bands(self, bands=SCORE_BANDS) -> List[dict]:
+        return [{'from': low, 'to': high, 'count': int(self.counts[low:high + 1].sum())} for low, high in bands]
+
+    def grades(self) -> List[dict]:
+        return [{'grade': grade, 'from': low, 'to': high, 'count': int(self.counts[low:high + 1].sum())}
+                for grade, low, high in GRADES]
+
+    def debt_ratio(self) -> float:
+        n = self.total
+        return float(self.counts[:DEBT_SCORE].sum() / n) if n else 0.0
+
+    def describe(self, qs: Iterable[float] = ()) -> dict:
+        # Для пустой гистограммы квантили - None (null в JSON), а не NaN, который json.dumps
+        # записывает как недопустимый в JSON литерал
+        empty = not self.total
+        return {
+            'count': self.total,
+            'median': None if empty else self.percentile(50),
+            'q1': None if empty else self.percentile(25),
+            'q3': None if empty else self.percentile(75),
+            'percentiles': {name: None for name in self.percentiles(qs)} if empty else self.percentiles(qs),
+            'histogram': self.bands(),
+            'grades': self.grades(),
+            'debt_ratio': self.debt_ratio(),
+        }
@@ -0,0 +1,46 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class LRUCache:
+    # Потокобезопасный LRU-кэш в памяти процесса с ограничением по размеру и времени жизни записей
+    _missing = object()
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.get(key, self._missing)
+            if entry is self._missing:
+                return default
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value) -> int:
+        # Возвращает число вытесненных записей
+        if self.max_size <= 0:
+            return 0
+        evicted = 0
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
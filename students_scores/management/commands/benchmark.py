@@ -0,0 +1,77 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from students_scores.benchmarks import compare, get_environment, reset_process_state, run_suite
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Замеры представлений, источников статистики и синхронизации должников на синтетических данных: '
+            'перцентили задержки, число запросов и пиковая память. Данные вставляются в транзакции, '
+            'которая в конце откатывается. С --baseline завершается ошибкой при регрессии')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000], help='Размеры таблицы Student')
+        parser.add_argument('--repeat', type=int, default=20, help='Число замеряемых вызовов каждого случая')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--samples', type=int, default=10, help='Сколько разных студентов и дисциплин запрашивать')
+        parser.add_argument('--only', nargs='*', default=[], help='Префиксы случаев, например view: stats:matrix')
+        parser.add_argument('--output', default=None, help='Файл для результатов в JSON ("-" - stdout)')
+        parser.add_argument('--baseline', default=None, help='JSON с прошлыми результатами для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Допустимый рост медианы задержки относительно baseline (0.25 = 25%%)')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Рост медианы меньше этого значения не считается регрессией')
+
+    def handle(self, *args, **options):
+        results = {'environment': get_environment(), 'runs': []}
+        for rows in options['rows']:
+            try:
+                with transaction.atomic():
+                    results['runs'].append(run_suite(rows, repeat=options['repeat'], warmup=options['warmup'],
+                                                     seed=options['seed'], samples=options['samples'],
+                                                     only=options['only']))
+                    raise Rollback()
+            except Rollback:
+                pass
+            finally:
+                reset_process_state()
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+        else:
+            self.print_results(results)
+            if options['output']:
+                with open(options['output'], 'w', encoding='utf-8') as file:
+                    json.dump(results, file, ensure_ascii=False, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            # Прогоны сравниваются только с прогонами той же СУБД и размера: без них проверка ничего не проверила бы
+            base_runs = {(run['vendor'], run['rows']) for run in baseline.get('runs', [])}
+            if not any((run['vendor'], run['rows']) in base_runs for run in results['runs']):
+                raise CommandError(f"В {options['baseline']} нет прогонов с той же СУБД и числом строк")
+            regressions = compare(results, baseline, options['threshold'], options['min_delta_ms'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(f'Регрессия: {regression}')
+                raise CommandError(f'Найдено регрессий: {len(regressions)}')
+            self.stderr.write(self.style.SUCCESS('Регрессий относительно baseline нет'))
+
+    def print_results(self, results):
+        for run in results['runs']:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{run['vendor']}, строк в Student: {run['rows']} (заполнение {run['seed_seconds']:.1f} с)"))
+            for name, case in run['cases'].items():
+                self.stdout.write(
+                    f"{name:32} p50 {case['p50_ms']:9.2f} мс  p95 {case['p95_ms']:9.2f} мс  "
+                    f"p99 {case['p99_ms']:9.2f} мс  запросов {case['queries']:3}  память {case['peak_kb']:9.1f} КБ")
+            for table, size in run.get('sizes', {}).items():
+                self.stdout.write(
+                    f"{table:40} строк {size['rows']:10}  данные {size['table_bytes'] / 2 ** 20:9.2f} МБ  "
+                    f"индексы {size['index_bytes'] / 2 ** 20:9.2f} МБ")
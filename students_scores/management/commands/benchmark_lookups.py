@@ -0,0 +1,68 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from students_scores.models import DEBT_SCORE, Student
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Замеряет планы и время запросов по name, discipline и score < DEBT_SCORE на синтетических данных. '
+            'Данные вставляются в транзакции, которая в конце откатывается')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000, 10000000],
+                            help='Размеры таблицы Student для замеров')
+        parser.add_argument('--repeat', type=int, default=20, help='Число повторов каждого запроса')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for rows in options['rows']:
+            try:
+                with transaction.atomic():
+                    self.benchmark(rows, options)
+                    raise Rollback()
+            except Rollback:
+                pass
+
+    def benchmark(self, rows, options):
+        rng = random.Random(options['seed'])
+        disciplines = [f'Дисциплина {i}' for i in range(36)]
+        # Каждый студент сдает все дисциплины, поэтому пары (name, discipline) уникальны
+        names = [f'Студент {i}' for i in range((rows + len(disciplines) - 1) // len(disciplines))]
+
+        # Очистка одним DELETE: queryset.delete() отправил бы post_delete для каждой строки
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(Student._meta.db_table)}')
+        batch = []
+        for i in range(rows):
+            batch.append(Student(name=names[i // len(disciplines)], discipline=disciplines[i % len(disciplines)],
+                                 score=rng.randint(20, 100)))
+            if len(batch) >= options['batch_size']:
+                Student.objects.bulk_create(batch)
+                batch = []
+        Student.objects.bulk_create(batch)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Student._meta.db_table}')
+
+        queries = {
+            'name': Student.objects.filter(name=rng.choice(names)),
+            'discipline': Student.objects.filter(discipline=rng.choice(disciplines)),
+            f'score < {DEBT_SCORE}': Student.objects.filter(score__lt=DEBT_SCORE),
+        }
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Строк в Student: {rows}'))
+        for title, queryset in queries.items():
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.values_list('id', 'score'))
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            self.stdout.write(f'{title}: медиана {timings[len(timings) // 2]:.2f} мс, '
+                              f'максимум {timings[-1]:.2f} мс')
+            self.stdout.write(queryset.explain())
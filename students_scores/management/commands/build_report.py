@@ -0,0 +1,61 @@
+import csv
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from students_scores.data_version import get_data_version
+from students_scores.report import build_report
+from students_scores.snapshot import DICTIONARY_COLUMNS, Snapshot, get_current_path, write_snapshot
+from students_scores.stats import STATS_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Полный отчет по всем студентам и дисциплинам с рейтингами, параллельно в нескольких процессах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Число процессов')
+        parser.add_argument('--dir', default=None, help='Каталог снимков (по умолчанию SNAPSHOT_DIR)')
+        parser.add_argument('--top', type=int, default=10, help='Сколько мест рейтинга вывести')
+        parser.add_argument('--output', default=None, help='CSV со статистикой и местом каждой группы')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or getattr(settings, 'SNAPSHOT_DIR', '')
+        if not directory:
+            raise CommandError('Не задан каталог снимков: --dir или SNAPSHOT_DIR')
+        if options['workers'] < 1:
+            raise CommandError('--workers должен быть не меньше 1')
+
+        # Отчет строится только по актуальному снимку; устаревший перестраивается
+        path = get_current_path(directory)
+        snapshot = Snapshot(path) if path else None
+        if snapshot is None or snapshot.version != get_data_version():
+            self.stdout.write('Снимок отсутствует или устарел, строится новый')
+            snapshot = write_snapshot(directory)
+
+        started = time.perf_counter()
+        try:
+            report = build_report(snapshot, workers=options['workers'])
+        except ValueError as error:
+            raise CommandError(f'Отчет не построен: {error}')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчет по {len(snapshot)} оценкам за {elapsed:.2f} с ({len(snapshot) / max(elapsed, 1e-9):.0f} строк/с, '
+            f'процессов: {options["workers"]})'))
+
+        overall = report.histogram
+        self.stdout.write(f'Всего оценок: {overall.total}, медиана {overall.percentile(50):g}, '
+                          f'доля задолженностей {overall.debt_ratio():.1%}')
+        rankings = {column: report.ranking(column) for column in DICTIONARY_COLUMNS}
+        for column, ranking in rankings.items():
+            self.stdout.write(f'Рейтинг ({column}), групп {len(ranking)}:')
+            for place, key, stats in ranking[:options['top']]:
+                self.stdout.write(f'  {place}. {key}: средний балл {stats[3]:.2f}, оценок {stats[0]}')
+
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                writer.writerow(('kind', 'key', 'place') + STATS_FIELDS)
+                for column, ranking in rankings.items():
+                    for place, key, stats in ranking:
+                        writer.writerow((column, key, place, *stats))
+            self.stdout.write(f'Отчет записан в {options["output"]}')
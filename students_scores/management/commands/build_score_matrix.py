@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from students_scores.score_matrix import MATRIX_KINDS, build_matrix, get_matrix_path
+
+
+class Command(BaseCommand):
+    help = 'Строит матрицы гистограмм оценок (студенты и дисциплины x 101) и сохраняет их в SCORE_MATRIX_DIR'
+
+    def handle(self, *args, **options):
+        if not get_matrix_path(MATRIX_KINDS[0]):
+            raise CommandError('Не задан SCORE_MATRIX_DIR')
+        for kind in MATRIX_KINDS:
+            started = time.perf_counter()
+            matrix = build_matrix(kind, save=True)
+            self.stdout.write(self.style.SUCCESS(
+                f'{kind}: {len(matrix)} групп, {matrix.counts[:len(matrix)].nbytes / 2 ** 20:.1f} МБ, '
+                f'{time.perf_counter() - started:.3f} с -> {get_matrix_path(kind)}'))
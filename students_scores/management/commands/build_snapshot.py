@@ -0,0 +1,61 @@
+import json
+import logging
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, DatabaseError
+from django.utils.dateparse import parse_datetime
+from students_scores.data_version import get_data_version
+from students_scores.snapshot import get_current_path, write_snapshot
+
+logger = logging.getLogger('students_scores.build_snapshot')
+
+
+class Command(BaseCommand):
+    help = 'Выгружает Student в колоночный снимок .npy для чтения через mmap'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='Каталог снимков (по умолчанию SNAPSHOT_DIR)')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--keep', type=int, default=2, help='Сколько снимков хранить, включая новый')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Работать в фоне: раз в столько секунд перестраивать снимок, если данные изменились')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or getattr(settings, 'SNAPSHOT_DIR', '')
+        if not directory:
+            raise CommandError('Не задан каталог снимков: --dir или SNAPSHOT_DIR')
+        if options['keep'] < 1:
+            raise CommandError('--keep должен быть не меньше 1')
+        if options['interval'] is None:
+            self.build(directory, options)
+            return
+
+        while True:
+            close_old_connections()
+            try:
+                if self.is_stale(directory):
+                    self.build(directory, options)
+            except DatabaseError:
+                # Ошибка БД не останавливает фоновый процесс: снимок перестроится на следующем проходе
+                logger.exception('Не удалось перестроить снимок')
+            time.sleep(options['interval'])
+
+    def is_stale(self, directory: str) -> bool:
+        path = get_current_path(directory)
+        if path is None:
+            return True
+        try:
+            with open(os.path.join(path, 'meta.json'), encoding='utf-8') as file:
+                meta = json.load(file)
+        except FileNotFoundError:
+            return True
+        return (meta['generation'], parse_datetime(meta['updated_at'])) != get_data_version()
+
+    def build(self, directory: str, options: dict):
+        started = time.perf_counter()
+        snapshot = write_snapshot(directory, chunk_size=options['chunk_size'], keep=options['keep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Снимок {snapshot.path}: {len(snapshot)} строк, поколение данных {snapshot.version[0]}, '
+            f'{time.perf_counter() - started:.2f} с'))
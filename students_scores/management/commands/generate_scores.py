@@ -0,0 +1,59 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from students_scores.DataGenerator import add_arguments, create_generator, write_csv, write_ndjson
+from students_scores.cache import invalidate_all
+from students_scores.data_version import bump_data_generation
+from students_scores.models import Student
+from students_scores.signals import mark_debts_dirty
+from students_scores.summary import rebuild_summaries
+from students_scores.views import refresh_students_with_debts
+
+
+def load_generated(generator, batch_size):
+    for name_codes, discipline_codes, scores in generator.batches(batch_size):
+        Student.objects.bulk_create(
+            [Student(name=generator.names[name_code], discipline=generator.disciplines[discipline_code],
+                     score=score)
+             for name_code, discipline_code, score in zip(name_codes.tolist(), discipline_codes.tolist(),
+                                                          scores.tolist())],
+            batch_size=10000, ignore_conflicts=True,
+        )
+    # bulk_create не отправляет сигналы, поэтому производные данные пересчитываются целиком
+    rebuild_summaries()
+    invalidate_all()
+    bump_data_generation()
+    mark_debts_dirty(sender=Student)
+    refresh_students_with_debts()
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетические оценки в CSV/NDJSON или сразу в базу данных пакетами'
+
+    def add_arguments(self, parser):
+        add_arguments(parser)
+        parser.add_argument('--format', choices=('csv', 'ndjson', 'db'), default='csv',
+                            help='db - вставка в таблицу Student')
+        parser.add_argument('--output', default='-', help='Файл для записи или "-" для stdout')
+
+    def handle(self, *args, **options):
+        try:
+            generator = create_generator(options)
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        start = time.perf_counter()
+        if options['format'] == 'db':
+            load_generated(generator, options['batch_size'])
+        else:
+            output = self.stdout if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8',
+                                                                        newline='')
+            writer = write_csv if options['format'] == 'csv' else write_ndjson
+            try:
+                writer(generator.records(options['batch_size']), output)
+            finally:
+                if output is not self.stdout:
+                    output.close()
+
+        elapsed = time.perf_counter() - start
+        self.stderr.write(f"Сгенерировано {options['records']} записей за {elapsed:.2f} с "
+                          f"({options['records'] / elapsed if elapsed else 0:.0f} строк/с)")
@@ -0,0 +1,165 @@
+import csv
+import io
+import json
+import sys
+import time
+from typing import Iterator, List, Tuple
+import yaml
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from students_scores.cache import invalidate_all
+from students_scores.data_version import bump_data_generation
+from students_scores.models import MAX_SCORE, Student
+from students_scores.signals import mark_debts_dirty
+from students_scores.summary import refresh_summaries
+from students_scores.views import refresh_students_with_debts
+
+FORMATS = ('csv', 'ndjson', 'yaml')
+
+
+def read_csv(file) -> Iterator[dict]:
+    yield from csv.DictReader(file)
+
+
+def read_ndjson(file) -> Iterator[dict]:
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_yaml(file) -> Iterator[dict]:
+    # Формат фикстур loaddata: список {model: ..., fields: {...}}. Читается целиком, оставлен для совместимости
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    for record in yaml.load(file, Loader=loader) or []:
+        yield record.get('fields', record)
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson, 'yaml': read_yaml}
+
+
+class Command(BaseCommand):
+    help = 'Потоковая загрузка оценок из CSV/NDJSON/YAML с upsert по (name, discipline)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или "-" для чтения из stdin')
+        parser.add_argument('--format', choices=FORMATS, help='Формат файла (по умолчанию - по расширению)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--no-copy', action='store_true', help='Не использовать COPY на PostgreSQL')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        export_format = options['format'] or self.detect_format(path)
+        batch_size = options['batch_size']
+        use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+
+        file = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        # Затронутые группы пересчитываются порциями не больше batch_size ключей, чтобы не копить
+        # множества на весь файл и не строить огромные key__in. Кэш сбрасывается целиком один раз в конце
+        names, disciplines = set(), set()
+        imported = inserted = skipped = 0
+        start = time.perf_counter()
+        try:
+            batch = {}
+            for record in READERS[export_format](file):
+                row = self.parse_record(record)
+                if row is None:
+                    skipped += 1
+                    continue
+                # Внутри пакета одинаковые (name, discipline) схлопываются, побеждает последняя запись
+                batch[row[:2]] = row[2]
+                if len(batch) >= batch_size:
+                    inserted += self.flush(batch, use_copy, names, disciplines)
+                    imported += len(batch)
+                    batch = {}
+                    if len(names) >= batch_size or len(disciplines) >= batch_size:
+                        self.refresh_derived(names, disciplines)
+            inserted += self.flush(batch, use_copy, names, disciplines)
+            imported += len(batch)
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        # Производные данные: суммы ScoreSummary и список должников
+        self.refresh_derived(names, disciplines)
+        invalidate_all()
+        bump_data_generation()
+        mark_debts_dirty(sender=Student)
+        debts = refresh_students_with_debts()
+
+        elapsed = time.perf_counter() - start
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {imported}, пропущено: {skipped} (новых: {inserted}, обновлено: {imported - inserted}), '
+            f'за {elapsed:.2f} с ({rate:.0f} строк/с)'))
+        if debts is not None:
+            self.stdout.write(
+                f"Должники - добавлено: {debts['inserted']}, обновлено: {debts['updated']}, удалено: {debts['deleted']}")
+
+    def detect_format(self, path: str) -> str:
+        extension = path.rsplit('.', 1)[-1].lower()
+        if extension == 'yml':
+            extension = 'yaml'
+        if extension not in FORMATS:
+            raise CommandError(f'Не удалось определить формат файла {path}, укажите --format')
+        return extension
+
+    def parse_record(self, record: dict):
+        try:
+            name = str(record['name']).strip()
+            discipline = str(record['discipline']).strip()
+            score = int(record['score'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not name or not discipline or not 0 <= score <= MAX_SCORE:
+            return None
+        return name, discipline, score
+
+    def refresh_derived(self, names: set, disciplines: set):
+        refresh_summaries(names, disciplines)
+        names.clear()
+        disciplines.clear()
+
+    def flush(self, batch: dict, use_copy: bool, names: set, disciplines: set) -> int:
+        # Возвращает число новых строк: остальные строки пакета обновили существующие оценки
+        if not batch:
+            return 0
+        rows = [(name, discipline, score) for (name, discipline), score in batch.items()]
+        batch_names = {row[0] for row in rows}
+        batch_disciplines = {row[1] for row in rows}
+        with transaction.atomic():
+            if use_copy:
+                inserted = self.copy_rows(rows)
+            else:
+                existing = Student.objects.filter(name__in=batch_names, discipline__in=batch_disciplines)
+                inserted = len(batch.keys() - set(existing.values_list('name', 'discipline')))
+                Student.objects.bulk_create(
+                    [Student(name=name, discipline=discipline, score=score) for name, discipline, score in rows],
+                    update_conflicts=True, unique_fields=['name', 'discipline'], update_fields=['score'],
+                )
+        names.update(batch_names)
+        disciplines.update(batch_disciplines)
+        return inserted
+
+    def copy_rows(self, rows: List[Tuple[str, str, int]]) -> int:
+        # COPY во временную таблицу и затем один INSERT ... ON CONFLICT в Student.
+        # xmax = 0 только у вставленных строк, у обновленных там номер текущей транзакции
+        table = Student._meta.db_table
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        copy_sql = 'COPY import_scores_tmp (name, discipline, score) FROM STDIN WITH CSV'
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS import_scores_tmp '
+                           '(name varchar(200), discipline varchar(200), score integer) ON COMMIT DELETE ROWS')
+            if hasattr(cursor.cursor, 'copy_expert'):
+                # psycopg2
+                buffer.seek(0)
+                cursor.cursor.copy_expert(copy_sql, buffer)
+            else:
+                # psycopg 3
+                with cursor.cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+            cursor.execute(f'INSERT INTO {table} (name, discipline, score) '
+                           f'SELECT name, discipline, score FROM import_scores_tmp '
+                           f'ON CONFLICT (name, discipline) DO UPDATE SET score = EXCLUDED.score '
+                           f'RETURNING (xmax = 0)')
+            return sum(1 for (created,) in cursor.fetchall() if created)
@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import urlencode
+from django.core.management.base import BaseCommand
+from django.db import connection
+from prometheus_client.parser import text_string_to_metric_families
+
+# Пары (синхронный путь, асинхронный путь) для сравнения WSGI- и ASGI-обработчиков
+PATHS = {
+    'index': ('/', '/async/'),
+    'student': ('/student_info/', '/async/student_info/'),
+    'discipline': ('/discipline_info/', '/async/discipline_info/'),
+    'debts': ('/students_with_debts/', '/async/students_with_debts/'),
+}
+
+CONNECTIONS_METRIC = 'students_scores_db_connections'
+
+
+def parse_connections(text: str) -> Optional[int]:
+    # Счетчик открытых соединений из ответа /metrics. В режиме нескольких процессов это уже сумма
+    # по всем воркерам gunicorn, поэтому одного ответа достаточно
+    for family in text_string_to_metric_families(text):
+        if family.name == CONNECTIONS_METRIC:
+            for sample in family.samples:
+                if sample.name == CONNECTIONS_METRIC + '_total':
+                    return int(sample.value)
+    return None
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест запущенного сервера: число запросов в секунду и перцентили задержки '
+            'при заданной конкурентности для синхронных и асинхронных обработчиков, а также число '
+            'открытых соединений с БД (по /metrics и, с --database, по статистике PostgreSQL)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Адрес запущенного сервера')
+        parser.add_argument('--page', choices=PATHS, default='student')
+        parser.add_argument('--mode', choices=('sync', 'async', 'both'), default='both')
+        parser.add_argument('--student', default='Иванов Андрей')
+        parser.add_argument('--discipline', default='Базы данных')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--json', action='store_true', help='Вывести результаты в JSON')
+        parser.add_argument('--database', action='store_true',
+                            help='Считать сессии и соединения на сервере PostgreSQL (те же настройки БД, что у сервера)')
+        parser.add_argument('--label', default='', help='Метка прогона, например conn_max_age=0 или pool')
+
+    def handle(self, *args, **options):
+        sync_path, async_path = PATHS[options['page']]
+        paths = {'sync': sync_path, 'async': async_path}
+        modes = ('sync', 'async') if options['mode'] == 'both' else (options['mode'],)
+        query = {'student': {'student': options['student']},
+                 'discipline': {'discipline': options['discipline']}}.get(options['page'], {})
+
+        results = {}
+        for mode in modes:
+            url = options['url'].rstrip('/') + paths[mode] + ('?' + urlencode(query) if query else '')
+            results[mode] = self.run_with_connections(url, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'label': options['label'], 'results': results}, ensure_ascii=False))
+            return
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{options['label'] + ' ' if options['label'] else ''}{mode}: {result['rps']:.1f} запросов/с, "
+                f"p50 {result['p50_ms']:.1f} мс, p95 {result['p95_ms']:.1f} мс, p99 {result['p99_ms']:.1f} мс, "
+                f"ошибок {result['errors']}")
+            connections = result['connections']
+            if connections['opened'] is not None:
+                self.stdout.write(f"  открыто соединений по /metrics: {connections['opened']}")
+            if connections['server_sessions'] is not None:
+                self.stdout.write(f"  новых сессий PostgreSQL: {connections['server_sessions']}, "
+                                  f"соединений одновременно до {connections['server_peak']}")
+
+    def run_with_connections(self, url: str, options) -> dict:
+        # Соединения считаются как разница до и после теста: в /metrics - по сумме всех воркеров, на сервере -
+        # по pg_stat_database.sessions (PostgreSQL 14+), пик - по числу открытых соединений во время теста
+        base_url = options['url'].rstrip('/')
+        metrics_before = self.scrape_connections(base_url)
+        sessions_before = self.get_server_sessions() if options['database'] else None
+        peak, stop = [0], threading.Event()
+        sampler = None
+        if sessions_before is not None:
+            sampler = threading.Thread(target=self.sample_backends, args=(peak, stop))
+            sampler.start()
+        try:
+            result = self.run(url, options['requests'], options['concurrency'])
+        finally:
+            stop.set()
+            if sampler is not None:
+                sampler.join()
+
+        metrics_after = self.scrape_connections(base_url)
+        opened = metrics_after - metrics_before if None not in (metrics_before, metrics_after) else None
+        server_sessions = None
+        if sessions_before is not None:
+            # Статистика сервера обновляется с задержкой до секунды
+            time.sleep(1)
+            # Одна из новых сессий - соединение потока, опрашивающего pg_stat_activity
+            server_sessions = self.get_server_sessions() - sessions_before - 1
+        result['connections'] = {'opened': opened, 'server_sessions': server_sessions,
+                                 'server_peak': peak[0] if sessions_before is not None else None}
+        return result
+
+    def scrape_connections(self, base_url: str) -> Optional[int]:
+        try:
+            with urllib.request.urlopen(base_url + '/metrics', timeout=10) as response:
+                return parse_connections(response.read().decode())
+        except (urllib.error.URLError, OSError):
+            return None
+
+    def get_server_sessions(self) -> Optional[int]:
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT sessions FROM pg_stat_database WHERE datname = current_database()')
+            return cursor.fetchone()[0]
+
+    def sample_backends(self, peak: list, stop: threading.Event):
+        # У потока свое соединение Django, оно закрывается в конце опроса
+        try:
+            while not stop.wait(0.2):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+                    # Без соединения самого опроса
+                    peak[0] = max(peak[0], cursor.fetchone()[0] - 1)
+        finally:
+            connection.close()
+
+    def run(self, url: str, requests: int, concurrency: int) -> dict:
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                    ok = response.status == 200
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return time.perf_counter() - start, ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(fetch, range(requests)))
+        elapsed = time.perf_counter() - start
+
+        timings = sorted(duration * 1000 for duration, _ in samples)
+
+        def percentile(p):
+            return timings[min(int(len(timings) * p / 100), len(timings) - 1)]
+
+        return {'url': url, 'requests': requests, 'concurrency': concurrency, 'rps': requests / elapsed,
+                'p50_ms': percentile(50), 'p95_ms': percentile(95), 'p99_ms': percentile(99),
+                'errors': sum(1 for _, ok in samples if not ok)}
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from students_scores.summary import find_drift, rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает таблицу ScoreSummary по данным Student и проверяет ее на расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить расхождения, не изменяя таблицу')
+
+    def handle(self, *args, **options):
+        drift = find_drift()
+        for kind, key in drift:
+            self.stdout.write(f'Расхождение: {kind} = {key}')
+
+        if options['check']:
+            if drift:
+                raise CommandError(f'Найдено расхождений: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+
+        count = rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS(
+            f'Таблица перестроена: {count} групп, исправлено расхождений: {len(drift)}'))
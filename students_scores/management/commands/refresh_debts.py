@@ -0,0 +1,39 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, DatabaseError
+from students_scores.views import refresh_students_with_debts
+
+logger = logging.getLogger('students_scores.refresh_debts')
+
+
+class Command(BaseCommand):
+    help = 'Фоновое обновление списка студентов с академическими долгами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Интервал между проверками флага изменений, в секундах')
+        parser.add_argument('--once', action='store_true', help='Выполнить одну проверку и завершиться')
+        parser.add_argument('--force', action='store_true', help='Обновить список, даже если данные не менялись')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        while True:
+            close_old_connections()
+            try:
+                result = refresh_students_with_debts(force=force)
+            except DatabaseError:
+                # Ошибка БД не останавливает фоновый процесс: флаг изменений остался выставленным,
+                # и следующий проход повторит обновление (в том числе принудительное)
+                if options['once']:
+                    raise
+                logger.exception('Не удалось обновить список должников')
+                result = None
+            else:
+                force = False
+            if result is not None:
+                self.stdout.write(
+                    f"Добавлено: {result['inserted']}, обновлено: {result['updated']}, удалено: {result['deleted']}")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,218 @@
+import contextvars
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import disable_created_metrics, multiprocess
+
+# Метрики запросов: задержка по эндпоинтам (гистограммы Prometheus), число и время SQL-запросов,
+# время шаблонов и расчета статистики, число прочитанных строк, попадания в кэш
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Счетчики кэша для cache/stats/: общий кэш и LRU процесса
+CACHE_COUNTERS = ('hits', 'misses', 'local_hits', 'local_misses', 'local_evictions')
+
+logger = logging.getLogger('students_scores.slow_requests')
+
+
+class RequestMetrics:
+    def __init__(self, collect_sql: bool = False):
+        self.queries = 0
+        self.query_time = 0.0
+        self.rows = 0
+        self.timings: Dict[str, float] = defaultdict(float)
+        # (время, SQL) - только если включен журнал медленных запросов
+        self.sql: Optional[List[Tuple[float, str]]] = [] if collect_sql else None
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar('request_metrics', default=None)
+
+
+class Registry:
+    # Метрики prometheus_client. Если задан PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py задает его до загрузки
+    # приложения), каждый воркер пишет значения в свои mmap-файлы в этом каталоге, а /metrics любого воркера
+    # отдает сумму по всем процессам: scrape не зависит от того, в какой воркер он попал
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Новый набор метрик (для тестов; в режиме нескольких процессов значения остаются в файлах)
+        self.registry = CollectorRegistry(auto_describe=True)
+        self.requests = Counter('students_scores_requests', 'Запросы по эндпоинтам',
+                                ['endpoint', 'method', 'status'], registry=self.registry)
+        self.latency = Histogram('students_scores_request_duration_seconds', 'Время ответа', ['endpoint'],
+                                 buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.queries = Counter('students_scores_db_queries', 'SQL-запросы', ['endpoint'], registry=self.registry)
+        self.query_seconds = Counter('students_scores_db_query_seconds', 'Время SQL-запросов', ['endpoint'],
+                                     registry=self.registry)
+        self.rows = Counter('students_scores_rows_scanned', 'Прочитанные строки', ['endpoint'],
+                            registry=self.registry)
+        self.sections = Histogram('students_scores_section_duration_seconds', 'Время участков', ['section'],
+                                  buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.connections = Counter('students_scores_db_connections', 'Открытые соединения с БД',
+                                   registry=self.registry)
+        self.cache = Counter('students_scores_cache', 'Попадания и промахи кэша', ['kind', 'result'],
+                             registry=self.registry)
+        self.local_cache = Counter('students_scores_local_cache', 'Попадания, промахи и вытеснения LRU процесса',
+                                   ['kind', 'result'], registry=self.registry)
+
+    def observe_request(self, endpoint: str, method: str, status: int, seconds: float, metrics: RequestMetrics):
+        self.requests.labels(endpoint, method, str(status)).inc()
+        self.latency.labels(endpoint).observe(seconds)
+        self.queries.labels(endpoint).inc(metrics.queries)
+        self.query_seconds.labels(endpoint).inc(metrics.query_time)
+        self.rows.labels(endpoint).inc(metrics.rows)
+
+    def observe_section(self, name: str, seconds: float):
+        self.sections.labels(name).observe(seconds)
+
+    def _collected(self) -> CollectorRegistry:
+        if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            return self.registry
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+
+    def render(self) -> str:
+        return generate_latest(self._collected()).decode()
+
+    def cache_counters(self) -> Dict[str, Dict[str, int]]:
+        counters = {}
+        prefixes = {'students_scores_cache': '', 'students_scores_local_cache': 'local_'}
+        for family in self._collected().collect():
+            if family.name in prefixes:
+                for sample in family.samples:
+                    if sample.name.endswith('_total'):
+                        counters.setdefault(sample.labels['kind'], dict.fromkeys(CACHE_COUNTERS, 0))[
+                            prefixes[family.name] + sample.labels['result']] = int(sample.value)
+        return counters
+
+
+# Только *_total, *_bucket, *_sum и *_count, без отметок времени создания рядов
+disable_created_metrics()
+registry = Registry()
+
+
+def query_wrapper(execute, sql, params, many, context):
+    # Подключается ко всем соединениям (connection_created), поэтому видит и запросы асинхронных
+    # представлений, которые ORM выполняет в потоке sync_to_async: контекст запроса переходит туда же
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.queries += 1
+        metrics.query_time += elapsed
+        if metrics.sql is not None:
+            metrics.sql.append((elapsed, sql))
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    # Сигнал приходит на каждое открытие соединения, поэтому здесь же они считаются: при постоянных
+    # соединениях счетчик почти не растет под нагрузкой. С пулом psycopg сигнал приходит на каждую выдачу
+    # соединения из пула - число настоящих подключений видно только на сервере (load_test --database)
+    registry.connections.inc()
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+@contextmanager
+def timed(section: str):
+    # Участок горячего пути: время идет в гистограмму участка и в Server-Timing текущего запроса
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe_section(section, elapsed)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.timings[section] += elapsed
+
+
+def add_rows(count: int):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.rows += count
+
+
+def _start():
+    slow_ms = getattr(settings, 'SLOW_REQUEST_MS', 0)
+    metrics = RequestMetrics(collect_sql=bool(slow_ms))
+    return metrics, _current.set(metrics), time.perf_counter()
+
+
+def _finish(request, response, metrics: RequestMetrics, token, start: float):
+    _current.reset(token)
+    if getattr(settings, 'METRICS_SERVER_TIMING', False):
+        parts = [f'db;dur={metrics.query_time * 1000:.2f};desc="{metrics.queries} queries"']
+        parts += [f'{section};dur={seconds * 1000:.2f}' for section, seconds in metrics.timings.items()]
+        parts.append(f'total;dur={(time.perf_counter() - start) * 1000:.2f}')
+        response['Server-Timing'] = ', '.join(parts)
+
+    if not response.streaming or getattr(response, 'file_to_stream', None) is not None:
+        _record(request, response, metrics, start)
+        return response
+    # Потоковый ответ выполняет запросы уже после возврата из представления: контекст метрик
+    # восстанавливается на время выдачи тела, а запрос учитывается, когда тело выдано (или клиент ушел)
+    content = response.streaming_content
+    if response.is_async:
+        async def streaming():
+            token = _current.set(metrics)
+            try:
+                async for part in content:
+                    yield part
+            finally:
+                _current.reset(token)
+                _record(request, response, metrics, start)
+    else:
+        def streaming():
+            token = _current.set(metrics)
+            try:
+                yield from content
+            finally:
+                _current.reset(token)
+                _record(request, response, metrics, start)
+    response.streaming_content = streaming()
+    return response
+
+
+def _record(request, response, metrics: RequestMetrics, start: float):
+    elapsed = time.perf_counter() - start
+    match = getattr(request, 'resolver_match', None)
+    endpoint = (match.url_name or match.view_name) if match else 'unmatched'
+    registry.observe_request(endpoint, request.method, response.status_code, elapsed, metrics)
+
+    slow_ms = getattr(settings, 'SLOW_REQUEST_MS', 0)
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        statements = sorted(metrics.sql or [], key=lambda item: item[0], reverse=True)[:10]
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.1f мс, SQL-запросов %d (%.1f мс), строк %d\n%s',
+            request.method, request.get_full_path(), endpoint, elapsed * 1000, metrics.queries,
+            metrics.query_time * 1000, metrics.rows,
+            '\n'.join(f'  {seconds * 1000:.1f} мс: {sql}' for seconds, sql in statements),
+        )
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            metrics, token, start = _start()
+            response = await get_response(request)
+            return _finish(request, response, metrics, token, start)
+    else:
+        def middleware(request):
+            metrics, token, start = _start()
+            response = get_response(request)
+            return _finish(request, response, metrics, token, start)
+    return middleware
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Student',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('discipline', models.CharField(max_length=200)),
+                ('score', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScoreSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('name', 'Студент'), ('discipline', 'Дисциплина')], max_length=16)),
+                ('key', models.CharField(max_length=200)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('total_sq', models.BigIntegerField(default=0)),
+                ('min_score', models.PositiveIntegerField(default=0)),
+                ('max_score', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('kind', 'key')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentWithDebts',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('discipline', models.CharField(max_length=200)),
+                ('score', models.PositiveIntegerField()),
+            ],
+            options={
+                'unique_together': {('name', 'discipline')},
+            },
+        ),
+    ]
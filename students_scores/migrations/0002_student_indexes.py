@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students_scores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='student',
+            unique_together={('name', 'discipline')},
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['discipline'], name='student_discipline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('score__lt', 61)), fields=['score'], name='student_debt_score_idx'),
+        ),
+    ]
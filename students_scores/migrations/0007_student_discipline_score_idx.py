@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students_scores', '0006_scorebucket'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['discipline', '-score'], name='student_discipline_score_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+# GIN-индекс pg_trgm по ключам ScoreSummary для нечеткого поиска имен (search.trigram_search).
+# Только на PostgreSQL: на других СУБД миграция ничего не делает
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('students_scores', 'ScoreSummary')._meta.db_table)
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(f'CREATE INDEX IF NOT EXISTS scoresummary_key_trgm_idx ON {table} USING gin (key gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS scoresummary_key_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students_scores', '0007_student_discipline_score_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students_scores', '0008_scoresummary_trigram_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.BigIntegerField(null=True, unique=True)),
+                ('old_name', models.CharField(max_length=200, null=True)),
+                ('old_discipline', models.CharField(max_length=200, null=True)),
+                ('old_score', models.PositiveIntegerField(null=True)),
+                ('new_name', models.CharField(max_length=200, null=True)),
+                ('new_discipline', models.CharField(max_length=200, null=True)),
+                ('new_score', models.PositiveIntegerField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:27
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students_scores', '0009_datachange'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='student',
+            name='score',
+            field=models.PositiveIntegerField(validators=[django.core.validators.MaxValueValidator(100)]),
+        ),
+        migrations.AddConstraint(
+            model_name='student',
+            constraint=models.CheckConstraint(condition=models.Q(('score__lte', 100)), name='student_score_range'),
+        ),
+    ]
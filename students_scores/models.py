@@ -1,11 +1,32 @@
+from django.core.validators import MaxValueValidator
 from django.db import models
 
+# Баллы - по 100-балльной шкале; гистограммы и матрица (101 ячейка) рассчитаны на этот диапазон
+MAX_SCORE = 100
+# Баллы ниже этого порога считаются академической задолженностью
+DEBT_SCORE = 61
+
 
 # Create your models here.
 class Student(models.Model):
     name = models.CharField(max_length=200)
     discipline = models.CharField(max_length=200)
-    score = models.PositiveIntegerField()
+    score = models.PositiveIntegerField(validators=[MaxValueValidator(MAX_SCORE)])
+
+    class Meta:
+        # Составной ключ (name, discipline) также служит индексом для поиска по name
+        unique_together = ('name', 'discipline')
+        indexes = [
+            # (discipline, id) позволяет листать дисциплину keyset-пагинацией без сортировки
+            models.Index(fields=['discipline', 'id'], name='student_discipline_id_idx'),
+            # Частичный индекс только по строкам с академической задолженностью
+            models.Index(fields=['score'], name='student_debt_score_idx', condition=models.Q(score__lt=DEBT_SCORE)),
+            # Первые места в дисциплине читаются из начала индекса, без сортировки всей дисциплины
+            models.Index(fields=['discipline', '-score'], name='student_discipline_score_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(score__lte=MAX_SCORE), name='student_score_range'),
+        ]
 
 
 class StudentWithDebts(models.Model):
@@ -16,3 +37,62 @@ class StudentWithDebts(models.Model):
     # Ограничение для предотвращения создания повторяющихся записей
     class Meta:
         unique_together = ('name', 'discipline')
+
+
+# Предрассчитанные суммы по студенту или дисциплине для расчета статистики без сканирования Student
+class ScoreSummary(models.Model):
+    KIND_STUDENT = 'name'
+    KIND_DISCIPLINE = 'discipline'
+    KIND_CHOICES = (
+        (KIND_STUDENT, 'Студент'),
+        (KIND_DISCIPLINE, 'Дисциплина'),
+    )
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    key = models.CharField(max_length=200)
+    count = models.PositiveIntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+    total_sq = models.BigIntegerField(default=0)
+    min_score = models.PositiveIntegerField(default=0)
+    max_score = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('kind', 'key')
+
+
+# Состояние фонового обновления StudentWithDebts (одна строка с pk=1)
+class DebtsRefreshState(models.Model):
+    # Флаг выставляется при любом изменении Student и сбрасывается фоновым обновлением
+    dirty = models.BooleanField(default=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+
+# Глобальная версия данных Student (одна строка с pk=1), увеличивается при любой записи
+class DataVersion(models.Model):
+    generation = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+# Гистограмма баллов группы (студента или дисциплины): число оценок с данным баллом.
+# Поддерживается инкрементально вместе со ScoreSummary и суммируется между группами без сканирования Student
+class ScoreBucket(models.Model):
+    kind = models.CharField(max_length=16, choices=ScoreSummary.KIND_CHOICES)
+    key = models.CharField(max_length=200)
+    score = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('kind', 'key', 'score')
+
+
+# Журнал изменений Student для структур в памяти процессов (changes.LiveStructure): строка пишется
+# в транзакции записи, поколение DataVersion присваивается ей после фиксации. Пустые old_* - создание,
+# пустые new_* - удаление. Старые поколения удаляются (DATA_CHANGES_KEEP)
+class DataChange(models.Model):
+    generation = models.BigIntegerField(null=True, unique=True)
+    old_name = models.CharField(max_length=200, null=True)
+    old_discipline = models.CharField(max_length=200, null=True)
+    old_score = models.PositiveIntegerField(null=True)
+    new_name = models.CharField(max_length=200, null=True)
+    new_discipline = models.CharField(max_length=200, null=True)
+    new_score = models.PositiveIntegerField(null=True)
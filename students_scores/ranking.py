@@ -0,0 +1,119 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+from .changes import LiveStructure
+from .data_version import get_data_version
+from .models import Student, ScoreBucket, ScoreSummary
+
+# Границы для поиска в отсортированном списке (-средний балл, имя): любое имя больше '' и меньше MAX_NAME
+MAX_NAME = '\U0010ffff'
+
+
+class Leaderboard:
+    # Рейтинг студентов по среднему баллу: список (-средний балл, имя), отсортированный по возрастанию.
+    # Место и перцентиль - бинарный поиск за O(log n), первые K мест - срез списка.
+    # Суммы по каждому студенту хранятся рядом, чтобы изменения оценок применялись без запросов к БД
+    def __init__(self, totals: Dict[str, Tuple[int, int]] = None, version=None):
+        self.totals = dict(totals or {})
+        self.entries = sorted(self._entry(name, count, total) for name, (count, total) in self.totals.items())
+        self.version = version
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry(name: str, count: int, total: int) -> Tuple[float, str]:
+        return -total / count, name
+
+    @classmethod
+    def from_summaries(cls) -> 'Leaderboard':
+        version = get_data_version()
+        rows = ScoreSummary.objects.filter(kind=ScoreSummary.KIND_STUDENT, count__gt=0).values_list(
+            'key', 'count', 'total')
+        return cls({name: (count, total) for name, count, total in rows}, version)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, name: str, score: int, delta: int = 1):
+        # Вставка и удаление в отсортированном списке - бинарный поиск и сдвиг указателей
+        with self._lock:
+            count, total = self.totals.get(name, (0, 0))
+            if count:
+                del self.entries[bisect_left(self.entries, self._entry(name, count, total))]
+            count, total = count + delta, total + score * delta
+            if count > 0:
+                self.totals[name] = (count, total)
+                insort(self.entries, self._entry(name, count, total))
+            else:
+                self.totals.pop(name, None)
+
+    def top(self, k: int) -> List[dict]:
+        with self._lock:
+            entries = [(neg_mean, name, self.totals[name][0]) for neg_mean, name in self.entries[:k]]
+        result = []
+        for position, (neg_mean, name, count) in enumerate(entries):
+            # При равных средних место общее (1, 2, 2, 4)
+            place = position + 1 if position == 0 or neg_mean != entries[position - 1][0] else result[-1]['place']
+            result.append({'place': place, 'name': name, 'mean': -neg_mean, 'count': count})
+        return result
+
+    def rank(self, name: str) -> Optional[dict]:
+        with self._lock:
+            if name not in self.totals:
+                return None
+            count, total = self.totals[name]
+            neg_mean = -total / count
+            higher = bisect_left(self.entries, (neg_mean, ''))
+            lower = len(self.entries) - bisect_right(self.entries, (neg_mean, MAX_NAME))
+            size = len(self.entries)
+        # Перцентиль - доля студентов со средним баллом ниже
+        return {'place': higher + 1, 'of': size, 'mean': -neg_mean, 'count': count,
+                'percentile': 100.0 * lower / size}
+
+
+def apply_change(leaderboard: Leaderboard, old: Optional[dict], new: Optional[dict]):
+    if old is not None:
+        leaderboard.add(old['name'], old['score'], -1)
+    if new is not None:
+        leaderboard.add(new['name'], new['score'], 1)
+
+
+_leaderboard = LiveStructure(Leaderboard.from_summaries, apply_change)
+
+
+def get_leaderboard() -> Leaderboard:
+    # Как и матрица гистограмм: рейтинг процесса догоняет версию данных по журналу изменений
+    return _leaderboard.get()
+
+
+def clear_leaderboard():
+    global _leaderboard
+    _leaderboard = LiveStructure(Leaderboard.from_summaries, apply_change)
+
+
+def top_in_discipline(discipline: str, k: int) -> List[dict]:
+    # Индекс (discipline, -score) отдает первые K строк без сортировки всей дисциплины
+    rows = Student.objects.filter(discipline=discipline).order_by('-score', 'name').values_list('name', 'score')[:k]
+    result = []
+    for position, (name, score) in enumerate(rows):
+        place = position + 1 if position == 0 or score != result[-1]['score'] else result[-1]['place']
+        result.append({'place': place, 'name': name, 'score': score})
+    return result
+
+
+def discipline_ranks(scores: Dict[str, int]) -> Dict[str, dict]:
+    # Место студента в каждой из его дисциплин по гистограммам ScoreBucket: одна выборка,
+    # не больше 101 строки на дисциплину, вместо подсчета по всем оценкам дисциплины
+    buckets = ScoreBucket.objects.filter(kind=ScoreSummary.KIND_DISCIPLINE, key__in=list(scores)).values_list(
+        'key', 'score', 'count')
+    higher, lower, size = {}, {}, {}
+    for discipline, score, count in buckets:
+        size[discipline] = size.get(discipline, 0) + count
+        if score > scores[discipline]:
+            higher[discipline] = higher.get(discipline, 0) + count
+        elif score < scores[discipline]:
+            lower[discipline] = lower.get(discipline, 0) + count
+    return {
+        discipline: {'score': score, 'place': higher.get(discipline, 0) + 1, 'of': size[discipline],
+                     'percentile': 100.0 * lower.get(discipline, 0) / size[discipline]}
+        for discipline, score in scores.items() if size.get(discipline)
+    }
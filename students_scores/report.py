@@ -0,0 +1,86 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .histogram import SCORE_BUCKETS, ScoreHistogram
+from .score_matrix import ScoreMatrix
+from .snapshot import DICTIONARY_COLUMNS, Snapshot
+from .report_worker import partition_histograms
+from .stats import StatsCalculator
+
+# Параллельный отчет по всем студентам и дисциплинам. Исходные данные - колоночный снимок (mmap):
+# каждый процесс открывает его сам, а процессам передаются только границы частей, а не оценки.
+# Гистограммы групп пишутся в общую память (shared_memory) в непересекающиеся строки,
+# а частичные гистограммы всех оценок складываются в родительском процессе
+
+
+def plan_partitions(offsets: np.ndarray, parts: int) -> List[Tuple[int, int]]:
+    # Диапазоны кодов групп с примерно равным числом строк. Словарь отсортирован, и строки в индексе
+    # группы идут по коду, поэтому часть - это непрерывный отрезок индекса, а не список строк
+    groups = len(offsets) - 1
+    if groups <= 0:
+        return []
+    bounds = np.searchsorted(offsets, np.linspace(0, offsets[-1], parts + 1)[1:-1], side='left')
+    bounds = np.unique(np.concatenate(([0], np.clip(bounds, 0, groups), [groups])))
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def rank_groups(all_stats: Dict[str, List[float]]) -> List[Tuple[int, str, List[float]]]:
+    # Рейтинг по среднему баллу (по убыванию), при равенстве - по имени
+    ordered = sorted(all_stats.items(), key=lambda item: (-item[1][3], item[0]))
+    return [(place, key, stats) for place, (key, stats) in enumerate(ordered, start=1)]
+
+
+class ScoreReport:
+    def __init__(self, matrices: Dict[str, ScoreMatrix], histogram: ScoreHistogram, version):
+        self.matrices = matrices
+        self.histogram = histogram
+        self.version = version
+
+    def stats(self, column: str) -> Dict[str, List[float]]:
+        return self.matrices[column].all_stats()
+
+    def ranking(self, column: str, top: Optional[int] = None) -> List[Tuple[int, str, List[float]]]:
+        ranking = rank_groups(self.stats(column))
+        return ranking[:top] if top else ranking
+
+
+class ReportStatsCalculator(StatsCalculator):
+    # Статистика групп из готового отчета через общий интерфейс StatsCalculator
+    def __init__(self, report: ScoreReport):
+        self.report = report
+
+    def calculate_group_stats(self, field: str, value: str) -> List[float]:
+        return self.report.matrices[field].stats(value)
+
+
+def build_report(snapshot: Snapshot, workers: int = 1, columns=DICTIONARY_COLUMNS) -> ScoreReport:
+    matrices = {}
+    histogram = ScoreHistogram()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for column in columns:
+            dictionary = snapshot.dictionaries[column]
+            groups = len(dictionary)
+            shm = shared_memory.SharedMemory(create=True, size=max(groups * SCORE_BUCKETS * 4, 1))
+            try:
+                # Частей больше, чем процессов, чтобы крупные группы не оставляли остальные процессы без работы
+                partitions = plan_partitions(np.asarray(snapshot.offsets[column]), workers * 4)
+                args = [(snapshot.path, column, start, end, shm.name, groups) for start, end in partitions]
+                if executor is None:
+                    partials = [partition_histograms(*arguments) for arguments in args]
+                else:
+                    partials = list(executor.map(partition_histograms, *zip(*args))) if args else []
+                counts = np.ndarray((groups, SCORE_BUCKETS), dtype=np.int32, buffer=shm.buf).copy()
+            finally:
+                shm.close()
+                shm.unlink()
+            matrices[column] = ScoreMatrix(column, dictionary.tolist(), counts, snapshot.version)
+            # Общая гистограмма одинакова для любого разбиения, поэтому считается по первому
+            if column == columns[0]:
+                for partial in partials:
+                    histogram = histogram + ScoreHistogram(partial)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return ScoreReport(matrices, histogram, snapshot.version)
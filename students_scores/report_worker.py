@@ -0,0 +1,46 @@
+import os
+from multiprocessing import shared_memory
+from typing import Dict
+import numpy as np
+
+# Код процессов пула отчета. Модуль не импортирует Django: при запуске процессов через spawn/forkserver
+# (Windows, macOS) дочерний процесс загружает только его и numpy
+
+SCORE_BUCKETS = 101
+
+_arrays: Dict[str, np.ndarray] = {}
+
+
+def _load(path: str, name: str) -> np.ndarray:
+    # Массивы снимка открываются через mmap один раз на процесс
+    filename = os.path.join(path, f'{name}.npy')
+    array = _arrays.get(filename)
+    if array is None:
+        array = _arrays[filename] = np.load(filename, mmap_mode='r')
+    return array
+
+
+def partition_histograms(path: str, column: str, start: int, end: int, shm_name: str, groups: int) -> np.ndarray:
+    # Гистограммы групп [start, end) сортировкой подсчетом; строки групп - непрерывный отрезок индекса
+    offsets = _load(path, f'{column}_offsets')
+    first, last = int(offsets[start]), int(offsets[end])
+    rows = np.asarray(_load(path, f'{column}_order')[first:last])
+    scores = np.asarray(_load(path, 'score')[rows], dtype=np.int64)
+    # Балл выше 100 попал бы в гистограмму соседней группы, а его замена на 100 исказила бы максимум и среднее
+    out_of_range = np.flatnonzero(scores >= SCORE_BUCKETS)
+    if len(out_of_range):
+        raise ValueError(f'Баллы вне диапазона 0-{SCORE_BUCKETS - 1}: {len(out_of_range)} шт., '
+                         f'например {int(scores[out_of_range[0]])}')
+    codes = np.repeat(np.arange(end - start, dtype=np.int64), np.diff(offsets[start:end + 1]))
+    counts = np.bincount(codes * SCORE_BUCKETS + scores,
+                         minlength=(end - start) * SCORE_BUCKETS).reshape(-1, SCORE_BUCKETS)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        matrix = np.ndarray((groups, SCORE_BUCKETS), dtype=np.int32, buffer=shm.buf)
+        matrix[start:end] = counts
+        del matrix
+    finally:
+        shm.close()
+    # Частичная гистограмма всех оценок части - складывается в родительском процессе
+    return counts.sum(axis=0)
@@ -0,0 +1,186 @@
+import os
+import threading
+from functools import partial
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from .changes import LiveStructure
+from .data_version import get_data_version
+from .histogram import SCORE_BUCKETS, ScoreHistogram
+from .models import ScoreBucket, ScoreSummary
+
+SCORE_VALUES = np.arange(SCORE_BUCKETS, dtype=np.int64)
+MATRIX_KINDS = (ScoreSummary.KIND_STUDENT, ScoreSummary.KIND_DISCIPLINE)
+
+
+class ScoreMatrix:
+    # Матрица "группа x балл" (студенты или дисциплины x 101): строка - гистограмма оценок группы.
+    # Баллы ограничены 0-100, поэтому количество, сумма, минимум/максимум, медиана и любой перцентиль
+    # считаются по строке за O(101) без обращения к исходным оценкам (сортировка подсчетом)
+    def __init__(self, kind: str, keys: Iterable[str] = (), counts: np.ndarray = None, version=None):
+        self.kind = kind
+        self.keys = list(keys)
+        self.index = {key: row for row, key in enumerate(self.keys)}
+        capacity = max(len(self.keys), 16)
+        self.counts = np.zeros((capacity, SCORE_BUCKETS), dtype=np.int32)
+        if counts is not None:
+            self.counts[:len(self.keys)] = counts[:len(self.keys)]
+        self.version = version
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_scores(cls, kind: str, keys: Iterable[str], scores: Iterable[int], version=None) -> 'ScoreMatrix':
+        keys = np.asarray(list(keys), dtype=object)
+        scores = np.asarray(list(scores), dtype=np.int64)
+        if not len(keys):
+            return cls(kind, version=version)
+        unique_keys, codes = np.unique(keys, return_inverse=True)
+        counts = np.bincount(codes * SCORE_BUCKETS + scores, minlength=len(unique_keys) * SCORE_BUCKETS)
+        return cls(kind, unique_keys.tolist(), counts.reshape(-1, SCORE_BUCKETS), version)
+
+    @classmethod
+    def from_buckets(cls, kind: str) -> 'ScoreMatrix':
+        # Строится по ScoreBucket (по строке на каждую ненулевую ячейку), а не по всем оценкам Student
+        version = get_data_version()
+        rows = list(ScoreBucket.objects.filter(kind=kind).values_list('key', 'score', 'count'))
+        matrix = cls(kind, sorted({key for key, _, _ in rows}), version=version)
+        if rows:
+            keys, scores, counts = zip(*rows)
+            codes = np.fromiter((matrix.index[key] for key in keys), dtype=np.int64, count=len(keys))
+            np.add.at(matrix.counts, (codes, np.asarray(scores, dtype=np.int64)), np.asarray(counts, dtype=np.int32))
+        return matrix
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _row(self, key: str, create: bool = False) -> Optional[int]:
+        row = self.index.get(key)
+        if row is None and create:
+            row = len(self.keys)
+            if row == len(self.counts):
+                # Емкость удваивается, чтобы добавление новых групп было амортизированно O(1)
+                grown = np.zeros((row * 2, SCORE_BUCKETS), dtype=self.counts.dtype)
+                grown[:row] = self.counts
+                self.counts = grown
+            self.keys.append(key)
+            self.index[key] = row
+        return row
+
+    def add(self, key: str, score: int, delta: int = 1):
+        # Обновление на месте; баллы вне 0-100 в матрицу не попадают, и она помечается устаревшей
+        with self._lock:
+            if not 0 <= score < SCORE_BUCKETS:
+                self.version = None
+                return
+            row = self._row(key, create=delta > 0)
+            if row is None:
+                self.version = None
+                return
+            self.counts[row, score] += delta
+
+    def histogram(self, key: str) -> ScoreHistogram:
+        row = self.index.get(key)
+        return ScoreHistogram(None if row is None else self.counts[row])
+
+    def stats(self, key: str) -> List[float]:
+        # Формат как у StatsCalculator: [количество, максимум, минимум, среднее, ст. отклонение, дисперсия]
+        row = self.index.get(key)
+        if row is None:
+            return []
+        counts = self.counts[row].astype(np.int64)
+        stud_count = int(counts.sum())
+        if not stud_count:
+            return []
+        present = np.flatnonzero(counts)
+        avg_score = float(counts @ SCORE_VALUES) / stud_count
+        # Дисперсия по отклонениям от среднего, а не по сумме квадратов - без потери точности
+        variance = float(counts @ (SCORE_VALUES - avg_score) ** 2) / stud_count
+        return [stud_count, int(present[-1]), int(present[0]), avg_score, variance ** 0.5, variance]
+
+    def percentile(self, key: str, q: float) -> float:
+        return self.histogram(key).percentile(q)
+
+    def all_stats(self) -> Dict[str, List[float]]:
+        # Статистика всех групп матричными операциями
+        counts = self.counts[:len(self.keys)].astype(np.int64)
+        stud_count = counts.sum(axis=1)
+        present = stud_count > 0
+        safe_count = np.where(present, stud_count, 1)
+        avg_score = counts @ SCORE_VALUES / safe_count
+        variance = (counts * (SCORE_VALUES[None, :] - avg_score[:, None]) ** 2).sum(axis=1) / safe_count
+        nonzero = counts > 0
+        min_score = nonzero.argmax(axis=1)
+        max_score = SCORE_BUCKETS - 1 - nonzero[:, ::-1].argmax(axis=1)
+        return {
+            key: [int(stud_count[row]), int(max_score[row]), int(min_score[row]),
+                  float(avg_score[row]), float(np.sqrt(variance[row])), float(variance[row])]
+            for row, key in enumerate(self.keys) if present[row]
+        }
+
+    def save(self, path: str):
+        # Несжатый .npz: загрузка - чтение готовых массивов без разбора. Файл подменяется атомарно,
+        # чтобы другие процессы не прочитали его наполовину записанным
+        generation, updated_at = self.version or (-1, None)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, keys=np.asarray(self.keys, dtype=str), counts=self.counts[:len(self.keys)],
+                     generation=generation, updated_at=updated_at.isoformat() if updated_at else '')
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, kind: str, path: str) -> 'ScoreMatrix':
+        with np.load(path, allow_pickle=False) as data:
+            generation, updated_at = int(data['generation']), str(data['updated_at'])
+            version = (generation, parse_datetime(updated_at)) if updated_at else None
+            return cls(kind, data['keys'].tolist(), data['counts'], version)
+
+
+_matrices: Dict[str, LiveStructure] = {}
+_matrices_lock = threading.Lock()
+
+
+def get_matrix_path(kind: str) -> Optional[str]:
+    directory = getattr(settings, 'SCORE_MATRIX_DIR', None)
+    return os.path.join(directory, f'score_matrix_{kind}.npz') if directory else None
+
+
+def build_matrix(kind: str, save: bool = False) -> ScoreMatrix:
+    matrix = ScoreMatrix.from_buckets(kind)
+    path = get_matrix_path(kind)
+    if save and path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        matrix.save(path)
+    return matrix
+
+
+def load_matrix(kind: str) -> ScoreMatrix:
+    # Файл пишет команда build_score_matrix - он ускоряет старт воркеров, пока данные не менялись
+    path = get_matrix_path(kind)
+    if path and os.path.exists(path):
+        matrix = ScoreMatrix.load(kind, path)
+        if matrix.version == get_data_version():
+            return matrix
+    return build_matrix(kind)
+
+
+def apply_change(matrix: ScoreMatrix, old: Optional[dict], new: Optional[dict]):
+    if old is not None:
+        matrix.add(old[matrix.kind], old['score'], -1)
+    if new is not None:
+        matrix.add(new[matrix.kind], new['score'], 1)
+
+
+def get_score_matrix(kind: str) -> ScoreMatrix:
+    # Матрица процесса догоняет версию данных по журналу изменений (см. changes.LiveStructure);
+    # при первом обращении загружается из файла той же версии или строится по ScoreBucket
+    live = _matrices.get(kind)
+    if live is None:
+        with _matrices_lock:
+            live = _matrices.setdefault(kind, LiveStructure(partial(load_matrix, kind), apply_change))
+    return live.get()
+
+
+def clear_matrices():
+    with _matrices_lock:
+        _matrices.clear()
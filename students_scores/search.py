@@ -0,0 +1,118 @@
+import threading
+from bisect import bisect_left, insort
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import connection
+from .changes import LiveStructure
+from .data_version import get_data_version
+from .models import ScoreSummary
+
+SEARCH_KINDS = (ScoreSummary.KIND_STUDENT, ScoreSummary.KIND_DISCIPLINE)
+
+
+def fold(value: str) -> str:
+    # Поиск без учета регистра и различия е/ё
+    return value.casefold().replace('ё', 'е')
+
+
+def word_keys(name: str) -> List[str]:
+    # Имя находится по началу любого слова: "андр" находит "Петров Андрей"
+    folded = fold(name)
+    return [folded[i:] for i, char in enumerate(folded) if not char.isspace() and (i == 0 or folded[i - 1].isspace())]
+
+
+class PrefixIndex:
+    # Отсортированный список (ключ, имя) для каждого начала слова в имени. Подсказки по префиксу -
+    # бинарный поиск первого ключа >= префикса и проход вперед, пока ключи с него начинаются.
+    # Число строк Student с каждым именем хранится рядом: имя удаляется из индекса вместе с последней строкой
+    def __init__(self, counts: Dict[str, int] = None, version=None, kind: str = ScoreSummary.KIND_STUDENT):
+        self.kind = kind
+        self.counts = {name: count for name, count in (counts or {}).items() if count > 0}
+        self.entries = sorted((key, name) for name in self.counts for key in word_keys(name))
+        self.version = version
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_summaries(cls, kind: str) -> 'PrefixIndex':
+        version = get_data_version()
+        rows = ScoreSummary.objects.filter(kind=kind, count__gt=0).values_list('key', 'count')
+        return cls(dict(rows), version, kind)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, name: str, delta: int = 1):
+        with self._lock:
+            count = self.counts.get(name, 0)
+            if count + delta > 0:
+                self.counts[name] = count + delta
+                if not count:
+                    for key in word_keys(name):
+                        insort(self.entries, (key, name))
+            elif count:
+                del self.counts[name]
+                for key in word_keys(name):
+                    del self.entries[bisect_left(self.entries, (key, name))]
+
+    def complete(self, prefix: str, limit: int) -> List[str]:
+        prefix = fold(prefix).strip()
+        if not prefix or limit <= 0:
+            return []
+        result, seen = [], set()
+        with self._lock:
+            position = bisect_left(self.entries, (prefix, ''))
+            while position < len(self.entries) and len(result) < limit:
+                key, name = self.entries[position]
+                if not key.startswith(prefix):
+                    break
+                if name not in seen:
+                    seen.add(name)
+                    result.append(name)
+                position += 1
+        return result
+
+
+def apply_change(index: PrefixIndex, old: Optional[dict], new: Optional[dict]):
+    if old is not None:
+        index.add(old[index.kind], -1)
+    if new is not None:
+        index.add(new[index.kind], 1)
+
+
+_indexes: Dict[str, LiveStructure] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(kind: str, version: Optional[Tuple] = None) -> PrefixIndex:
+    # Как рейтинг: индекс процесса догоняет версию данных по журналу изменений
+    live = _indexes.get(kind)
+    if live is None:
+        with _indexes_lock:
+            live = _indexes.setdefault(kind, LiveStructure(partial(PrefixIndex.from_summaries, kind), apply_change))
+    return live.get(version)
+
+
+def clear_indexes():
+    with _indexes_lock:
+        _indexes.clear()
+
+
+def trigram_search(kind: str, query: str, limit: int) -> List[str]:
+    # Нечеткий поиск по опечаткам на PostgreSQL (pg_trgm, GIN-индекс из миграции 0008): оператор %
+    # отбирает ключи по индексу, порядок - по убыванию сходства. На других СУБД и без SEARCH_TRIGRAM - пусто
+    if connection.vendor != 'postgresql' or not getattr(settings, 'SEARCH_TRIGRAM', False):
+        return []
+    table = connection.ops.quote_name(ScoreSummary._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT key FROM {table} WHERE kind = %s AND count > 0 AND key %% %s '
+                       f'ORDER BY similarity(key, %s) DESC, key LIMIT %s', [kind, query, query, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def suggest(kind: str, query: str, limit: int, version: Optional[Tuple] = None) -> List[str]:
+    # Сначала совпадения по префиксу из памяти; если их меньше limit - добираем нечеткими совпадениями
+    result = get_index(kind, version).complete(query, limit)
+    if len(result) < limit and len(query.strip()) >= 3:
+        result += [name for name in trigram_search(kind, query.strip(), limit) if name not in result]
+    return result[:limit]
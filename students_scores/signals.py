@@ -0,0 +1,72 @@
+from typing import Optional
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Student, StudentWithDebts, DebtsRefreshState
+from . import cache, changes, summary
+
+
+@receiver(pre_save, sender=Student)
+def remember_old_score(sender, instance, **kwargs):
+    # Запоминаем прежние значения, чтобы при обновлении вычесть их из ScoreSummary
+    instance._summary_old = None
+    if instance.pk is not None:
+        instance._summary_old = Student.objects.filter(pk=instance.pk).values('name', 'discipline', 'score').first()
+
+
+@receiver(post_save, sender=Student)
+def update_summary_on_save(sender, instance, created, **kwargs):
+    old = getattr(instance, '_summary_old', None)
+    if old is not None:
+        summary.remove_student(old['name'], old['discipline'], old['score'])
+    summary.add_student(instance.name, instance.discipline, instance.score)
+
+
+@receiver(post_delete, sender=Student)
+def update_summary_on_delete(sender, instance, **kwargs):
+    summary.remove_student(instance.name, instance.discipline, instance.score)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_cache(sender, instance, **kwargs):
+    # Вытесняются только записи затронутых студента и дисциплины (в том числе прежних, если они изменились).
+    # Версии меняются после фиксации транзакции, чтобы в кэш не попали данные до нее.
+    # Подключается раньше журнала изменений: новое поколение данных появляется уже после смены версий,
+    # иначе LRU процесса мог бы сохранить под ним старое значение из общего кэша
+    old = getattr(instance, '_summary_old', None) or {}
+    names = [instance.name] + ([old['name']] if old else [])
+    disciplines = [instance.discipline] + ([old['discipline']] if old else [])
+    transaction.on_commit(lambda: cache.invalidate_students(names=names, disciplines=disciplines))
+
+
+def on_commit_change(old: Optional[dict], new: Optional[dict]):
+    # Изменение пишется в журнал в транзакции записи и после фиксации получает новое поколение данных.
+    # Матрица гистограмм, рейтинг и индекс подсказок догоняют журнал при чтении в каждом процессе
+    change = changes.log_change(old, new)
+    transaction.on_commit(lambda: changes.assign_generation(change))
+
+
+@receiver(post_save, sender=Student)
+def update_in_memory_on_save(sender, instance, **kwargs):
+    old = getattr(instance, '_summary_old', None)
+    on_commit_change(old, {'name': instance.name, 'discipline': instance.discipline, 'score': instance.score})
+
+
+@receiver(post_delete, sender=Student)
+def update_in_memory_on_delete(sender, instance, **kwargs):
+    on_commit_change({'name': instance.name, 'discipline': instance.discipline, 'score': instance.score}, None)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def mark_debts_dirty(sender, **kwargs):
+    # Список должников обновится при следующем проходе refresh_debts
+    if not DebtsRefreshState.objects.filter(pk=1).update(dirty=True):
+        DebtsRefreshState.objects.get_or_create(pk=1, defaults={'dirty': True})
+
+
+@receiver(post_save, sender=StudentWithDebts)
+@receiver(post_delete, sender=StudentWithDebts)
+def invalidate_debts_cache(sender, **kwargs):
+    transaction.on_commit(lambda: cache.invalidate(cache.KIND_DEBTS))
@@ -0,0 +1,200 @@
+import json
+import os
+import shutil
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from .data_version import get_data_version
+from .models import DEBT_SCORE, Student, ScoreSummary
+
+# Столбцы со словарным кодированием: строки заменяются номерами в отсортированном словаре
+DICTIONARY_COLUMNS = (ScoreSummary.KIND_STUDENT, ScoreSummary.KIND_DISCIPLINE)
+CURRENT_FILE = 'CURRENT'
+
+
+class Snapshot:
+    # Колоночный снимок Student в .npy: id, коды name/discipline (int32), score (uint8), словари и
+    # индексы групп. Массивы открываются через mmap, поэтому все процессы делят одну копию в page cache
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as file:
+            self.meta = json.load(file)
+        self.version = (self.meta['generation'], parse_datetime(self.meta['updated_at']))
+        self.ids = self._load('id')
+        self.scores = self._load('score')
+        self.debt_ids = self._load('debt_ids')
+        self.debt_rows = self._load('debt_rows')
+        self.codes = {column: self._load(column) for column in DICTIONARY_COLUMNS}
+        self.dictionaries = {column: self._load(f'{column}_dict') for column in DICTIONARY_COLUMNS}
+        self.orders = {column: self._load(f'{column}_order') for column in DICTIONARY_COLUMNS}
+        self.offsets = {column: self._load(f'{column}_offsets') for column in DICTIONARY_COLUMNS}
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get_code(self, column: str, value: str) -> Optional[int]:
+        # Словарь отсортирован - поиск кода за O(log n)
+        dictionary = self.dictionaries[column]
+        code = int(np.searchsorted(dictionary, value))
+        if code < len(dictionary) and dictionary[code] == value:
+            return code
+        return None
+
+    def group_rows(self, column: str, value: str) -> np.ndarray:
+        # Номера строк группы: отрезок перестановки, упорядоченной по коду, - O(размер группы)
+        code = self.get_code(column, value)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        offsets = self.offsets[column]
+        return np.asarray(self.orders[column][offsets[code]:offsets[code + 1]])
+
+    def group_scores(self, column: str, value: str) -> np.ndarray:
+        return self.scores[self.group_rows(column, value)].astype(np.int64)
+
+    def debts_page(self, after: int, size: int) -> Tuple[List[dict], Optional[int]]:
+        # Keyset-пагинация по id среди строк с задолженностью, как get_keyset_page
+        start = int(np.searchsorted(self.debt_ids, after, side='right'))
+        rows = np.asarray(self.debt_rows[start:start + size + 1])
+        page = [{'id': int(self.ids[row]),
+                 'name': str(self.dictionaries['name'][self.codes['name'][row]]),
+                 'discipline': str(self.dictionaries['discipline'][self.codes['discipline'][row]]),
+                 'score': int(self.scores[row])} for row in rows[:size]]
+        next_after = page[-1]['id'] if len(rows) > size else None
+        return page, next_after
+
+
+def _encode(values: List[str], codes: array) -> Tuple[np.ndarray, np.ndarray]:
+    # Коды выдавались в порядке появления; перенумеровываем их в порядке отсортированного словаря
+    dictionary = np.array(values, dtype=str) if values else np.empty(0, dtype='<U1')
+    order = np.argsort(dictionary, kind='stable')
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    return dictionary[order], rank[np.frombuffer(codes, dtype=np.int32)] if len(codes) else np.empty(0, np.int32)
+
+
+def _group_index(codes: np.ndarray, groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(codes, kind='stable')
+    offsets = np.zeros(groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=groups), out=offsets[1:])
+    return order.astype(np.int64), offsets
+
+
+def write_snapshot(directory: str, chunk_size: int = 10000, keep: int = 2) -> Snapshot:
+    # Снимок пишется в новый подкаталог, затем атомарно подменяется указатель CURRENT:
+    # процессы, открывшие прежний снимок, дочитывают его, новые открывают уже новый
+    version = get_data_version()
+    ids, scores = array('q'), array('q')
+    codes = {column: array('i') for column in DICTIONARY_COLUMNS}
+    lookups: Dict[str, Dict[str, int]] = {column: {} for column in DICTIONARY_COLUMNS}
+
+    rows = Student.objects.order_by('id').values_list('id', 'name', 'discipline', 'score')
+    for row_id, name, discipline, score in rows.iterator(chunk_size=chunk_size):
+        ids.append(row_id)
+        scores.append(score)
+        for column, value in zip(DICTIONARY_COLUMNS, (name, discipline)):
+            lookup = lookups[column]
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(lookup)
+            codes[column].append(code)
+
+    snapshot_name = f'{version[0]}-{time.time_ns()}'
+    path = os.path.join(directory, snapshot_name)
+    os.makedirs(path)
+    score_array = np.frombuffer(scores, dtype=np.int64) if len(scores) else np.empty(0, dtype=np.int64)
+    score_dtype = np.uint8 if not len(score_array) or score_array.max() <= np.iinfo(np.uint8).max else np.uint16
+    id_array = np.frombuffer(ids, dtype=np.int64) if len(ids) else np.empty(0, dtype=np.int64)
+    debt_rows = np.flatnonzero(score_array < DEBT_SCORE)
+    np.save(os.path.join(path, 'id.npy'), id_array)
+    np.save(os.path.join(path, 'score.npy'), score_array.astype(score_dtype))
+    np.save(os.path.join(path, 'debt_rows.npy'), debt_rows.astype(np.int64))
+    np.save(os.path.join(path, 'debt_ids.npy'), id_array[debt_rows])
+    for column in DICTIONARY_COLUMNS:
+        dictionary, column_codes = _encode(list(lookups[column]), codes[column])
+        order, offsets = _group_index(column_codes, len(dictionary))
+        np.save(os.path.join(path, f'{column}.npy'), column_codes)
+        np.save(os.path.join(path, f'{column}_dict.npy'), dictionary)
+        np.save(os.path.join(path, f'{column}_order.npy'), order)
+        np.save(os.path.join(path, f'{column}_offsets.npy'), offsets)
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as file:
+        json.dump({'generation': version[0], 'updated_at': version[1].isoformat(), 'rows': len(id_array),
+                   'score_dtype': np.dtype(score_dtype).name}, file)
+
+    current = os.path.join(directory, CURRENT_FILE)
+    with open(f'{current}.tmp', 'w') as file:
+        file.write(snapshot_name)
+    os.replace(f'{current}.tmp', current)
+    prune_snapshots(directory, keep)
+    return Snapshot(path)
+
+
+def prune_snapshots(directory: str, keep: int):
+    # Удаляются только дописанные снимки (с meta.json), которые старше текущего: снимок, который
+    # еще пишет другой процесс, не трогается. Открытые через mmap файлы остаются доступны до закрытия
+    current_path = get_current_path(directory)
+    if current_path is None:
+        return
+    try:
+        current_time = os.stat(os.path.join(current_path, 'meta.json')).st_mtime_ns
+    except FileNotFoundError:
+        return
+    previous = []
+    for entry in os.scandir(directory):
+        if not entry.is_dir() or entry.path == current_path:
+            continue
+        try:
+            meta_time = os.stat(os.path.join(entry.path, 'meta.json')).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        if meta_time <= current_time:
+            previous.append((meta_time, entry.path))
+    previous.sort()
+    for _, path in previous[:max(len(previous) - (keep - 1), 0)]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+_snapshot: Optional[Snapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_current_path(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as file:
+            return os.path.join(directory, file.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def get_snapshot() -> Optional[Snapshot]:
+    # Снимок процесса, если он совпадает с версией данных в БД. Устаревший снимок отклоняется - тогда
+    # вызывающий код читает БД; новый снимок пишет команда build_snapshot (--interval - в фоне)
+    global _snapshot
+    directory = getattr(settings, 'SNAPSHOT_DIR', '')
+    if not directory:
+        return None
+    version = get_data_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _snapshot_lock:
+        if _snapshot is not None and _snapshot.version == version:
+            return _snapshot
+        path = get_current_path(directory)
+        if path is not None and (_snapshot is None or _snapshot.path != path):
+            _snapshot = Snapshot(path)
+        if _snapshot is None or _snapshot.version != version:
+            return None
+        return _snapshot
+
+
+def clear_snapshot():
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
@@ -0,0 +1,148 @@
+from typing import List
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import QuerySet, Count, Max, Min, Avg, Sum, StdDev, Variance, F
+from . import metrics
+from .models import Student, ScoreSummary
+from .score_matrix import get_score_matrix
+from .snapshot import get_snapshot
+
+# Источники статистики групп. Отдельно от представлений: отчет и команды используют их без views
+
+STATS_FIELDS = ('count', 'max', 'min', 'mean', 'std', 'var')
+
+
+# Паттерн Adapter (start)
+class DataAdapter:
+    def __init__(self, queryset: QuerySet):
+        self.queryset = queryset
+
+    def get_scores(self) -> List[int]:
+        scores = [entry['score'] for entry in self.queryset.values('score')]
+        metrics.add_rows(len(scores))
+        return scores
+
+
+class StatsCalculator:
+    def calculate_stats(self, scores: List[int]) -> List[float]:
+        with metrics.timed('stats_numpy'):
+            return self._calculate_stats(scores)
+
+    def _calculate_stats(self, scores: List[int]) -> List[float]:
+        stud_count = len(scores)
+        # Вычисляем максимальную, минимальную и среднюю оценку по дисциплинам
+        max_score = np.max(scores)
+        min_score = np.min(scores)
+        avg_score = np.mean(scores)
+        # Вычисляем стандартное отклонение баллов
+        std_dev = np.std(scores)
+        # Вычисляем дисперсию баллов
+        variance = np.var(scores)
+        return [stud_count, max_score, min_score, avg_score, std_dev, variance]
+
+    def calculate_queryset_stats(self, queryset: QuerySet) -> List[float]:
+        data_adapter = DataAdapter(queryset)
+        scores = data_adapter.get_scores()
+        return self.calculate_stats(scores)
+
+    def calculate_group_stats(self, field: str, value: str) -> List[float]:
+        queryset = Student.objects.filter(**{field: value})
+        return self.calculate_queryset_stats(queryset)
+
+
+def stats_from_sums(stud_count: int, total: int, total_sq: int, max_score: int, min_score: int) -> List[float]:
+    # Среднее, дисперсия и стандартное отклонение по накопленным суммам (генеральная совокупность, как в np.var)
+    avg_score = total / stud_count
+    variance = max(total_sq / stud_count - avg_score ** 2, 0.0)
+    std_dev = variance ** 0.5
+    return [stud_count, max_score, min_score, avg_score, std_dev, variance]
+
+
+class DatabaseStatsCalculator(StatsCalculator):
+    # Вся статистика считается одним агрегирующим запросом на стороне БД, без выгрузки оценок в Python
+    def calculate_queryset_stats(self, queryset: QuerySet) -> List[float]:
+        if connection.vendor == 'postgresql':
+            # STDDEV_POP / VAR_POP
+            result = queryset.aggregate(
+                stud_count=Count('score'), max_score=Max('score'), min_score=Min('score'),
+                avg_score=Avg('score'), std_dev=StdDev('score'), variance=Variance('score'),
+            )
+            if not result['stud_count']:
+                return []
+            return [result['stud_count'], result['max_score'], result['min_score'],
+                    result['avg_score'], result['std_dev'], result['variance']]
+
+        # Для SQLite (тесты) считаем суммы и сумму квадратов, остальное досчитываем в Python
+        result = queryset.aggregate(
+            stud_count=Count('score'), max_score=Max('score'), min_score=Min('score'),
+            total=Sum('score'), total_sq=Sum(F('score') * F('score')),
+        )
+        if not result['stud_count']:
+            return []
+        return stats_from_sums(result['stud_count'], result['total'], result['total_sq'],
+                               result['max_score'], result['min_score'])
+
+
+class SummaryStatsCalculator(StatsCalculator):
+    # Статистика за O(1) по предрассчитанным суммам из ScoreSummary, без сканирования Student
+    def calculate_group_stats(self, field: str, value: str) -> List[float]:
+        summary = ScoreSummary.objects.filter(kind=field, key=value).first()
+        if summary is None or not summary.count:
+            return []
+        return stats_from_sums(summary.count, summary.total, summary.total_sq,
+                               summary.max_score, summary.min_score)
+
+
+class MatrixStatsCalculator(StatsCalculator):
+    # Статистика за O(101) по строке матрицы гистограмм в памяти процесса (сортировка подсчетом)
+    def calculate_group_stats(self, field: str, value: str) -> List[float]:
+        return get_score_matrix(field).stats(value)
+
+
+class SnapshotStatsCalculator(StatsCalculator):
+    # Оценки группы читаются из снимка в mmap; если снимка нет или он устарел - из ScoreSummary
+    def calculate_group_stats(self, field: str, value: str) -> List[float]:
+        snapshot = get_snapshot()
+        if snapshot is None:
+            return SummaryStatsCalculator().calculate_group_stats(field, value)
+        scores = snapshot.group_scores(field, value)
+        return self.calculate_stats(scores) if len(scores) else []
+
+
+STATS_BACKENDS = {
+    'numpy': StatsCalculator,
+    'database': DatabaseStatsCalculator,
+    'summary': SummaryStatsCalculator,
+    'matrix': MatrixStatsCalculator,
+    'snapshot': SnapshotStatsCalculator,
+}
+
+
+def get_stats_calculator() -> StatsCalculator:
+    backend = getattr(settings, 'STATS_BACKEND', 'summary')
+    if backend not in STATS_BACKENDS:
+        raise ValueError(f'Unknown STATS_BACKEND: {backend}')
+    return STATS_BACKENDS[backend]()
+
+
+class StudentStats:
+    def __init__(self, name: str, stats_calculator: StatsCalculator):
+        self.name = name
+        self.stats_calculator = stats_calculator
+
+    def calculate_student_stats(self) -> List[float]:
+        with metrics.timed('stats'):
+            return self.stats_calculator.calculate_group_stats(ScoreSummary.KIND_STUDENT, self.name)
+
+
+class DisciplineStats:
+    def __init__(self, discipline_name: str, stats_calculator: StatsCalculator):
+        self.discipline_name = discipline_name
+        self.stats_calculator = stats_calculator
+
+    def calculate_discipline_stats(self) -> List[float]:
+        with metrics.timed('stats'):
+            return self.stats_calculator.calculate_group_stats(ScoreSummary.KIND_DISCIPLINE, self.discipline_name)
+
+# Паттерн Adapter (end)
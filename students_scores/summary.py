@@ -0,0 +1,178 @@
+from typing import Dict, Iterable, List, Tuple
+from django.db import transaction, IntegrityError
+from django.db.models import Count, Max, Min, Sum, F, Value
+from django.db.models.functions import Greatest, Least
+from .histogram import ScoreHistogram
+from .models import Student, ScoreSummary, ScoreBucket
+
+SUMMARY_KINDS = (ScoreSummary.KIND_STUDENT, ScoreSummary.KIND_DISCIPLINE)
+SUMMARY_FIELDS = ('count', 'total', 'total_sq', 'min_score', 'max_score')
+
+
+def _increment_summary(kind: str, key: str, score: int) -> int:
+    return ScoreSummary.objects.filter(kind=kind, key=key).update(
+        count=F('count') + 1,
+        total=F('total') + score,
+        total_sq=F('total_sq') + score * score,
+        min_score=Least(F('min_score'), Value(score)),
+        max_score=Greatest(F('max_score'), Value(score)),
+    )
+
+
+def add_bucket(kind: str, key: str, score: int, delta: int):
+    if ScoreBucket.objects.filter(kind=kind, key=key, score=score).update(count=F('count') + delta):
+        if delta < 0:
+            ScoreBucket.objects.filter(kind=kind, key=key, score=score, count__lte=0).delete()
+        return
+    if delta <= 0:
+        return
+    try:
+        with transaction.atomic():
+            ScoreBucket.objects.create(kind=kind, key=key, score=score, count=delta)
+    except IntegrityError:
+        add_bucket(kind, key, score, delta)
+
+
+def add_score(kind: str, key: str, score: int):
+    updated = _increment_summary(kind, key, score)
+    add_bucket(kind, key, score, 1)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            ScoreSummary.objects.create(kind=kind, key=key, count=1, total=score, total_sq=score * score,
+                                        min_score=score, max_score=score)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос - просто увеличиваем ее (ячейка гистограммы уже учтена)
+        _increment_summary(kind, key, score)
+
+
+def remove_score(kind: str, key: str, score: int):
+    add_bucket(kind, key, score, -1)
+    ScoreSummary.objects.filter(kind=kind, key=key).update(
+        count=F('count') - 1,
+        total=F('total') - score,
+        total_sq=F('total_sq') - score * score,
+    )
+    summary = ScoreSummary.objects.filter(kind=kind, key=key).first()
+    if summary is None:
+        return
+    if summary.count <= 0:
+        summary.delete()
+    elif score in (summary.min_score, summary.max_score):
+        # Минимум и максимум нельзя "вычесть", пересчитываем их только для этой группы
+        result = Student.objects.filter(**{kind: key}).aggregate(min_score=Min('score'), max_score=Max('score'))
+        # При массовом удалении строки группы уже удалены, а сигналы еще приходят - тогда группа
+        # обнулится на последнем сигнале, и пересчитывать нечего
+        if result['min_score'] is not None:
+            ScoreSummary.objects.filter(pk=summary.pk).update(**result)
+
+
+def add_student(name: str, discipline: str, score: int):
+    add_score(ScoreSummary.KIND_STUDENT, name, score)
+    add_score(ScoreSummary.KIND_DISCIPLINE, discipline, score)
+
+
+def remove_student(name: str, discipline: str, score: int):
+    remove_score(ScoreSummary.KIND_STUDENT, name, score)
+    remove_score(ScoreSummary.KIND_DISCIPLINE, discipline, score)
+
+
+def compute_summaries(kind: str, keys: Iterable[str] = None) -> Dict[Tuple[str, str], Tuple[int, ...]]:
+    # Суммы по группам одним GROUP BY запросом к Student
+    queryset = Student.objects.all()
+    if keys is not None:
+        queryset = queryset.filter(**{f'{kind}__in': list(keys)})
+    rows = queryset.values(kind).annotate(
+        count=Count('score'), total=Sum('score'), total_sq=Sum(F('score') * F('score')),
+        min_score=Min('score'), max_score=Max('score'),
+    ).order_by()
+    return {(kind, row[kind]): tuple(row[field] for field in SUMMARY_FIELDS) for row in rows}
+
+
+def compute_buckets(kind: str, keys: Iterable[str] = None) -> Dict[Tuple[str, str], Dict[int, int]]:
+    # Гистограммы групп одним GROUP BY (группа, балл)
+    queryset = Student.objects.all()
+    if keys is not None:
+        queryset = queryset.filter(**{f'{kind}__in': list(keys)})
+    buckets = {}
+    for key, score, count in queryset.values_list(kind, 'score').annotate(count=Count('id')).order_by():
+        buckets.setdefault((kind, key), {})[score] = count
+    return buckets
+
+
+def refresh_summaries(names: Iterable[str] = (), disciplines: Iterable[str] = ()):
+    # Пересчет групп, затронутых массовой загрузкой (bulk_create/update не отправляют сигналы)
+    with transaction.atomic():
+        for kind, keys in ((ScoreSummary.KIND_STUDENT, set(names)), (ScoreSummary.KIND_DISCIPLINE, set(disciplines))):
+            if not keys:
+                continue
+            summaries = compute_summaries(kind, keys)
+            ScoreSummary.objects.filter(kind=kind, key__in=keys).delete()
+            ScoreSummary.objects.bulk_create(_build_summaries(summaries))
+            ScoreBucket.objects.filter(kind=kind, key__in=keys).delete()
+            ScoreBucket.objects.bulk_create(_build_buckets(compute_buckets(kind, keys)), batch_size=1000)
+
+
+def rebuild_summaries() -> int:
+    # Полное перестроение таблицы с нуля
+    with transaction.atomic():
+        ScoreSummary.objects.all().delete()
+        ScoreBucket.objects.all().delete()
+        summaries = {}
+        for kind in SUMMARY_KINDS:
+            summaries.update(compute_summaries(kind))
+            ScoreBucket.objects.bulk_create(_build_buckets(compute_buckets(kind)), batch_size=1000)
+        ScoreSummary.objects.bulk_create(_build_summaries(summaries), batch_size=1000)
+    return len(summaries)
+
+
+def find_drift() -> List[Tuple[str, str]]:
+    # Список групп, в которых ScoreSummary расходится с фактическими данными Student
+    expected = {}
+    for kind in SUMMARY_KINDS:
+        expected.update(compute_summaries(kind))
+    actual = {
+        (row['kind'], row['key']): tuple(row[field] for field in SUMMARY_FIELDS)
+        for row in ScoreSummary.objects.values('kind', 'key', *SUMMARY_FIELDS)
+    }
+    keys = set(expected) | set(actual)
+    drift = {key for key in keys if expected.get(key) != actual.get(key)}
+
+    # Расхождения в гистограммах
+    expected_buckets = {}
+    for kind in SUMMARY_KINDS:
+        expected_buckets.update(compute_buckets(kind))
+    actual_buckets = {}
+    for kind, key, score, count in ScoreBucket.objects.values_list('kind', 'key', 'score', 'count'):
+        actual_buckets.setdefault((kind, key), {})[score] = count
+    keys = set(expected_buckets) | set(actual_buckets)
+    drift.update(key for key in keys if expected_buckets.get(key) != actual_buckets.get(key))
+    return sorted(drift)
+
+
+def _build_summaries(summaries: Dict[Tuple[str, str], Tuple[int, ...]]) -> List[ScoreSummary]:
+    return [
+        ScoreSummary(kind=kind, key=key, **dict(zip(SUMMARY_FIELDS, values)))
+        for (kind, key), values in summaries.items()
+    ]
+
+
+def _build_buckets(buckets: Dict[Tuple[str, str], Dict[int, int]]) -> List[ScoreBucket]:
+    return [
+        ScoreBucket(kind=kind, key=key, score=score, count=count)
+        for (kind, key), counts in buckets.items() for score, count in counts.items()
+    ]
+
+
+def get_histogram(kind: str, key: str) -> ScoreHistogram:
+    # Гистограмма группы из ScoreBucket: не больше 101 строки, без сканирования Student
+    return ScoreHistogram.from_buckets(ScoreBucket.objects.filter(kind=kind, key=key).values_list('score', 'count'))
+
+
+def get_merged_histogram(kind: str, keys: Iterable[str] = None) -> ScoreHistogram:
+    # Сумма гистограмм нескольких групп (или всех групп данного вида) одним GROUP BY по баллу
+    queryset = ScoreBucket.objects.filter(kind=kind)
+    if keys is not None:
+        queryset = queryset.filter(key__in=list(keys))
+    return ScoreHistogram.from_buckets(queryset.values_list('score').annotate(total=Sum('count')).order_by())
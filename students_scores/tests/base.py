@@ -0,0 +1,10 @@
+from django.core.cache import cache
+from django.test import TestCase
+from students_scores.cache import local_cache
+
+
+class CacheTestCase(TestCase):
+    # Кэш не откатывается вместе с транзакцией теста, поэтому каждый тест начинается с пустого
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
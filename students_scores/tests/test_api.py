@@ -0,0 +1,112 @@
+import json
+from django.test import TestCase, Client
+from unittest import mock
+from students_scores.cache import get_counters, local_cache
+from students_scores.tests.base import CacheTestCase
+from django.urls import reverse
+from students_scores.models import Student
+from students_scores.views import refresh_students_with_debts
+
+
+class StatsApiTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        self.student = Student.objects.create(name='Петров Андрей', discipline='Физика', score=85)
+        Student.objects.create(name='Петров Андрей', discipline='Информатика', score=55)
+
+    # Статистика студента в JSON с заголовками кэширования
+    def test_student_stats(self):
+        response = self.client.get(reverse('api_student_stats', args=['Петров Андрей']))
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['stats']['count'], 2)
+        self.assertEqual(data['stats']['mean'], 70.0)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('max-age', response['Cache-Control'])
+
+    # Повторный запрос с If-None-Match получает 304, пока данные не изменились
+    def test_conditional_request(self):
+        url = reverse('api_discipline_stats', args=['Физика'])
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.score = 90
+            self.student.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['stats']['max'], 90)
+
+    # Повторный запрос берется из LRU процесса без обращения к общему кэшу, запись в Student меняет ключ
+    def test_local_cache(self):
+        url = reverse('api_student_stats', args=['Петров Андрей'])
+        self.client.get(url)
+        hits = get_counters()['student']['local_hits']
+
+        with mock.patch('students_scores.cache.get_cache') as get_cache:
+            self.assertEqual(json.loads(self.client.get(url).content)['stats']['count'], 2)
+        get_cache.assert_not_called()
+        self.assertEqual(get_counters()['student']['local_hits'], hits + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(name='Петров Андрей', discipline='Химия', score=70)
+        self.assertEqual(json.loads(self.client.get(url).content)['stats']['count'], 3)
+        self.assertEqual(len(local_cache), 2)
+
+    # Несуществующий студент и запрещенный метод
+    def test_not_found_and_post(self):
+        url = reverse('api_student_stats', args=['Не существующий'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(url).status_code, 405)
+
+    # Список должников
+    def test_debts(self):
+        refresh_students_with_debts()
+        response = self.client.get(reverse('api_debts'))
+        data = json.loads(response.content)
+        self.assertEqual(data['results'], [{'name': 'Петров Андрей', 'discipline': 'Информатика', 'score': 55}])
+        self.assertEqual(self.client.get(reverse('api_debts'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    # Страница студента доступна GET-запросом
+    def test_info_page_get(self):
+        response = self.client.get(reverse('student_info'), {'student': 'Петров Андрей'})
+        self.assertContains(response, 'Информатика')
+
+
+class BatchStatsApiTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        for i in range(5):
+            Student.objects.create(name=f'Студент {i}', discipline='Физика', score=60 + i)
+            Student.objects.create(name=f'Студент {i}', discipline='Информатика', score=90 - i)
+
+    # Пакетный запрос: по одному запросу к ScoreSummary на тип ключей, отсутствующие помечены явно
+    def test_batch_post(self):
+        payload = {'students': ['Студент 3', 'Нет такого', 'Студент 0'], 'disciplines': ['Физика']}
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('api_batch_stats'), json.dumps(payload),
+                                        content_type='application/json')
+        data = json.loads(response.content)
+
+        self.assertEqual([item['name'] for item in data['students']], ['Студент 3', 'Нет такого', 'Студент 0'])
+        self.assertEqual(data['students'][0]['stats']['mean'], 75.0)
+        self.assertEqual(data['students'][1], {'name': 'Нет такого', 'error': 'not found'})
+        self.assertEqual(data['disciplines'][0]['stats']['count'], 5)
+
+    # Пакетный запрос через GET и проверка ограничений
+    def test_batch_get_and_errors(self):
+        response = self.client.get(reverse('api_batch_stats'), {'discipline': ['Информатика', 'Химия']})
+        data = json.loads(response.content)
+        self.assertEqual(data['students'], [])
+        self.assertEqual(data['disciplines'][1]['error'], 'not found')
+
+        response = self.client.post(reverse('api_batch_stats'), 'не json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        with self.settings(API_BATCH_MAX_ITEMS=1):
+            response = self.client.get(reverse('api_batch_stats'), {'student': ['Студент 1', 'Студент 2']})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from students_scores.benchmarks import compare
+from students_scores.models import Student
+
+
+def make_results(p50_ms, queries, rows=1000):
+    return {'runs': [{'vendor': 'sqlite', 'rows': rows, 'cases': {
+        'view:index': {'p50_ms': p50_ms, 'queries': queries}}}]}
+
+
+class BenchmarkTest(TestCase):
+    # Регрессия - заметный рост медианы или любой рост числа запросов
+    def test_compare(self):
+        baseline = make_results(10.0, 2)
+        self.assertEqual(compare(make_results(12.0, 2), baseline, threshold=0.25), [])
+        self.assertEqual(len(compare(make_results(13.0, 2), baseline, threshold=0.25)), 1)
+        self.assertEqual(len(compare(make_results(10.0, 3), baseline, threshold=0.25)), 1)
+        # Шум на быстрых случаях и прогоны другого размера не сравниваются
+        self.assertEqual(compare(make_results(0.5, 1), make_results(0.3, 1), threshold=0.25), [])
+        self.assertEqual(compare(make_results(100.0, 9, rows=10), baseline, threshold=0.25), [])
+
+    def test_command(self):
+        Student.objects.create(name='Петров Андрей', discipline='Физика', score=85)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('benchmark', '--rows', '300', '--repeat', '2', '--warmup', '0', '--samples', '2',
+                         '--only', 'view:student_info', 'stats:matrix', 'debts:', '--output', output,
+                         stdout=StringIO())
+            with open(output, encoding='utf-8') as file:
+                results = json.load(file)
+            cases = results['runs'][0]['cases']
+            self.assertEqual(set(cases), {'view:student_info', 'stats:matrix:student', 'stats:matrix:discipline',
+                                          'debts:sync_full', 'debts:sync_noop'})
+            self.assertEqual(cases['view:student_info']['queries'], 2)
+
+            # Данные замера откатываются
+            self.assertEqual(list(Student.objects.values_list('name', flat=True)), ['Петров Андрей'])
+
+            for case in cases.values():
+                case['queries'] -= 1
+            with open(output, 'w', encoding='utf-8') as file:
+                json.dump(results, file)
+            with self.assertRaises(CommandError):
+                call_command('benchmark', '--rows', '300', '--repeat', '1', '--warmup', '0', '--samples', '2',
+                             '--only', 'view:student_info', '--baseline', output, stdout=StringIO(), stderr=StringIO())
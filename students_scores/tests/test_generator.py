@@ -0,0 +1,45 @@
+from io import StringIO
+from django.test import TestCase
+from django.core.management import call_command
+from students_scores.DataGenerator import DataGenerator
+from students_scores.models import Student, StudentWithDebts
+from students_scores.summary import find_drift
+
+
+class DataGeneratorTest(TestCase):
+    # Одинаковый seed дает одинаковые данные, разный - разные
+    def test_reproducible(self):
+        first = list(DataGenerator(100, seed=1).records(batch_size=30))
+        self.assertEqual(first, list(DataGenerator(100, seed=1).records(batch_size=7)))
+        self.assertNotEqual(first, list(DataGenerator(100, seed=2).records()))
+
+    # Пары (name, discipline) уникальны даже при полном покрытии всех пар
+    def test_unique_pairs(self):
+        generator = DataGenerator(200, num_names=10, num_disciplines=20)
+        records = list(generator.records())
+        self.assertEqual(len({record[:2] for record in records}), 200)
+        with self.assertRaises(ValueError):
+            DataGenerator(201, num_names=10, num_disciplines=20)
+
+    # Доля должников и диапазон баллов соответствуют параметрам
+    def test_debt_ratio(self):
+        scores = [score for _, _, score in DataGenerator(10000, debt_ratio=0.3, distribution='normal').records()]
+        debt_share = sum(score < 61 for score in scores) / len(scores)
+        self.assertAlmostEqual(debt_share, 0.3, delta=0.03)
+        self.assertTrue(all(20 <= score <= 100 for score in scores))
+
+
+class GenerateScoresCommandTest(TestCase):
+    # Генерация сразу в базу данных с обновлением производных данных
+    def test_generate_into_db(self):
+        call_command('generate_scores', '--records', '500', '--format', 'db', '--debt-ratio', '0.2',
+                     stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Student.objects.count(), 500)
+        self.assertEqual(StudentWithDebts.objects.count(), Student.objects.filter(score__lt=61).count())
+        self.assertEqual(find_drift(), [])
+
+    # Генерация в NDJSON
+    def test_generate_ndjson(self):
+        out = StringIO()
+        call_command('generate_scores', '--records', '3', '--format', 'ndjson', stdout=out, stderr=StringIO())
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
@@ -0,0 +1,86 @@
+import json
+import numpy as np
+from django.test import TestCase, Client
+from students_scores.tests.base import CacheTestCase
+from django.urls import reverse
+from students_scores.histogram import ScoreHistogram
+from students_scores.models import Student, ScoreSummary
+from students_scores.summary import find_drift, get_histogram, get_merged_histogram
+
+
+class ScoreHistogramTest(TestCase):
+    # Перцентили по гистограмме совпадают с np.percentile
+    def test_percentiles_match_numpy(self):
+        rng = np.random.default_rng(0)
+        for size in (1, 2, 7, 1000):
+            scores = rng.integers(0, 101, size)
+            histogram = ScoreHistogram.from_scores(scores)
+            for q in (0, 10, 25, 50, 75, 90, 99, 100):
+                self.assertAlmostEqual(histogram.percentile(q), float(np.percentile(scores, q)))
+
+    # Гистограммы складываются без пересчета исходных оценок
+    def test_merge(self):
+        first = ScoreHistogram.from_scores([50, 70, 95])
+        second = ScoreHistogram.from_scores([61, 99])
+        merged = first + second
+        self.assertEqual(merged.total, 5)
+        self.assertEqual(merged.percentile(50), 70.0)
+        self.assertEqual(first.total, 3)
+
+    # Полосы, оценки и доля задолженностей
+    def test_bands_and_grades(self):
+        histogram = ScoreHistogram.from_scores([40, 60, 61, 75, 76, 91, 100])
+        self.assertEqual([band['count'] for band in histogram.bands()], [2, 1, 2, 0, 2])
+        self.assertEqual([grade['count'] for grade in histogram.grades()], [2, 2, 1, 2])
+        self.assertAlmostEqual(histogram.debt_ratio(), 2 / 7)
+        self.assertTrue(np.isnan(ScoreHistogram().percentile(50)))
+
+
+class ScoreBucketTest(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = Student.objects.create(name='Петров Андрей', discipline='Физика', score=85)
+        Student.objects.create(name='Петров Андрей', discipline='Информатика', score=55)
+        Student.objects.create(name='Сидоров Сергей', discipline='Физика', score=85)
+
+    # Гистограммы поддерживаются сигналами и совпадают с данными Student
+    def test_incremental_buckets(self):
+        self.assertEqual(get_histogram(ScoreSummary.KIND_DISCIPLINE, 'Физика').counts[85], 2)
+        self.student.score = 70
+        self.student.save()
+        histogram = get_histogram(ScoreSummary.KIND_DISCIPLINE, 'Физика')
+        self.assertEqual((histogram.counts[85], histogram.counts[70]), (1, 1))
+        self.student.delete()
+        self.assertEqual(get_histogram(ScoreSummary.KIND_DISCIPLINE, 'Физика').total, 1)
+        self.assertEqual(find_drift(), [])
+
+    # Общая гистограмма - сумма гистограмм дисциплин
+    def test_merged_histogram(self):
+        with self.assertNumQueries(1):
+            histogram = get_merged_histogram(ScoreSummary.KIND_DISCIPLINE)
+        self.assertEqual(histogram.total, 3)
+        self.assertEqual(histogram.percentile(50), 85.0)
+
+    # JSON API распределения
+    def test_distribution_api(self):
+        client = Client()
+        response = client.get(reverse('api_student_distribution', args=['Петров Андрей']), {'p': ['90', 'x']})
+        data = json.loads(response.content)['distribution']
+        self.assertEqual(data['median'], 70.0)
+        self.assertEqual(data['debt_ratio'], 0.5)
+        self.assertEqual(list(data['percentiles']), ['p90'])
+
+        response = client.get(reverse('api_discipline_distribution', args=['Химия']))
+        self.assertEqual(response.status_code, 404)
+
+        data = json.loads(client.get(reverse('api_distribution')).content)['distribution']
+        self.assertEqual(data['count'], 3)
+
+        response = client.get(reverse('api_distribution'), {'discipline': 'Нет такой'})
+        self.assertEqual(response.status_code, 404)
+
+        # Пустая база: квантили - null, ответ остается корректным JSON
+        Student.objects.all().delete()
+        response = client.get(reverse('api_distribution'), {'p': '90'})
+        data = json.loads(response.content, parse_constant=self.fail)['distribution']
+        self.assertEqual((data['count'], data['median'], data['percentiles']), (0, None, {'p90': None}))
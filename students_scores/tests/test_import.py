@@ -0,0 +1,75 @@
+import os
+import tempfile
+from io import StringIO
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.core.management import call_command
+from students_scores.models import Student, StudentWithDebts
+from students_scores.summary import find_drift
+
+
+class ImportScoresCommandTest(TestCase):
+    def setUp(self):
+        Student.objects.create(name='Федотова Елена', discipline='Физика', score=58)
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_file(self, filename, content):
+        path = os.path.join(self.tmpdir.name, filename)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_file(self, path, *args):
+        out = StringIO()
+        call_command('import_scores', path, *args, stdout=out)
+        return out.getvalue()
+
+    # Загрузка CSV с обновлением существующей оценки и пропуском некорректных строк
+    def test_import_csv_upsert(self):
+        path = self.write_file('scores.csv', 'name,discipline,score\n'
+                                             'Федотова Елена,Физика,75\n'
+                                             'Королёв Егор,Физика,40\n'
+                                             'Королёв Егор,Информатика,не число\n')
+        out = self.import_file(path, '--batch-size', '1')
+
+        self.assertIn('Загружено строк: 2, пропущено: 1 (новых: 1, обновлено: 1)', out)
+        self.assertEqual(sorted(Student.objects.values_list('name', 'score')),
+                         [('Королёв Егор', 40), ('Федотова Елена', 75)])
+        self.assertEqual(find_drift(), [])
+
+    # Баллы вне 0-100 пропускаются и не доходят до матрицы и гистограмм; в БД их не пускает ограничение
+    def test_import_skips_out_of_range_scores(self):
+        path = self.write_file('scores.csv', 'name,discipline,score\n'
+                                             'Королёв Егор,Физика,100\n'
+                                             'Королёв Егор,Информатика,150\n'
+                                             'Королёв Егор,Химия,-1\n')
+        out = self.import_file(path)
+
+        self.assertIn('Загружено строк: 1, пропущено: 2', out)
+        self.assertEqual(Student.objects.get(name='Королёв Егор').score, 100)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Student.objects.create(name='Королёв Егор', discipline='Информатика', score=150)
+
+    # Производные данные обновляются после загрузки
+    def test_import_updates_derived_data(self):
+        path = self.write_file('scores.ndjson', '{"name": "Королёв Егор", "discipline": "Физика", "score": 40}\n'
+                                                '{"name": "Королёв Егор", "discipline": "Физика", "score": 45}\n')
+        self.import_file(path)
+
+        self.assertEqual(Student.objects.get(name='Королёв Егор').score, 45)
+        self.assertEqual(find_drift(), [])
+        self.assertEqual(sorted(StudentWithDebts.objects.values_list('name', 'score')),
+                         [('Королёв Егор', 45), ('Федотова Елена', 58)])
+
+    # Совместимость с форматом фикстур loaddata
+    def test_import_yaml_fixture(self):
+        path = self.write_file('scores.yaml', '- model: students_scores.student\n'
+                                              '  fields:\n'
+                                              '    name: Королёв Егор\n'
+                                              '    discipline: Физика\n'
+                                              '    score: 90\n')
+        self.import_file(path)
+        self.assertEqual(Student.objects.get(name='Королёв Егор').score, 90)
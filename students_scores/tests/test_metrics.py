@@ -0,0 +1,74 @@
+import re
+from django.test import Client, override_settings
+from students_scores.tests.base import CacheTestCase
+from django.urls import reverse
+from students_scores import metrics
+from students_scores.management.commands.load_test import parse_connections
+from students_scores.models import Student
+
+
+class MetricsTest(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        self.client = Client()
+        Student.objects.create(name='Петров Андрей', discipline='Физика', score=85)
+        Student.objects.create(name='Петров Андрей', discipline='Химия', score=50)
+
+    def get_metric(self, text, name, **labels):
+        pattern = name + r'\{' + ''.join(f'(?=[^}}]*{key}="{re.escape(value)}")' for key, value in labels.items())
+        match = re.search(pattern + r'[^}]*\} (\S+)', text)
+        return float(match.group(1)) if match else None
+
+    # Число запросов, SQL и строки считаются по эндпоинтам, в том числе для асинхронных представлений
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('student_info'), {'student': 'Петров Андрей'})
+        self.client.get(reverse('async_discipline_info'), {'discipline': 'Физика'})
+        text = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertEqual(self.get_metric(text, 'students_scores_requests_total', endpoint='student_info',
+                                         method='GET', status='200'), 1)
+        self.assertEqual(self.get_metric(text, 'students_scores_request_duration_seconds_count',
+                                         endpoint='student_info'), 1)
+        self.assertEqual(self.get_metric(text, 'students_scores_db_queries_total', endpoint='student_info'), 2)
+        self.assertEqual(self.get_metric(text, 'students_scores_rows_scanned_total', endpoint='student_info'), 2)
+        self.assertIsNotNone(re.search(r'^students_scores_db_connections_total \S+$', text, re.M))
+        self.assertGreater(self.get_metric(text, 'students_scores_db_queries_total', endpoint='async_discipline_info'), 0)
+        self.assertEqual(self.get_metric(text, 'students_scores_section_duration_seconds_count', section='stats'), 2)
+        # Счетчики кэша общие для синхронных и асинхронных страниц
+        self.assertIsNotNone(self.get_metric(text, 'students_scores_cache_total', kind='discipline', result='misses'))
+
+    # Запросы, выполненные во время выдачи потокового ответа, тоже учитываются
+    def test_streaming_response(self):
+        response = self.client.get(reverse('export_students'), {'format': 'csv'})
+        b''.join(response.streaming_content)
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertEqual(self.get_metric(text, 'students_scores_requests_total', endpoint='export_students'), 1)
+        self.assertGreater(self.get_metric(text, 'students_scores_db_queries_total', endpoint='export_students'), 0)
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_server_timing(self):
+        response = self.client.get(reverse('discipline_info'), {'discipline': 'Физика'})
+        header = response['Server-Timing']
+        self.assertIn('desc="2 queries"', header)
+        self.assertIn('template;dur=', header)
+        self.assertIn('handler;dur=', header)
+
+    @override_settings(SLOW_REQUEST_MS=0.001)
+    def test_slow_request_log(self):
+        with self.assertLogs('students_scores.slow_requests', level='WARNING') as logs:
+            self.client.get(reverse('student_info'), {'student': 'Петров Андрей'})
+        self.assertIn('student_info', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    # Без медленного журнала ни заголовка, ни сбора SQL
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('student_info'), {'student': 'Петров Андрей'})
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    # load_test читает счетчик соединений из настоящего ответа /metrics
+    def test_load_test_parses_connections(self):
+        metrics.registry.connections.inc(3)
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertEqual(parse_connections(text), 3)
+        self.assertIsNone(parse_connections('# пусто\n'))
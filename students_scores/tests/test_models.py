@@ -16,6 +16,12 @@ class StudentModelTest(TestCase):
         self.assertEqual(student.discipline, "Высшая математика")
         self.assertEqual(student.score, 95)
 
+    # Проверка составного ключа (name, discipline) у Student
+    def test_unique_together_constraint(self):
+        Student.objects.create(name="Бочкин Иван", discipline="Высшая математика", score=95)
+        with self.assertRaises(IntegrityError):
+            Student.objects.create(name="Бочкин Иван", discipline="Высшая математика", score=70)
+
     # Проверяет то, что метод save был вызван с использованием unittest.mock.patch
     @patch('django.db.models.Model.save', MagicMock(name='save'))
     def test_save_method_called(self):
@@ -0,0 +1,52 @@
+import json
+from django.test import TestCase, Client
+from django.urls import reverse
+from students_scores.models import Student
+from students_scores.stats import StatsCalculator
+
+
+class OverviewTest(TestCase):
+    def setUp(self):
+        self.scores = {
+            ('Бочкин Иван', 'Физика'): 85, ('Бочкин Иван', 'Информатика'): 90, ('Бочкин Иван', 'Английский'): 78,
+            ('Сидоров Сергей', 'Физика'): 50, ('Сидоров Сергей', 'Информатика'): 67,
+            ('Петров Иван', 'Физика'): 99,
+        }
+        for (name, discipline), score in self.scores.items():
+            Student.objects.create(name=name, discipline=discipline, score=score)
+
+    # Статистика дисциплин совпадает с StatsCalculator.calculate_stats для каждой группы
+    def test_matches_stats_calculator(self):
+        data = json.loads(Client().get(reverse('stats_overview_json')).content)
+
+        self.assertEqual([item['discipline'] for item in data['disciplines']], ['Английский', 'Информатика', 'Физика'])
+        for item in data['disciplines']:
+            scores = [score for (_, d), score in self.scores.items() if d == item['discipline']]
+            expected = StatsCalculator().calculate_stats(scores)
+            self.assertEqual(item['stats'][:3], expected[:3])
+            for value, expected_value in zip(item['stats'][3:], expected[3:]):
+                self.assertAlmostEqual(value, expected_value, places=10)
+
+    # Пустая таблица
+    def test_empty(self):
+        Student.objects.all().delete()
+        data = json.loads(Client().get(reverse('stats_overview_json')).content)
+        self.assertEqual((data['disciplines'], data['students'], data['total']), ([], [], 0))
+
+    # HTML-страница и JSON-выдача сводной статистики
+    def test_overview_views(self):
+        client = Client()
+        response = client.get(reverse('stats_overview'))
+        self.assertContains(response, 'Информатика')
+        self.assertTemplateUsed(response, 'students_scores/overview.html')
+
+        data = json.loads(client.get(reverse('stats_overview_json')).content)
+        self.assertEqual(data['students'][0]['name'], 'Петров Иван')
+        self.assertEqual(len(data['disciplines']), 3)
+
+    # Рейтинг на странице ограничен первыми ?top= местами
+    def test_overview_top(self):
+        data = json.loads(Client().get(reverse('stats_overview_json'), {'top': 2}).content)
+        self.assertEqual([student['name'] for student in data['students']], ['Петров Иван', 'Бочкин Иван'])
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(data['students'][1]['stats'][:3], [3, 90, 78])
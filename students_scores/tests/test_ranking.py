@@ -0,0 +1,69 @@
+import json
+from django.test import TestCase, Client
+from students_scores.tests.base import CacheTestCase
+from django.urls import reverse
+from students_scores import ranking
+from students_scores.models import Student
+from students_scores.ranking import Leaderboard, get_leaderboard
+
+
+class LeaderboardTest(TestCase):
+    # Общие места при равных средних и перцентиль как доля студентов ниже
+    def test_top_and_rank(self):
+        leaderboard = Leaderboard({'А': (2, 180), 'Б': (1, 90), 'В': (1, 70), 'Г': (4, 200)})
+        self.assertEqual([(row['place'], row['name']) for row in leaderboard.top(3)], [(1, 'А'), (1, 'Б'), (3, 'В')])
+        self.assertEqual(leaderboard.rank('Б'), {'place': 1, 'of': 4, 'mean': 90.0, 'count': 1, 'percentile': 50.0})
+        self.assertEqual(leaderboard.rank('Г')['place'], 4)
+        self.assertIsNone(leaderboard.rank('Д'))
+
+        leaderboard.add('Г', 100)
+        leaderboard.add('В', 70, -1)
+        self.assertEqual(leaderboard.rank('Г')['mean'], 60.0)
+        self.assertEqual(len(leaderboard), 3)
+        self.assertEqual([row['name'] for row in leaderboard.top(10)], ['А', 'Б', 'Г'])
+
+
+class RankingApiTest(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        ranking.clear_leaderboard()
+        self.addCleanup(ranking.clear_leaderboard)
+        self.client = Client()
+        self.student = Student.objects.create(name='Петров Андрей', discipline='Физика', score=85)
+        Student.objects.create(name='Петров Андрей', discipline='Химия', score=65)
+        Student.objects.create(name='Сидоров Сергей', discipline='Физика', score=90)
+        Student.objects.create(name='Абрамов Олег', discipline='Физика', score=50)
+
+    def get_json(self, name, *args, **params):
+        return json.loads(self.client.get(reverse(name, args=args), params).content)
+
+    # Рейтинг догоняет журнал изменений на месте, без перестроения
+    def test_incremental_updates(self):
+        leaderboard = get_leaderboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.score = 100
+            self.student.save()
+            Student.objects.create(name='Иванов Иван', discipline='Химия', score=95)
+        with self.assertNumQueries(2):
+            self.assertIs(get_leaderboard(), leaderboard)
+        self.assertEqual([row['name'] for row in leaderboard.top(2)], ['Иванов Иван', 'Сидоров Сергей'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.delete()
+        self.assertEqual(get_leaderboard().rank('Петров Андрей')['mean'], 65.0)
+
+    def test_ranking_endpoints(self):
+        data = self.get_json('api_ranking', top=2)
+        self.assertEqual(data['total'], 3)
+        self.assertEqual([row['name'] for row in data['results']], ['Сидоров Сергей', 'Петров Андрей'])
+
+        data = self.get_json('api_discipline_ranking', 'Физика', top=5)
+        self.assertEqual([(row['place'], row['score']) for row in data['results']], [(1, 90), (2, 85), (3, 50)])
+        response = self.client.get(reverse('api_discipline_ranking', args=['Биология']))
+        self.assertEqual(response.status_code, 404)
+
+        data = self.get_json('api_student_rank', 'Петров Андрей')
+        self.assertEqual((data['overall']['place'], data['overall']['of']), (2, 3))
+        self.assertEqual(data['disciplines']['Физика'], {'score': 85, 'place': 2, 'of': 3,
+                                                         'percentile': 100.0 / 3})
+        self.assertEqual(data['disciplines']['Химия']['place'], 1)
+        self.assertEqual(self.client.get(reverse('api_student_rank', args=['Нет такого'])).status_code, 404)
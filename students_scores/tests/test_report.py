@@ -0,0 +1,81 @@
+import csv
+import os
+import tempfile
+from io import StringIO
+import numpy as np
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from students_scores.models import Student, ScoreSummary
+from students_scores.report import ReportStatsCalculator, build_report, plan_partitions, rank_groups
+from students_scores.snapshot import write_snapshot
+from students_scores.stats import StatsCalculator, StudentStats
+
+
+class ScoreReportTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        rng = np.random.default_rng(2)
+        Student.objects.bulk_create([
+            Student(name=f'Студент {i}', discipline=f'Дисциплина {j}', score=int(rng.integers(0, 101)))
+            for i in range(60) for j in range(5) if (i + j) % 3
+        ])
+
+    # Части покрывают все группы без пересечений
+    def test_plan_partitions(self):
+        offsets = np.array([0, 10, 11, 12, 40, 41])
+        partitions = plan_partitions(offsets, 3)
+        self.assertEqual(partitions[0][0], 0)
+        self.assertEqual(partitions[-1][1], 5)
+        self.assertTrue(all(end == start for (_, end), (start, _) in zip(partitions, partitions[1:])))
+        self.assertEqual(plan_partitions(np.array([0]), 4), [])
+
+    # Результат не зависит от числа процессов и совпадает с StatsCalculator по каждой группе
+    def test_report_matches_stats_calculator(self):
+        snapshot = write_snapshot(self.directory.name)
+        for workers in (1, 2):
+            report = build_report(snapshot, workers=workers)
+            self.assertEqual(report.histogram.total, Student.objects.count())
+            for kind in (ScoreSummary.KIND_STUDENT, ScoreSummary.KIND_DISCIPLINE):
+                expected = {key: StatsCalculator().calculate_group_stats(kind, key)
+                            for key in Student.objects.values_list(kind, flat=True).distinct()}
+                stats = report.stats(kind)
+                self.assertEqual(stats.keys(), expected.keys())
+                for key, values in expected.items():
+                    np.testing.assert_allclose(stats[key], values)
+
+        calculator = ReportStatsCalculator(report)
+        self.assertEqual(StudentStats('Студент 1', calculator).calculate_student_stats(),
+                         report.stats(ScoreSummary.KIND_STUDENT)['Студент 1'])
+        ranking = report.ranking(ScoreSummary.KIND_DISCIPLINE, top=2)
+        self.assertEqual([place for place, _, _ in ranking], [1, 2])
+        self.assertGreaterEqual(ranking[0][2][3], ranking[1][2][3])
+
+    # Рейтинг по среднему баллу, при равенстве - по имени
+    def test_rank_groups(self):
+        ranking = rank_groups({'Б': [2, 90, 70, 80.0, 10.0, 100.0], 'А': [1, 80, 80, 80.0, 0.0, 0.0],
+                               'В': [1, 99, 99, 99.0, 0.0, 0.0]})
+        self.assertEqual([(place, key) for place, key, _ in ranking], [(1, 'В'), (2, 'А'), (3, 'Б')])
+
+    def test_command(self):
+        output = os.path.join(self.directory.name, 'report.csv')
+        stdout = StringIO()
+        call_command('build_report', '--dir', self.directory.name, '--workers', '2', '--output', output,
+                     stdout=stdout)
+        self.assertIn('Снимок отсутствует или устарел', stdout.getvalue())
+        with open(output, encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 65)
+        self.assertEqual(rows[0]['place'], '1')
+
+    # Балл вне 0-100 не обрезается молча: отчет не строится
+    def test_out_of_range_score(self):
+        # В БД такой балл не попадет (ограничение student_score_range) - портится сам снимок
+        snapshot = write_snapshot(self.directory.name)
+        path = os.path.join(snapshot.path, 'score.npy')
+        scores = np.load(path)
+        scores[0] = 150
+        np.save(path, scores)
+        with self.assertRaises(CommandError):
+            call_command('build_report', '--dir', self.directory.name, '--workers', '1', stdout=StringIO())
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+import numpy as np
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.utils import timezone
+from students_scores.tests.base import CacheTestCase
+from django.urls import reverse
+from students_scores import score_matrix
+from students_scores.changes import LiveStructure
+from students_scores.data_version import bump_data_generation
+from students_scores.models import Student, ScoreSummary
+from students_scores.score_matrix import ScoreMatrix, get_score_matrix
+from students_scores.stats import StatsCalculator, MatrixStatsCalculator, StudentStats, get_stats_calculator
+
+
+class ScoreMatrixTest(TestCase):
+    # Статистика по строкам матрицы совпадает с расчетом по исходным оценкам
+    def test_stats_match_numpy(self):
+        rng = np.random.default_rng(1)
+        keys = rng.integers(0, 20, 5000).astype(str)
+        scores = rng.integers(0, 101, 5000)
+        matrix = ScoreMatrix.from_scores(ScoreSummary.KIND_DISCIPLINE, keys, scores)
+        all_stats = matrix.all_stats()
+        for key in np.unique(keys):
+            expected = StatsCalculator().calculate_stats(scores[keys == key])
+            np.testing.assert_allclose(matrix.stats(key), expected)
+            np.testing.assert_allclose(all_stats[key], expected)
+            self.assertAlmostEqual(matrix.percentile(key, 90), np.percentile(scores[keys == key], 90))
+        self.assertEqual(matrix.stats('нет такой'), [])
+
+    # Матрица растет при добавлении групп и переживает сохранение и загрузку
+    def test_add_and_persist(self):
+        matrix = ScoreMatrix(ScoreSummary.KIND_STUDENT)
+        for i in range(40):
+            matrix.add(f'Студент {i}', i)
+        matrix.add('Студент 0', 0, -1)
+        self.assertEqual(matrix.stats('Студент 0'), [])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'matrix.npz')
+            matrix.save(path)
+            loaded = ScoreMatrix.load(ScoreSummary.KIND_STUDENT, path)
+        self.assertEqual(len(loaded), 40)
+        self.assertEqual(loaded.stats('Студент 39')[:3], [1, 39, 39])
+
+
+class ScoreMatrixBackendTest(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        score_matrix.clear_matrices()
+        self.student = Student.objects.create(name='Петров Андрей', discipline='Физика', score=85)
+        Student.objects.create(name='Сидоров Сергей', discipline='Физика', score=55)
+
+    def tearDown(self):
+        score_matrix.clear_matrices()
+
+    # Записи обновляют загруженную матрицу на месте, без перестроения
+    def test_signals_update_matrix_in_place(self):
+        matrix = get_score_matrix(ScoreSummary.KIND_DISCIPLINE)
+        self.assertEqual(matrix.stats('Физика')[:3], [2, 85, 55])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.score = 95
+            self.student.save()
+            Student.objects.create(name='Петров Андрей', discipline='Химия', score=70)
+        # Версия данных и изменения из журнала, без перестроения
+        with self.assertNumQueries(2):
+            self.assertIs(get_score_matrix(ScoreSummary.KIND_DISCIPLINE), matrix)
+        self.assertEqual(matrix.stats('Физика')[:3], [2, 95, 55])
+        self.assertEqual(matrix.stats('Химия')[:3], [1, 70, 70])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.delete()
+        self.assertEqual(get_score_matrix(ScoreSummary.KIND_DISCIPLINE).stats('Физика')[:3], [1, 55, 55])
+
+    # Изменения в обход журнала (массовая загрузка) приводят к перестроению по ScoreBucket
+    def test_stale_matrix_is_rebuilt(self):
+        matrix = get_score_matrix(ScoreSummary.KIND_STUDENT)
+        bump_data_generation()
+        rebuilt = get_score_matrix(ScoreSummary.KIND_STUDENT)
+        self.assertIsNot(rebuilt, matrix)
+        self.assertEqual(rebuilt.stats('Петров Андрей')[:3], [1, 85, 85])
+
+    # Изменение, записанное до снимка, но получившее поколение после него, не применяется дважды
+    def test_pending_change_is_not_applied_twice(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Student.objects.create(name='Петров Андрей', discipline='Химия', score=70)
+            matrix = get_score_matrix(ScoreSummary.KIND_DISCIPLINE)
+        for callback in callbacks:
+            callback()
+        self.assertIs(get_score_matrix(ScoreSummary.KIND_DISCIPLINE), matrix)
+        self.assertEqual(matrix.stats('Химия')[:3], [1, 70, 70])
+
+    # Выбор источника статистики в настройках
+    @override_settings(STATS_BACKEND='matrix')
+    def test_matrix_backend(self):
+        self.assertIsInstance(get_stats_calculator(), MatrixStatsCalculator)
+        stats = StudentStats('Петров Андрей', get_stats_calculator()).calculate_student_stats()
+        self.assertEqual(stats, [1, 85, 85, 85.0, 0.0, 0.0])
+        response = Client().get(reverse('discipline_info'), {'discipline': 'Физика'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['disc_stats'][:3], [2, 85, 55])
+
+    @override_settings(STATS_BACKEND='unknown')
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_stats_calculator()
+
+
+class Structure:
+    def __init__(self, version):
+        self.version = version
+        self._lock = threading.Lock()
+
+
+class LiveStructureTest(SimpleTestCase):
+    # Пока структура перестраивается в фоне, запросы получают последнюю построенную
+    def test_rebuild_in_background(self):
+        version = (2, timezone.now())
+        release = threading.Event()
+
+        def build():
+            release.wait(5)
+            return Structure(version)
+
+        live = LiveStructure(build, lambda *args: None)
+        stale = Structure(None)
+        live._replace(stale, set())
+        with patch('students_scores.changes.read_snapshot', lambda build: (build(), set())):
+            self.assertIs(live.get(version), stale)
+            self.assertIs(live.get(version), stale)
+            release.set()
+            for _ in range(50):
+                if live.value is not stale:
+                    break
+                time.sleep(0.1)
+        self.assertEqual(live.get(version).version, version)
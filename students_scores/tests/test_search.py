@@ -0,0 +1,59 @@
+import json
+from django.test import TestCase, Client
+from students_scores.tests.base import CacheTestCase
+from django.urls import reverse
+from students_scores import search
+from students_scores.models import Student
+from students_scores.search import PrefixIndex, get_index
+
+
+class PrefixIndexTest(TestCase):
+    # Поиск по началу любого слова без учета регистра и е/ё, имя исчезает вместе с последней строкой
+    def test_complete(self):
+        index = PrefixIndex({'Петров Андрей': 2, 'Петрова Алёна': 1, 'Андреев Пётр': 1})
+        self.assertEqual(index.complete('петров', 10), ['Петров Андрей', 'Петрова Алёна'])
+        self.assertEqual(index.complete('Андр', 10), ['Андреев Пётр', 'Петров Андрей'])
+        self.assertEqual(index.complete('петр', 1), ['Андреев Пётр'])
+        self.assertEqual(index.complete('алена', 10), ['Петрова Алёна'])
+        self.assertEqual(index.complete('  ', 10), [])
+
+        index.add('Петров Андрей', -1)
+        self.assertEqual(index.complete('андрей', 10), ['Петров Андрей'])
+        index.add('Петров Андрей', -1)
+        index.add('Андреев Иван')
+        self.assertEqual(index.complete('андр', 10), ['Андреев Иван', 'Андреев Пётр'])
+        self.assertEqual(len(index), 3)
+
+
+class SearchApiTest(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        search.clear_indexes()
+        self.addCleanup(search.clear_indexes)
+        self.client = Client()
+        self.student = Student.objects.create(name='Петров Андрей', discipline='Физика', score=85)
+        Student.objects.create(name='Сидоров Сергей', discipline='Физкультура', score=90)
+
+    def get_results(self, **params):
+        return json.loads(self.client.get(reverse('api_search'), params).content)['results']
+
+    # Индекс догоняет журнал изменений на месте, без перестроения
+    def test_search(self):
+        self.assertEqual(self.get_results(q='сид'), ['Сидоров Сергей'])
+        self.assertEqual(self.get_results(q='физ', kind='discipline'), ['Физика', 'Физкультура'])
+        self.assertEqual(self.get_results(q='физ', kind='discipline', limit=1), ['Физика'])
+        response = self.client.get(reverse('api_search'), {'kind': '<b>группа</b>'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn('<b>', response.content.decode())
+
+        index = get_index('name')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.name = 'Петрова Анна'
+            self.student.save()
+            Student.objects.create(name='Анисимов Олег', discipline='Химия', score=70)
+        with self.assertNumQueries(2):
+            self.assertIs(get_index('name'), index)
+        self.assertEqual(self.get_results(q='ан'), ['Анисимов Олег', 'Петрова Анна'])
+        self.assertEqual(self.get_results(q='андрей'), [])
+        self.assertEqual(self.get_results(q='хим', kind='discipline'), ['Химия'])
@@ -0,0 +1,82 @@
+import os
+import tempfile
+from io import StringIO
+from django.test import Client, override_settings
+from students_scores.tests.base import CacheTestCase
+from django.core.management import call_command
+from django.urls import reverse
+from students_scores import snapshot
+from students_scores.models import Student, ScoreSummary
+from students_scores.snapshot import get_snapshot, write_snapshot
+from students_scores.stats import StatsCalculator, SnapshotStatsCalculator, StudentStats
+
+
+class SnapshotTest(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        snapshot.clear_snapshot()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(snapshot.clear_snapshot)
+        self.student = Student.objects.create(name='Петров Андрей', discipline='Физика', score=85)
+        Student.objects.create(name='Петров Андрей', discipline='Химия', score=40)
+        Student.objects.create(name='Сидоров Сергей', discipline='Физика', score=55)
+        Student.objects.create(name='Абрамов Олег', discipline='Химия', score=100)
+
+    # Столбцы со словарным кодированием и индексы групп
+    def test_write_and_read(self):
+        data = write_snapshot(self.directory.name)
+        self.assertEqual(len(data), 4)
+        self.assertEqual(data.scores.dtype.name, 'uint8')
+        self.assertEqual(list(data.dictionaries['name']), ['Абрамов Олег', 'Петров Андрей', 'Сидоров Сергей'])
+        self.assertEqual(sorted(data.group_scores(ScoreSummary.KIND_STUDENT, 'Петров Андрей')), [40, 85])
+        self.assertEqual(sorted(data.group_scores(ScoreSummary.KIND_DISCIPLINE, 'Химия')), [40, 100])
+        self.assertEqual(len(data.group_scores(ScoreSummary.KIND_DISCIPLINE, 'Биология')), 0)
+
+        page, next_after = data.debts_page(0, 1)
+        self.assertEqual((page[0]['discipline'], page[0]['score']), ('Химия', 40))
+        page, next_after = data.debts_page(next_after, 1)
+        self.assertEqual((page[0]['name'], next_after), ('Сидоров Сергей', None))
+
+    # Снимок используется, только пока совпадает с версией данных
+    def test_stale_snapshot_is_refused(self):
+        with override_settings(SNAPSHOT_DIR=self.directory.name):
+            self.assertIsNone(get_snapshot())
+            call_command('build_snapshot', stdout=StringIO())
+            self.assertEqual(len(get_snapshot()), 4)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.student.delete()
+            self.assertIsNone(get_snapshot())
+            call_command('build_snapshot', stdout=StringIO())
+            self.assertEqual(len(get_snapshot()), 3)
+            self.assertEqual(len([entry for entry in os.scandir(self.directory.name) if entry.is_dir()]), 2)
+
+    # Недописанный снимок (без meta.json) и снимки новее текущего не удаляются
+    def test_prune_keeps_unfinished_snapshots(self):
+        unfinished = os.path.join(self.directory.name, 'unfinished')
+        os.makedirs(unfinished)
+        first = write_snapshot(self.directory.name, keep=1)
+        second = write_snapshot(self.directory.name, keep=1)
+        self.assertFalse(os.path.exists(first.path))
+        self.assertTrue(os.path.exists(second.path))
+        self.assertTrue(os.path.exists(unfinished))
+
+    # Статистика и страница должников из снимка
+    def test_stats_and_debts_from_snapshot(self):
+        with override_settings(SNAPSHOT_DIR=self.directory.name, STATS_BACKEND='snapshot'):
+            # Без снимка статистика берется из ScoreSummary
+            stats = StudentStats('Петров Андрей', SnapshotStatsCalculator()).calculate_student_stats()
+            self.assertEqual(stats[:3], [2, 85, 40])
+
+            write_snapshot(self.directory.name)
+            stats = StudentStats('Петров Андрей', SnapshotStatsCalculator()).calculate_student_stats()
+            self.assertEqual(list(stats), list(StatsCalculator().calculate_stats([85, 40])))
+
+            response = Client().get(reverse('students_with_debts'))
+            self.assertEqual([row['name'] for row in response.context['students_with_debts']],
+                             ['Петров Андрей', 'Сидоров Сергей'])
+            self.assertContains(response, 'Сидоров Сергей')
+
+            response = Client().get(reverse('student_info'), {'student': 'Абрамов Олег'})
+            self.assertEqual(response.context['stud_stats'][:3], [1, 100, 100])
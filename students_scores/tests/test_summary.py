@@ -0,0 +1,94 @@
+from io import StringIO
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from students_scores.models import Student, ScoreSummary
+from students_scores.summary import find_drift, refresh_summaries
+from students_scores.stats import StatsCalculator, SummaryStatsCalculator, StudentStats, DisciplineStats
+
+
+class ScoreSummarySignalsTest(TestCase):
+    def setUp(self):
+        self.student1 = Student.objects.create(name="Бочкин Иван", discipline="Физика", score=85)
+        self.student2 = Student.objects.create(name="Бочкин Иван", discipline="Информатика", score=90)
+        self.student3 = Student.objects.create(name="Сидоров Сергей", discipline="Физика", score=50)
+
+    def get_summary(self, kind, key):
+        return ScoreSummary.objects.get(kind=kind, key=key)
+
+    # Проверка того, что при создании записей суммы накапливаются
+    def test_create_updates_summary(self):
+        summary = self.get_summary(ScoreSummary.KIND_STUDENT, "Бочкин Иван")
+        self.assertEqual((summary.count, summary.total, summary.total_sq), (2, 175, 85 ** 2 + 90 ** 2))
+        self.assertEqual((summary.min_score, summary.max_score), (85, 90))
+
+        summary = self.get_summary(ScoreSummary.KIND_DISCIPLINE, "Физика")
+        self.assertEqual((summary.count, summary.min_score, summary.max_score), (2, 50, 85))
+        self.assertEqual(find_drift(), [])
+
+    # Проверка того, что при изменении оценки старое значение вычитается
+    def test_update_updates_summary(self):
+        self.student1.score = 40
+        self.student1.save()
+
+        summary = self.get_summary(ScoreSummary.KIND_DISCIPLINE, "Физика")
+        self.assertEqual((summary.count, summary.total, summary.min_score, summary.max_score), (2, 90, 40, 50))
+        self.assertEqual(find_drift(), [])
+
+    # Проверка того, что при удалении пересчитываются минимум/максимум, а пустые группы удаляются
+    def test_delete_updates_summary(self):
+        self.student3.delete()
+
+        self.assertFalse(ScoreSummary.objects.filter(kind=ScoreSummary.KIND_STUDENT, key="Сидоров Сергей").exists())
+        summary = self.get_summary(ScoreSummary.KIND_DISCIPLINE, "Физика")
+        self.assertEqual((summary.count, summary.min_score, summary.max_score), (1, 85, 85))
+        self.assertEqual(find_drift(), [])
+
+    # queryset.delete() удаляет строки до сигналов post_delete: группы, удаленные целиком, не пересчитываются
+    def test_queryset_delete_updates_summary(self):
+        Student.objects.filter(discipline="Физика").delete()
+
+        self.assertFalse(ScoreSummary.objects.filter(kind=ScoreSummary.KIND_DISCIPLINE, key="Физика").exists())
+        summary = self.get_summary(ScoreSummary.KIND_STUDENT, "Бочкин Иван")
+        self.assertEqual((summary.count, summary.min_score, summary.max_score), (1, 90, 90))
+        self.assertEqual(find_drift(), [])
+
+    # Проверка пересчета групп после bulk_create, который не отправляет сигналы
+    def test_refresh_after_bulk_create(self):
+        Student.objects.bulk_create([Student(name="Петров Иван", discipline="Физика", score=70)])
+        self.assertEqual(len(find_drift()), 2)
+
+        refresh_summaries(names=["Петров Иван"], disciplines=["Физика"])
+        self.assertEqual(find_drift(), [])
+
+    # Статистика по суммам совпадает с расчетом через numpy и не требует сканирования Student
+    def test_summary_stats_match_numpy(self):
+        calculator = SummaryStatsCalculator()
+        with self.assertNumQueries(1):
+            stats = StudentStats("Бочкин Иван", stats_calculator=calculator).calculate_student_stats()
+        expected = StatsCalculator().calculate_stats([85, 90])
+        self.assertEqual(stats[:3], expected[:3])
+        for value, expected_value in zip(stats[3:], expected[3:]):
+            self.assertAlmostEqual(value, expected_value)
+
+        stats = DisciplineStats("Нет такой", stats_calculator=calculator).calculate_discipline_stats()
+        self.assertEqual(stats, [])
+
+
+class RebuildScoreSummaryCommandTest(TestCase):
+    def setUp(self):
+        Student.objects.create(name="Бочкин Иван", discipline="Физика", score=85)
+        ScoreSummary.objects.filter(kind=ScoreSummary.KIND_DISCIPLINE).update(total=0)
+
+    # Проверка того, что --check находит расхождения и не исправляет их
+    def test_check_reports_drift(self):
+        with self.assertRaises(CommandError):
+            call_command('rebuild_score_summary', '--check', stdout=StringIO())
+        self.assertEqual(find_drift(), [(ScoreSummary.KIND_DISCIPLINE, "Физика")])
+
+    # Проверка того, что перестроение устраняет расхождения
+    def test_rebuild_fixes_drift(self):
+        out = StringIO()
+        call_command('rebuild_score_summary', stdout=out)
+        self.assertIn('исправлено расхождений: 1', out.getvalue())
+        self.assertEqual(find_drift(), [])
@@ -1,12 +1,18 @@
-from django.test import TestCase, Client
-from students_scores.views import StatsCalculator, StudentStats, DisciplineStats
+from django.test import TestCase, Client, AsyncClient
+from students_scores.tests.base import CacheTestCase
+from students_scores.cache import get_counters
+from students_scores.stats import StatsCalculator, StudentStats, DisciplineStats, DatabaseStatsCalculator
 from students_scores.views import RequestHandlerFactory, StudentInfoHandler, DisciplineInfoHandler
 from unittest.mock import patch, MagicMock
+import json
 import numpy as np
-from students_scores.models import Student
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError
+from students_scores.models import Student, DebtsRefreshState
 from django.urls import reverse
 from django.http import HttpResponse
 from students_scores.views import get_students_with_academic_debts, StudentWithDebts, update_students_with_debts
+from students_scores.views import refresh_students_with_debts
 
 
 class StatsCalculatorTest(TestCase):
@@ -67,11 +73,10 @@ class StudentStatsTest(TestCase):
         stats = self.student_stats.calculate_student_stats()
 
         self.assertEqual(stats, [3, 90, 78, 84.33333333333333, 5.163977794943222, 26.666666666666668])
-        mock_max.assert_called_once_with([85, 90, 78])
-        mock_min.assert_called_once_with([85, 90, 78])
-        mock_mean.assert_called_once_with([85, 90, 78])
-        mock_std.assert_called_once_with([85, 90, 78])
-        mock_var.assert_called_once_with([85, 90, 78])
+        # Без ORDER BY порядок оценок зависит от выбранного планировщиком индекса
+        for mock in (mock_max, mock_min, mock_mean, mock_std, mock_var):
+            mock.assert_called_once()
+            self.assertEqual(sorted(mock.call_args.args[0]), [78, 85, 90])
 
 
 class DisciplineStatsTest(TestCase):
@@ -101,18 +106,48 @@ class DisciplineStatsTest(TestCase):
         stats = self.discipline_stats.calculate_discipline_stats()
 
         self.assertEqual(stats, [3, 90, 78, 84.33333333333333, 5.163977794943222, 26.666666666666668])
-        mock_max.assert_called_once_with([85, 90, 78])
-        mock_min.assert_called_once_with([85, 90, 78])
-        mock_mean.assert_called_once_with([85, 90, 78])
-        mock_std.assert_called_once_with([85, 90, 78])
-        mock_var.assert_called_once_with([85, 90, 78])
+        # Без ORDER BY порядок оценок зависит от выбранного планировщиком индекса
+        for mock in (mock_max, mock_min, mock_mean, mock_std, mock_var):
+            mock.assert_called_once()
+            self.assertEqual(sorted(mock.call_args.args[0]), [78, 85, 90])
+
+
+class DatabaseStatsCalculatorTest(TestCase):
+    def setUp(self):
+        Student.objects.create(name="Бочкин Иван", discipline="Высшая математика", score=85)
+        Student.objects.create(name="Бочкин Иван", discipline="Информатика", score=90)
+        Student.objects.create(name="Бочкин Иван", discipline="Физика", score=78)
+        Student.objects.create(name="Сидоров Сергей", discipline="Физика", score=50)
+
+    # Проверка того, что агрегирующий запрос в БД дает те же значения, что и расчет через numpy
+    def test_matches_numpy_stats(self):
+        queryset = Student.objects.filter(name="Бочкин Иван")
+        expected = StatsCalculator().calculate_stats([85, 90, 78])
+        result = DatabaseStatsCalculator().calculate_queryset_stats(queryset)
+
+        self.assertEqual(result[:3], expected[:3])
+        for value, expected_value in zip(result[3:], expected[3:]):
+            self.assertAlmostEqual(value, expected_value)
+
+    # Проверка того, что статистика считается одним запросом
+    def test_single_query(self):
+        stats = DisciplineStats("Физика", stats_calculator=DatabaseStatsCalculator())
+        with self.assertNumQueries(1):
+            result = stats.calculate_discipline_stats()
+        self.assertEqual(result[:3], [2, 78, 50])
+
+    # Для пустой выборки возвращается пустой список
+    def test_empty_queryset(self):
+        result = DatabaseStatsCalculator().calculate_queryset_stats(Student.objects.filter(name="Не существующий"))
+        self.assertEqual(result, [])
 
 
 # --------------------------------------------------------
 
 
-class RequestHandlerTests(TestCase):
+class RequestHandlerTests(CacheTestCase):
     def setUp(self):
+        super().setUp()
         self.client = Client()
 
     def test_student_info_page(self):
@@ -126,8 +161,9 @@ class RequestHandlerTests(TestCase):
         self.assertContains(response, 'Высшая математика')
 
 
-class StudentInfoHandlerTests(TestCase):
+class StudentInfoHandlerTests(CacheTestCase):
     def setUp(self):
+        super().setUp()
         self.client = Client()
         self.student = Student.objects.create(name='Петров Андрей', discipline='Высшая математика', score=85)
 
@@ -137,14 +173,33 @@ class StudentInfoHandlerTests(TestCase):
         self.assertContains(response, 'Петров Андрей')
         self.assertTemplateUsed(response, 'students_scores/student_form.html')
 
+    # Проверка того, что Student запрашивается один раз, а статистика берется из ScoreSummary
+    def test_handle_request_query_count(self):
+        with self.assertNumQueries(2):
+            self.client.post(reverse('student_info'), {'student': 'Петров Андрей'})
+
     def test_handle_request_student_not_exists(self):
         response = self.client.post(reverse('student_info'), {'student': 'Не существующий'})
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Не существующий - такого студента нет!')
 
+    # Без поля student показывается форма поиска
+    def test_handle_request_without_input(self):
+        for response in (self.client.get(reverse('student_info')), self.client.post(reverse('student_info'))):
+            self.assertTemplateUsed(response, 'students_scores/get_info.html')
+            self.assertNotContains(response, 'такого студента нет')
 
-class DisciplineInfoHandlerTests(TestCase):
+    # Имя из строки запроса выводится экранированным, в том числе на асинхронной странице
+    def test_not_found_message_is_escaped(self):
+        for name in ('student_info', 'async_student_info'):
+            response = self.client.get(reverse(name), {'student': '<script>alert(1)</script>'})
+            self.assertNotContains(response, '<script>')
+            self.assertContains(response, '&lt;script&gt;alert(1)&lt;/script&gt;')
+
+
+class DisciplineInfoHandlerTests(CacheTestCase):
     def setUp(self):
+        super().setUp()
         self.client = Client()
         self.student = Student.objects.create(name='Петров Иван', discipline='Информатика', score=85)
 
@@ -160,11 +215,111 @@ class DisciplineInfoHandlerTests(TestCase):
         self.assertContains(response, 'Не существующая - такой дисциплины нет!')
 
 
+class KeysetPaginationTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        self.students = [
+            Student.objects.create(name=f'Студент {i:02d}', discipline='Физика', score=50 + i) for i in range(25)
+        ]
+
+    # Проверка того, что главная страница отдается страницами по size записей
+    def test_index_pages(self):
+        response = self.client.get(reverse('index'), {'size': 10})
+        self.assertEqual(len(response.context['students']), 10)
+        self.assertEqual(response.context['next_after'], self.students[9].id)
+        self.assertContains(response, 'Следующая страница')
+
+        response = self.client.get(reverse('index'), {'size': 10, 'after': self.students[19].id})
+        self.assertEqual([s.name for s in response.context['students']],
+                         [s.name for s in self.students[20:]])
+        self.assertIsNone(response.context['next_after'])
+        self.assertNotContains(response, 'Студент 00')
+
+    # Некорректные параметры не ломают страницу
+    def test_invalid_page_params(self):
+        response = self.client.get(reverse('index'), {'size': 'abc', 'after': '-5'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['students']), 25)
+
+    # Страницы детальной информации о дисциплине
+    def test_discipline_pages(self):
+        response = self.client.post(reverse('discipline_info'), {'discipline': 'Физика', 'size': 20})
+        self.assertEqual(len(response.context['discipline_info']), 20)
+        self.assertEqual(response.context['disc_stats'][0], 25)
+
+        response = self.client.post(reverse('discipline_info'),
+                                    {'discipline': 'Физика', 'size': 20, 'after': response.context['next_after']})
+        self.assertEqual(len(response.context['discipline_info']), 5)
+        self.assertIsNone(response.context['next_after'])
+
+    # Курсор за последней строкой дает пустую страницу, а неизвестное имя с курсором - "нет такого"
+    def test_page_after_end(self):
+        last_id = Student.objects.order_by('-id').values_list('id', flat=True).first()
+        response = self.client.post(reverse('discipline_info'), {'discipline': 'Физика', 'after': last_id})
+        self.assertEqual(list(response.context['discipline_info']), [])
+
+        response = self.client.post(reverse('student_info'), {'student': 'Не существующий', 'after': 5})
+        self.assertContains(response, 'Не существующий - такого студента нет!')
+
+    # Страницы списка должников
+    def test_debts_pages(self):
+        refresh_students_with_debts()
+        response = self.client.get(reverse('students_with_debts'), {'size': 5})
+        self.assertEqual(len(response.context['students_with_debts']), 5)
+        self.assertIsNotNone(response.context['next_after'])
+
+
+class ExportViewsTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        Student.objects.create(name='Федотова Елена', discipline='Теория вероятности', score=58)
+        Student.objects.create(name='Королёв Егор', discipline='Методы оптимизации', score=72)
+
+    # Выгрузка всех оценок в CSV отдается потоком
+    def test_export_students_csv(self):
+        response = self.client.get(reverse('export_students'))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(content.splitlines(), [
+            'name,discipline,score',
+            'Федотова Елена,Теория вероятности,58',
+            'Королёв Егор,Методы оптимизации,72',
+        ])
+
+    # Под ASGI строки читаются асинхронным итератором, без сборки всей выгрузки в список
+    async def test_export_students_asgi(self):
+        response = await AsyncClient().get(reverse('export_students'))
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8')
+        self.assertEqual(content.splitlines()[1:], ['Федотова Елена,Теория вероятности,58',
+                                                    'Королёв Егор,Методы оптимизации,72'])
+
+    # Выгрузка одной дисциплины в NDJSON
+    def test_export_discipline_ndjson(self):
+        response = self.client.get(reverse('export_discipline', args=['Методы оптимизации']), {'format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [{'name': 'Королёв Егор', 'discipline': 'Методы оптимизации', 'score': 72}])
+
+    # Выгрузка должников и неизвестный формат
+    def test_export_debts(self):
+        refresh_students_with_debts()
+        response = self.client.get(reverse('export_students_with_debts'))
+        self.assertIn('Федотова Елена', b''.join(response.streaming_content).decode('utf-8'))
+
+        response = self.client.get(reverse('export_students_with_debts'), {'format': '<b>xml</b>'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn(b'<b>', response.content)
+
+
 # --------------------------------------------------------
 
 
-class StudentViewsTests(TestCase):
+class StudentViewsTests(CacheTestCase):
     def setUp(self):
+        super().setUp()
         self.client = Client()
         # Создаем тестовые объекты модели Student
         self.student1 = Student.objects.create(name='Сусарев Евгений', discipline='Тестирование и оценка кач-ва ПО', score=85)
@@ -190,6 +345,7 @@ class StudentViewsTests(TestCase):
 
     def test_list_students_with_debts_view(self):
         # Обновляем список студентов с долгами перед тестом
+        refresh_students_with_debts()
         response = self.client.get(reverse('students_with_debts'))
 
         self.assertEqual(response.status_code, 200)
@@ -205,6 +361,35 @@ class StudentViewsTests(TestCase):
         self.assertIn('Федотова Елена', [student.name for student in students_with_debts])
         self.assertIn('Кузьминов Михаил', [student.name for student in students_with_debts])
 
+    # Страница только читает список и не запускает обновление
+    def test_list_students_with_debts_view_is_read_only(self):
+        response = self.client.get(reverse('students_with_debts'))
+
+        self.assertContains(response, 'Список еще не обновлялся')
+        self.assertNotContains(response, 'Федотова Елена')
+        self.assertEqual(StudentWithDebts.objects.count(), 0)
+
+    # Обновление выполняется только после изменения Student
+    def test_refresh_students_with_debts_dirty_flag(self):
+        self.assertIsNotNone(refresh_students_with_debts())
+        self.assertIsNone(refresh_students_with_debts())
+
+        self.student1.score = 30
+        self.student1.save()
+        self.assertEqual(refresh_students_with_debts(), {'inserted': 1, 'updated': 0, 'deleted': 0})
+
+        response = self.client.get(reverse('students_with_debts'))
+        self.assertContains(response, 'Последнее обновление')
+        self.assertContains(response, 'Сусарев Евгений')
+
+    # После ошибки синхронизации флаг изменений остается выставленным, и следующий проход ее повторяет
+    def test_refresh_students_with_debts_failure(self):
+        with patch('students_scores.views.update_students_with_debts', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                refresh_students_with_debts()
+        self.assertTrue(DebtsRefreshState.objects.get(pk=1).dirty)
+        self.assertEqual(refresh_students_with_debts()['inserted'], 2)
+
     def test_update_students_with_debts(self):
         # Вызываем функцию для обновления студентов с долгами
         update_students_with_debts()
@@ -215,6 +400,33 @@ class StudentViewsTests(TestCase):
         self.assertIn('Федотова Елена', [student.name for student in students_with_debts])
         self.assertIn('Кузьминов Михаил', [student.name for student in students_with_debts])
 
+    # Проверка того, что синхронизация удаляет закрытые долги, обновляет баллы и сообщает количество изменений
+    def test_update_students_with_debts_sync(self):
+        self.assertEqual(update_students_with_debts(), {'inserted': 2, 'updated': 0, 'deleted': 0})
+
+        self.student2.score = 75
+        self.student2.save()
+        self.student4.score = 40
+        self.student4.save()
+        Student.objects.create(name='Орлова Елена', discipline='Физика', score=30)
+
+        self.assertEqual(update_students_with_debts(), {'inserted': 1, 'updated': 1, 'deleted': 1})
+        self.assertEqual(
+            sorted(StudentWithDebts.objects.values_list('name', 'score')),
+            [('Кузьминов Михаил', 40), ('Орлова Елена', 30)],
+        )
+
+    # Число запросов не зависит от количества новых и закрытых задолженностей
+    def test_update_students_with_debts_query_count(self):
+        for i in range(20):
+            Student.objects.create(name=f'Должник {i}', discipline='Физика', score=30)
+        with self.assertNumQueries(5):
+            self.assertEqual(update_students_with_debts()['inserted'], 22)
+
+        Student.objects.filter(name__startswith='Должник').update(score=90)
+        with self.assertNumQueries(5):
+            self.assertEqual(update_students_with_debts()['deleted'], 20)
+
     def test_get_students_with_academic_debts(self):
         # Вызываем функцию для получения студентов с долгами
         students_with_debts = get_students_with_academic_debts()
@@ -222,3 +434,97 @@ class StudentViewsTests(TestCase):
         self.assertEqual(students_with_debts.count(), 2)
         self.assertIn('Федотова Елена', [student.name for student in students_with_debts])
         self.assertIn('Кузьминов Михаил', [student.name for student in students_with_debts])
+
+
+class CacheTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        self.student1 = Student.objects.create(name='Петров Андрей', discipline='Физика', score=85)
+        self.student2 = Student.objects.create(name='Сидоров Сергей', discipline='Информатика', score=70)
+
+    # Повторный запрос страницы студента не обращается к базе данных
+    def test_student_page_cached(self):
+        self.client.post(reverse('student_info'), {'student': 'Петров Андрей'})
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('student_info'), {'student': '  Петров   Андрей '})
+        self.assertContains(response, 'Физика')
+
+    # Изменение студента вытесняет только его записи и записи его дисциплины
+    def test_precise_invalidation(self):
+        self.client.post(reverse('student_info'), {'student': 'Петров Андрей'})
+        self.client.post(reverse('student_info'), {'student': 'Сидоров Сергей'})
+
+        # Версии меняются только после фиксации транзакции
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.student1.score = 99
+            self.student1.save()
+        self.assertNotContains(self.client.post(reverse('student_info'), {'student': 'Петров Андрей'}), '99')
+        for callback in callbacks:
+            callback()
+
+        with self.assertNumQueries(0):
+            self.client.post(reverse('student_info'), {'student': 'Сидоров Сергей'})
+        response = self.client.post(reverse('student_info'), {'student': 'Петров Андрей'})
+        self.assertContains(response, '99')
+
+    # Страница должников сбрасывается после обновления списка
+    def test_debts_page_invalidated(self):
+        self.client.get(reverse('students_with_debts'))
+        Student.objects.create(name='Орлова Елена', discipline='Физика', score=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_students_with_debts()
+
+        response = self.client.get(reverse('students_with_debts'))
+        self.assertContains(response, 'Орлова Елена')
+
+    # Счетчики попаданий и промахов
+    def test_cache_stats(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        counters = json.loads(self.client.get(reverse('cache_stats')).content)
+        self.assertGreaterEqual(counters['index']['hits'], 1)
+        self.assertGreaterEqual(counters['index']['misses'], 1)
+
+
+class AsyncViewsTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        Student.objects.create(name='Петров Андрей', discipline='Физика', score=85)
+        Student.objects.create(name='Сидоров Сергей', discipline='Физика', score=40)
+
+    # Асинхронные обработчики возвращают те же страницы, что и синхронные
+    async def test_async_info_pages(self):
+        response = await self.async_client.get(reverse('async_student_info'), {'student': 'Петров Андрей'})
+        self.assertContains(response, 'Физика')
+        self.assertEqual(response.context['stud_stats'][0], 1)
+
+        response = await self.async_client.get(reverse('async_discipline_info'), {'discipline': 'Физика'})
+        self.assertContains(response, 'Сидоров Сергей')
+
+        response = await self.async_client.get(reverse('async_student_info'), {'student': 'Не существующий'})
+        self.assertContains(response, 'Не существующий - такого студента нет!')
+        response = await self.async_client.get(reverse('async_student_info'),
+                                               {'student': 'Не существующий', 'after': 5})
+        self.assertContains(response, 'Не существующий - такого студента нет!')
+
+        response = await self.async_client.get(reverse('async_discipline_info'))
+        self.assertTemplateUsed(response, 'students_scores/get_info.html')
+
+    # Асинхронные страницы берут из кэша записи, сохраненные синхронными, и наоборот
+    async def test_async_pages_share_cache(self):
+        await sync_to_async(self.client.get)(reverse('student_info'), {'student': 'Петров Андрей'})
+        hits = get_counters()['student']['hits']
+        response = await self.async_client.get(reverse('async_student_info'), {'student': 'Петров Андрей'})
+        self.assertContains(response, 'Физика')
+        self.assertEqual(get_counters()['student']['hits'], hits + 2)
+
+    # Асинхронные главная страница и список должников
+    async def test_async_index_and_debts(self):
+        response = await self.async_client.get(reverse('async_index'))
+        self.assertContains(response, 'Петров Андрей')
+
+        await sync_to_async(refresh_students_with_debts)()
+        response = await self.async_client.get(reverse('async_students_with_debts'))
+        self.assertContains(response, 'Сидоров Сергей')
+        self.assertNotContains(response, 'Петров Андрей')
@@ -7,5 +7,29 @@ urlpatterns = [
     path('get_info/', views.get_info_page, name='get_info'),
     path('student_info/', views.student_info_page, name='student_info'),
     path('discipline_info/', views.discipline_info_page, name='discipline_info'),
+    path('async/', views.async_index, name='async_index'),
+    path('async/student_info/', views.async_student_info_page, name='async_student_info'),
+    path('async/discipline_info/', views.async_discipline_info_page, name='async_discipline_info'),
+    path('async/students_with_debts/', views.async_list_students_with_debts, name='async_students_with_debts'),
+    path('overview/', views.stats_overview, name='stats_overview'),
+    path('overview/json/', views.stats_overview_json, name='stats_overview_json'),
     path('students_with_debts/', views.list_students_with_debts, name='students_with_debts'),
+    path('api/students/<str:name>/stats', views.api_student_stats, name='api_student_stats'),
+    path('api/disciplines/<str:discipline>/stats', views.api_discipline_stats, name='api_discipline_stats'),
+    path('api/students/<str:name>/distribution', views.api_student_distribution,
+         name='api_student_distribution'),
+    path('api/disciplines/<str:discipline>/distribution', views.api_discipline_distribution,
+         name='api_discipline_distribution'),
+    path('api/distribution', views.api_distribution, name='api_distribution'),
+    path('api/ranking/students', views.api_ranking, name='api_ranking'),
+    path('api/ranking/disciplines/<str:discipline>', views.api_discipline_ranking, name='api_discipline_ranking'),
+    path('api/students/<str:name>/rank', views.api_student_rank, name='api_student_rank'),
+    path('api/search', views.api_search, name='api_search'),
+    path('api/stats/batch', views.api_batch_stats, name='api_batch_stats'),
+    path('api/debts', views.api_debts, name='api_debts'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('cache/stats/', views.cache_stats, name='cache_stats'),
+    path('export/students/', views.export_students, name='export_students'),
+    path('export/disciplines/<str:discipline>/', views.export_discipline, name='export_discipline'),
+    path('export/students_with_debts/', views.export_students_with_debts, name='export_students_with_debts'),
 ]
@@ -1,98 +1,81 @@
-import numpy as np
+import csv
+import json
+from itertools import islice
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
-from django.db.models import QuerySet
-from typing import List
+from asgiref.sync import sync_to_async
+from prometheus_client import CONTENT_TYPE_LATEST
+from django.db import connection, transaction
+from django.db.models import QuerySet, Exists, OuterRef, Subquery
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from abc import ABC, abstractmethod
-from .models import Student, StudentWithDebts
-
-
-# Паттерн Adapter (start)
-class DataAdapter:
-    def __init__(self, queryset: QuerySet):
-        self.queryset = queryset
-
-    def get_scores(self) -> List[int]:
-        return [entry['score'] for entry in self.queryset.values('score')]
-
-
-class StatsCalculator:
-    def calculate_stats(self, scores: List[int]) -> List[float]:
-        stud_count = len(scores)
-        # Вычисляем максимальную, минимальную и среднюю оценку по дисциплинам
-        max_score = np.max(scores)
-        min_score = np.min(scores)
-        avg_score = np.mean(scores)
-        # Вычисляем стандартное отклонение баллов
-        std_dev = np.std(scores)
-        # Вычисляем дисперсию баллов
-        variance = np.var(scores)
-        return [stud_count, max_score, min_score, avg_score, std_dev, variance]
-
-
-class StudentStats:
-    def __init__(self, name: str, stats_calculator: StatsCalculator):
-        self.name = name
-        self.stats_calculator = stats_calculator
-
-    def calculate_student_stats(self) -> List[float]:
-        queryset = Student.objects.filter(name=self.name)
-        data_adapter = DataAdapter(queryset)
-        scores = data_adapter.get_scores()
-        return self.stats_calculator.calculate_stats(scores)
-
-
-class DisciplineStats:
-    def __init__(self, discipline_name: str, stats_calculator: StatsCalculator):
-        self.discipline_name = discipline_name
-        self.stats_calculator = stats_calculator
-
-    def calculate_discipline_stats(self) -> List[float]:
-        queryset = Student.objects.filter(discipline=self.discipline_name)
-        data_adapter = DataAdapter(queryset)
-        scores = data_adapter.get_scores()
-        return self.stats_calculator.calculate_stats(scores)
-
-# Паттерн Adapter (end)
-
-
-# class StatsCalculator:
-#     def calculate_stats(self, scores: List[int]) -> List[float]:
-#         stud_count = len(scores)
-#         # Вычисляем максимальную, минимальную и среднюю оценку по дисциплинам
-#         max_score = np.max(scores)
-#         min_score = np.min(scores)
-#         avg_score = np.mean(scores)
-#         # Вычисляем стандартное отклонение баллов
-#         std_dev = np.std(scores)
-#         # Вычисляем дисперсию баллов
-#         variance = np.var(scores)
-#         return [stud_count, max_score, min_score, avg_score, std_dev, variance]
-#
-#
-# class StudentStats:
-#     def __init__(self, name: str, stats_calculator: StatsCalculator):
-#         self.name = name
-#         self.stats_calculator = stats_calculator
-#
-#     def calculate_student_stats(self) -> List[float]:
-#         # Извлекаем оценки из QuerySet
-#         student_info = Student.objects.filter(name=self.name).values()
-#         scores = [entry['score'] for entry in student_info]
-#         return self.stats_calculator.calculate_stats(scores)
-#
-#
-# class DisciplineStats:
-#     def __init__(self, discipline_name: str, stats_calculator: StatsCalculator):
-#         self.discipline_name = discipline_name
-#         self.stats_calculator = stats_calculator
-#
-#     def calculate_discipline_stats(self) -> List[float]:
-#         # Извлекаем оценки из QuerySet
-#         discipline_info = Student.objects.filter(discipline=self.discipline_name).values()
-#         scores = [entry['score'] for entry in discipline_info]
-#         return self.stats_calculator.calculate_stats(scores)
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils import timezone
+from django.utils.html import format_html
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_http_methods
+from .models import DEBT_SCORE, Student, StudentWithDebts, ScoreSummary, DebtsRefreshState
+from . import cache, metrics
+from .summary import get_histogram, get_merged_histogram
+from .data_version import get_data_version
+from .ranking import discipline_ranks, get_leaderboard, top_in_discipline
+from .search import suggest
+from .snapshot import get_snapshot
+from .stats import STATS_FIELDS, DisciplineStats, StudentStats, get_stats_calculator, stats_from_sums
+
+
+# Keyset-пагинация по id: страница выбирается условием id > after, а не OFFSET,
+# поэтому стоимость запроса не зависит от номера страницы и размера таблицы
+def get_page_params(params) -> Tuple[int, int]:
+    page_size = getattr(settings, 'STUDENTS_PAGE_SIZE', 100)
+    max_page_size = getattr(settings, 'STUDENTS_MAX_PAGE_SIZE', 1000)
+    try:
+        after = max(int(params.get('after', 0)), 0)
+    except (TypeError, ValueError):
+        after = 0
+    try:
+        size = min(max(int(params.get('size', page_size)), 1), max_page_size)
+    except (TypeError, ValueError):
+        size = page_size
+    return after, size
+
+
+def get_keyset_page(queryset: QuerySet, after: int, size: int) -> Tuple[list, Optional[int]]:
+    # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+    rows = list(queryset.filter(id__gt=after).order_by('id')[:size + 1])
+    next_after = rows[size - 1].id if len(rows) > size else None
+    return rows[:size], next_after
+
+
+async def aget_keyset_page(queryset: QuerySet, after: int, size: int) -> Tuple[list, Optional[int]]:
+    rows = [row async for row in queryset.filter(id__gt=after).order_by('id')[:size + 1]]
+    next_after = rows[size - 1].id if len(rows) > size else None
+    return rows[:size], next_after
+
+
+def load_page(queryset: QuerySet, after: int, size: int, template: str, rows_name: str, **extra) -> dict:
+    # Страница строк вместе с уже отрендеренной таблицей - в таком виде она кладется в кэш
+    rows, next_after = get_keyset_page(queryset, after, size)
+    metrics.add_rows(len(rows))
+    with metrics.timed('template'):
+        rows_html = render_to_string(template, {rows_name: rows})
+    # Пустая страница после курсора (after > 0) еще не значит, что выборка пуста - это проверяется отдельно
+    found = bool(rows) or (after > 0 and queryset.exists())
+    return {'rows': rows, 'next_after': next_after, 'rows_html': rows_html, 'found': found, **extra}
+
+
+async def aload_page(queryset: QuerySet, after: int, size: int, template: str, rows_name: str, **extra) -> dict:
+    # То же асинхронным ORM; страница кладется в кэш в том же виде, что и load_page
+    rows, next_after = await aget_keyset_page(queryset, after, size)
+    metrics.add_rows(len(rows))
+    with metrics.timed('template'):
+        rows_html = render_to_string(template, {rows_name: rows})
+    found = bool(rows) or (after > 0 and await queryset.aexists())
+    return {'rows': rows, 'next_after': next_after, 'rows_html': rows_html, 'found': found, **extra}
 
 
 # Паттерн Factory Method (start)
@@ -101,30 +84,44 @@ class RequestHandler(ABC):
     def handle_request(self, request):
         pass
 
-    def get_input(self, request, field_name):
-        if request.method == 'POST':
-            return str(request.POST.get(field_name))
-        return "not a POST request"
+    def get_input(self, request, field_name) -> Optional[str]:
+        # GET-запросы (?student=...) идемпотентны и могут кэшироваться браузером и прокси.
+        # Без поля возвращается None - обработчик показывает форму поиска
+        params = request.POST if request.method == 'POST' else request.GET
+        value = params.get(field_name)
+        return None if value is None else str(value)
+
+    def render_form(self, request):
+        return self.render_template(request, 'students_scores/get_info.html', {})
 
     def render_template(self, request, template, context):
-        return render(request, template, context)
+        with metrics.timed('template'):
+            return render(request, template, context)
 
     def render_error(self, request, message, link):
-        return HttpResponse(f'<h3>{message}</h3><br><a href="{link}">Вернуться назад</a>')
+        # Сообщение содержит введенное имя из строки запроса - экранируется
+        return HttpResponse(format_html('<h3>{}</h3><br><a href="{}">Вернуться назад</a>', message, link))
 
 
 class StudentInfoHandler(RequestHandler):
     def handle_request(self, request):
         student_name = self.get_input(request, "student")
-
-        if Student.objects.filter(name=student_name).exists():
-            student_info = Student.objects.filter(name=student_name)
-
-            stats_calculator = StatsCalculator()
-            student = StudentStats(student_name, stats_calculator=stats_calculator)
-            stud_stats = student.calculate_student_stats()
-
-            context = {'student_info': student_info, 'student_name': student_name, 'stud_stats': stud_stats}
+        if student_name is None:
+            return self.render_form(request)
+        student_name = cache.normalize(student_name)
+        after, size = get_page_params(request.POST if request.method == 'POST' else request.GET)
+
+        # Один запрос к Student: пустая первая страница означает, что такого студента нет
+        page = cache.get_or_compute(cache.KIND_STUDENT, student_name, f'page:{after}:{size}', lambda: load_page(
+            Student.objects.filter(name=student_name), after, size,
+            'students_scores/includes/student_rows.html', 'student_info'))
+        if page['found']:
+            stud_stats = cache.get_or_compute(cache.KIND_STUDENT, student_name, 'stats', lambda: StudentStats(
+                student_name, stats_calculator=get_stats_calculator()
+            ).calculate_student_stats())
+
+            context = {'student_info': page['rows'], 'student_name': student_name, 'stud_stats': stud_stats,
+                       'rows_html': page['rows_html'], 'next_after': page['next_after'], 'page_size': size}
             return self.render_template(request, 'students_scores/student_form.html', context)
         else:
             link = reverse('get_info')
@@ -134,15 +131,72 @@ class StudentInfoHandler(RequestHandler):
 class DisciplineInfoHandler(RequestHandler):
     def handle_request(self, request):
         discipline_name = self.get_input(request, "discipline")
+        if discipline_name is None:
+            return self.render_form(request)
+        discipline_name = cache.normalize(discipline_name)
+        after, size = get_page_params(request.POST if request.method == 'POST' else request.GET)
+
+        page = cache.get_or_compute(cache.KIND_DISCIPLINE, discipline_name, f'page:{after}:{size}', lambda: load_page(
+            Student.objects.filter(discipline=discipline_name), after, size,
+            'students_scores/includes/discipline_rows.html', 'discipline_info'))
+        if page['found']:
+            disc_stats = cache.get_or_compute(cache.KIND_DISCIPLINE, discipline_name, 'stats', lambda: DisciplineStats(
+                discipline_name, stats_calculator=get_stats_calculator()
+            ).calculate_discipline_stats())
+
+            context = {'discipline_info': page['rows'], 'discipline_name': discipline_name, 'disc_stats': disc_stats,
+                       'rows_html': page['rows_html'], 'next_after': page['next_after'], 'page_size': size}
+            return self.render_template(request, 'students_scores/discipline_form.html', context)
+        else:
+            link = reverse('get_info')
+            return self.render_error(request, f'{discipline_name} - такой дисциплины нет!', link)
+
 
-        if Student.objects.filter(discipline=discipline_name).exists():
-            discipline_info = Student.objects.filter(discipline=discipline_name)
+# Асинхронные обработчики для ASGI: страницы читаются асинхронным ORM и кэшируются в тех же записях,
+# что и у синхронных; расчет статистики (запрос к ScoreSummary) выполняется в пуле потоков через sync_to_async
+class AsyncStudentInfoHandler(RequestHandler):
+    async def handle_request(self, request):
+        student_name = self.get_input(request, "student")
+        if student_name is None:
+            return self.render_form(request)
+        student_name = cache.normalize(student_name)
+        after, size = get_page_params(request.POST if request.method == 'POST' else request.GET)
+
+        page = await cache.aget_or_compute(cache.KIND_STUDENT, student_name, f'page:{after}:{size}', lambda: aload_page(
+            Student.objects.filter(name=student_name), after, size,
+            'students_scores/includes/student_rows.html', 'student_info'))
+        if page['found']:
+            stud_stats = await cache.aget_or_compute(cache.KIND_STUDENT, student_name, 'stats', sync_to_async(
+                lambda: StudentStats(student_name, stats_calculator=get_stats_calculator()).calculate_student_stats()))
+
+            context = {'student_info': page['rows'], 'student_name': student_name, 'stud_stats': stud_stats,
+                       'rows_html': page['rows_html'], 'next_after': page['next_after'], 'page_size': size}
+            return self.render_template(request, 'students_scores/student_form.html', context)
+        else:
+            link = reverse('get_info')
+            return self.render_error(request, f'{student_name} - такого студента нет!', link)
 
-            stats_calculator = StatsCalculator()
-            discipline = DisciplineStats(discipline_name, stats_calculator=stats_calculator)
-            disc_stats = discipline.calculate_discipline_stats()
 
-            context = {'discipline_info': discipline_info, 'discipline_name': discipline_name, 'disc_stats': disc_stats}
+class AsyncDisciplineInfoHandler(RequestHandler):
+    async def handle_request(self, request):
+        discipline_name = self.get_input(request, "discipline")
+        if discipline_name is None:
+            return self.render_form(request)
+        discipline_name = cache.normalize(discipline_name)
+        after, size = get_page_params(request.POST if request.method == 'POST' else request.GET)
+
+        page = await cache.aget_or_compute(
+            cache.KIND_DISCIPLINE, discipline_name, f'page:{after}:{size}', lambda: aload_page(
+                Student.objects.filter(discipline=discipline_name), after, size,
+                'students_scores/includes/discipline_rows.html', 'discipline_info'))
+        if page['found']:
+            disc_stats = await cache.aget_or_compute(cache.KIND_DISCIPLINE, discipline_name, 'stats', sync_to_async(
+                lambda: DisciplineStats(discipline_name, stats_calculator=get_stats_calculator()
+                                        ).calculate_discipline_stats()))
+
+            context = {'discipline_info': page['rows'], 'discipline_name': discipline_name,
+                       'disc_stats': disc_stats, 'rows_html': page['rows_html'],
+                       'next_after': page['next_after'], 'page_size': size}
             return self.render_template(request, 'students_scores/discipline_form.html', context)
         else:
             link = reverse('get_info')
@@ -151,63 +205,549 @@ class DisciplineInfoHandler(RequestHandler):
 
 class RequestHandlerFactory:
     @staticmethod
-    def create_handler(request_type):
+    def create_handler(request_type, is_async=False):
         if request_type == 'student':
-            return StudentInfoHandler()
+            return AsyncStudentInfoHandler() if is_async else StudentInfoHandler()
         elif request_type == 'discipline':
-            return DisciplineInfoHandler()
+            return AsyncDisciplineInfoHandler() if is_async else DisciplineInfoHandler()
         else:
             raise ValueError("Unknown request type")
 
 
 def student_info_page(request):
     handler = RequestHandlerFactory.create_handler('student')
-    return handler.handle_request(request)
+    with metrics.timed('handler'):
+        return handler.handle_request(request)
 
 
 def discipline_info_page(request):
     handler = RequestHandlerFactory.create_handler('discipline')
-    return handler.handle_request(request)
+    with metrics.timed('handler'):
+        return handler.handle_request(request)
+
+
+async def async_student_info_page(request):
+    handler = RequestHandlerFactory.create_handler('student', is_async=True)
+    with metrics.timed('handler'):
+        return await handler.handle_request(request)
+
+
+async def async_discipline_info_page(request):
+    handler = RequestHandlerFactory.create_handler('discipline', is_async=True)
+    with metrics.timed('handler'):
+        return await handler.handle_request(request)
 
 # Паттерн Factory Method (end)
 
 
 def index(request):
-    students = Student.objects.all()
-    context = {'students': students}
+    after, size = get_page_params(request.GET)
+    page = cache.get_or_compute(cache.KIND_INDEX, '', f'page:{after}:{size}', lambda: load_page(
+        Student.objects.all(), after, size, 'students_scores/includes/index_rows.html', 'students'))
+    context = {'students': page['rows'], 'rows_html': page['rows_html'], 'next_after': page['next_after'],
+               'page_size': size}
+    return render(request, 'students_scores/index.html', context)
+
+
+async def async_index(request):
+    after, size = get_page_params(request.GET)
+    page = await cache.aget_or_compute(cache.KIND_INDEX, '', f'page:{after}:{size}', lambda: aload_page(
+        Student.objects.all(), after, size, 'students_scores/includes/index_rows.html', 'students'))
+    context = {'students': page['rows'], 'rows_html': page['rows_html'], 'next_after': page['next_after'],
+               'page_size': size}
     return render(request, 'students_scores/index.html', context)
 
 
+def summary_stats(kind: str, keys: List[str] = None) -> Dict[str, List[float]]:
+    # Статистика групп по ScoreSummary одним запросом, без сканирования Student
+    queryset = ScoreSummary.objects.filter(kind=kind, count__gt=0)
+    if keys is not None:
+        queryset = queryset.filter(key__in=keys)
+    return {summary.key: stats_from_sums(summary.count, summary.total, summary.total_sq, summary.max_score,
+                                         summary.min_score) for summary in queryset}
+
+
+def get_overview(request) -> dict:
+    # Дисциплины - все (их немного), студенты - только первые ?top= мест рейтинга:
+    # объем страницы не зависит от числа студентов
+    top = get_top_param(request, getattr(settings, 'OVERVIEW_TOP', 100))
+    leaderboard = get_leaderboard()
+    entries = leaderboard.top(top)
+    stats = summary_stats(ScoreSummary.KIND_STUDENT, [entry['name'] for entry in entries])
+    return {
+        'disciplines': sorted(summary_stats(ScoreSummary.KIND_DISCIPLINE).items()),
+        'students': [(entry['place'], entry['name'], stats[entry['name']]) for entry in entries
+                     if entry['name'] in stats],
+        'total': len(leaderboard),
+    }
+
+
+def stats_overview(request):
+    # Сводная статистика по всем дисциплинам и первые места рейтинга студентов
+    return render(request, 'students_scores/overview.html', get_overview(request))
+
+
+def stats_overview_json(request):
+    overview = get_overview(request)
+    data = {
+        'disciplines': [{'discipline': key, 'stats': stats} for key, stats in overview['disciplines']],
+        'students': [{'rank': place, 'name': key, 'stats': stats} for place, key, stats in overview['students']],
+        'total': overview['total'],
+    }
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
 def get_info_page(request):
     return render(request, 'students_scores/get_info.html')
 
 
-def update_students_with_debts():
-    # Получаем студентов с оценкой ниже 61
-    students_with_debts = Student.objects.filter(score__lt=61)
-
-    for student in students_with_debts:
-        # Проверяем, есть ли уже такой студент в модели StudentWithDebts
-        if not StudentWithDebts.objects.filter(name=student.name, discipline=student.discipline).exists():
-            # Если студента нет, добавляем его
-            StudentWithDebts.objects.create(
-                name=student.name,
-                discipline=student.discipline,
-                score=student.score
-            )
+@metrics.timed('debts_sync')
+def update_students_with_debts() -> Dict[str, int]:
+    # Синхронизация StudentWithDebts с Student постоянным числом запросов в одной транзакции.
+    # Сигналы StudentWithDebts здесь не отправляются, кэш страницы должников сбрасывается в конце один раз
+    debts = Student.objects.filter(score__lt=DEBT_SCORE)
+    same_debt = debts.filter(name=OuterRef('name'), discipline=OuterRef('discipline'))
+
+    with transaction.atomic():
+        # Удаляем закрытые задолженности одним DELETE: queryset.delete() выбрал бы строки
+        # и отправил post_delete для каждой
+        closed = StudentWithDebts.objects.exclude(Exists(same_debt))
+        deleted = closed._raw_delete(closed.db)
+
+        # Обновляем изменившиеся баллы
+        updated = StudentWithDebts.objects.filter(Exists(same_debt.exclude(score=OuterRef('score')))).update(
+            score=Subquery(same_debt.values('score')[:1])
+        )
+
+        # Добавляем новых должников, которых еще нет в StudentWithDebts, одним INSERT ... SELECT.
+        # rowcount - число действительно добавленных строк (конфликты с параллельным обновлением пропускаются)
+        new_debts = debts.exclude(Exists(StudentWithDebts.objects.filter(
+            name=OuterRef('name'), discipline=OuterRef('discipline')))).values_list('name', 'discipline', 'score')
+        select, params = new_debts.query.sql_with_params()
+        table = connection.ops.quote_name(StudentWithDebts._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'INSERT INTO {table} (name, discipline, score) {select} ON CONFLICT DO NOTHING', params)
+            inserted = cursor.rowcount
+
+    if inserted or updated or deleted:
+        transaction.on_commit(lambda: cache.invalidate(cache.KIND_DEBTS))
+    return {'inserted': inserted, 'updated': updated, 'deleted': deleted}
+
+
+def refresh_students_with_debts(force: bool = False) -> Optional[Dict[str, int]]:
+    # Обновление выполняется только если Student менялся с прошлого раза (или принудительно)
+    state, _ = DebtsRefreshState.objects.get_or_create(pk=1)
+    if not state.dirty and not force:
+        return None
+    # Флаг сбрасывается до синхронизации: изменения, пришедшие во время нее, снова его выставят.
+    # Транзакция синхронизации на это время строку состояния не блокирует - записи в Student не ждут ее
+    DebtsRefreshState.objects.filter(pk=1).update(dirty=False)
+    try:
+        result = update_students_with_debts()
+    except Exception:
+        # Синхронизация откатилась - флаг возвращается, и следующий проход повторит ее
+        DebtsRefreshState.objects.filter(pk=1).update(dirty=True)
+        raise
+    DebtsRefreshState.objects.filter(pk=1).update(refreshed_at=timezone.now())
+    # На странице должников показывается время обновления, поэтому ее кэш сбрасывается всегда
+    transaction.on_commit(lambda: cache.invalidate(cache.KIND_DEBTS))
+    return result
+
+
+def get_debts_refreshed_at():
+    # Копия StudentWithDebts актуальна на момент последнего обновления командой refresh_debts
+    state = DebtsRefreshState.objects.filter(pk=1).first()
+    return state.refreshed_at if state else None
 
 
 def get_students_with_academic_debts():
-    # Получаем студентов с оценкой ниже 61
-    students_with_debts = Student.objects.filter(score__lt=61)
+    # Получаем студентов с академической задолженностью (оценка ниже DEBT_SCORE)
+    students_with_debts = Student.objects.filter(score__lt=DEBT_SCORE)
     return students_with_debts
 
 
 def list_students_with_debts(request):
-    # Обновляем список студентов с долгами
-    update_students_with_debts()
+    # Страница только читает StudentWithDebts, обновлением занимается команда refresh_debts
+    after, size = get_page_params(request.GET)
+
+    # Актуальный снимок содержит задолженности на момент последней записи - страница строится из него
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        students_with_debts, next_after = snapshot.debts_page(after, size)
+        return render(request, 'students_scores/students_with_debts.html',
+                      {'students_with_debts': students_with_debts,
+                       'rows_html': render_to_string('students_scores/includes/debts_rows.html',
+                                                     {'students_with_debts': students_with_debts}),
+                       'refreshed_at': snapshot.version[1], 'next_after': next_after, 'page_size': size})
+
+    def load_debts_page():
+        return load_page(StudentWithDebts.objects.all(), after, size, 'students_scores/includes/debts_rows.html',
+                         'students_with_debts', refreshed_at=get_debts_refreshed_at())
+
+    page = cache.get_or_compute(cache.KIND_DEBTS, '', f'page:{after}:{size}', load_debts_page)
+    return render(request, 'students_scores/students_with_debts.html',
+                  {'students_with_debts': page['rows'], 'rows_html': page['rows_html'],
+                   'refreshed_at': page['refreshed_at'], 'next_after': page['next_after'], 'page_size': size})
+
 
-    students_with_debts = get_students_with_academic_debts()
+async def async_list_students_with_debts(request):
+    after, size = get_page_params(request.GET)
 
+    async def load_debts_page():
+        return await aload_page(StudentWithDebts.objects.all(), after, size,
+                                'students_scores/includes/debts_rows.html', 'students_with_debts',
+                                refreshed_at=await sync_to_async(get_debts_refreshed_at)())
+
+    page = await cache.aget_or_compute(cache.KIND_DEBTS, '', f'page:{after}:{size}', load_debts_page)
     return render(request, 'students_scores/students_with_debts.html',
-                  {'students_with_debts': students_with_debts})
+                  {'students_with_debts': page['rows'], 'rows_html': page['rows_html'],
+                   'refreshed_at': page['refreshed_at'], 'next_after': page['next_after'], 'page_size': size})
+
+
+def metrics_view(request):
+    # Метрики всех воркеров (включая счетчики кэша) в текстовом формате Prometheus
+    return HttpResponse(metrics.registry.render(), content_type=CONTENT_TYPE_LATEST)
+
+
+def cache_stats(request):
+    # Счетчики попаданий и промахов кэша по всем воркерам
+    return JsonResponse(cache.get_counters())
+
+
+# Потоковая выгрузка оценок (start)
+EXPORT_FIELDS = ('name', 'discipline', 'score')
+
+
+class Echo:
+    # Псевдо-файл для csv.writer: вместо записи возвращает строку, которую сразу отдает StreamingHttpResponse
+    def write(self, value):
+        return value
+
+
+def get_export_queryset(queryset: QuerySet) -> QuerySet:
+    return queryset.order_by('id').values_list(*EXPORT_FIELDS)
+
+
+def iter_export_rows(queryset: QuerySet) -> Iterator[tuple]:
+    # iterator() на PostgreSQL использует серверный курсор (если он не отключен DB_SERVER_SIDE_CURSORS=0),
+    # поэтому в памяти держится только один chunk
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    return get_export_queryset(queryset).iterator(chunk_size=chunk_size)
+
+
+async def aiter_export_rows(queryset: QuerySet) -> AsyncIterator[tuple]:
+    # Под ASGI синхронный итератор StreamingHttpResponse сначала целиком собирается в список, поэтому
+    # строки читаются по chunk через sync_to_async: всегда в одном потоке, с тем же соединением и серверным
+    # курсором. aiterator() здесь не подходит - для values_list он выполняет запрос прямо в цикле событий
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    rows = iter_export_rows(queryset)
+    while True:
+        chunk = await sync_to_async(lambda: list(islice(rows, chunk_size)))()
+        for row in chunk:
+            yield row
+        if len(chunk) < chunk_size:
+            break
+
+
+def iter_csv(rows: Iterator[tuple]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_ndjson(rows: Iterator[tuple]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n'
+
+
+async def aiter_csv(rows: AsyncIterator[tuple]) -> AsyncIterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    async for row in rows:
+        yield writer.writerow(row)
+
+
+async def aiter_ndjson(rows: AsyncIterator[tuple]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n'
+
+
+def export_response(request, queryset: QuerySet, filename: str):
+    export_format = request.GET.get('format', 'csv')
+    if isinstance(request, ASGIRequest):
+        rows, to_csv, to_ndjson = aiter_export_rows(queryset), aiter_csv, aiter_ndjson
+    else:
+        rows, to_csv, to_ndjson = iter_export_rows(queryset), iter_csv, iter_ndjson
+    if export_format == 'csv':
+        response = StreamingHttpResponse(to_csv(rows), content_type='text/csv; charset=utf-8')
+    elif export_format == 'ndjson':
+        response = StreamingHttpResponse(to_ndjson(rows), content_type='application/x-ndjson; charset=utf-8')
+    else:
+        return JsonResponse({'error': 'неизвестный формат выгрузки', 'formats': ['csv', 'ndjson']}, status=400,
+                            json_dumps_params={'ensure_ascii': False})
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
+def export_students(request):
+    return export_response(request, Student.objects.all(), 'students')
+
+
+def export_discipline(request, discipline):
+    return export_response(request, Student.objects.filter(discipline=discipline), 'discipline')
+
+
+def export_students_with_debts(request):
+    return export_response(request, StudentWithDebts.objects.all(), 'students_with_debts')
+
+# Потоковая выгрузка оценок (end)
+
+
+# JSON API (start)
+api_cache_control = cache_control(public=True, max_age=getattr(settings, 'API_CACHE_MAX_AGE', 30))
+
+
+def get_request_data_version(request):
+    # ETag и Last-Modified считаются по одной версии данных, читаемой один раз на запрос
+    if not hasattr(request, '_data_version'):
+        request._data_version = get_data_version()
+    return request._data_version
+
+
+def data_etag(request, *args, **kwargs):
+    return f'data-{get_request_data_version(request)[0]}'
+
+
+def data_last_modified(request, *args, **kwargs):
+    return get_request_data_version(request)[1]
+
+
+def get_request_debts_refreshed_at(request):
+    if not hasattr(request, '_debts_refreshed_at'):
+        request._debts_refreshed_at = get_debts_refreshed_at()
+    return request._debts_refreshed_at
+
+
+def debts_etag(request, *args, **kwargs):
+    refreshed_at = get_request_debts_refreshed_at(request)
+    return f'debts-{refreshed_at.timestamp() if refreshed_at else 0}'
+
+
+def debts_last_modified(request, *args, **kwargs):
+    return get_request_debts_refreshed_at(request)
+
+
+def format_stats(stats: List[float]) -> Dict[str, float]:
+    # count/max/min - целые, остальное - float (значения numpy в JSON не сериализуются)
+    return dict(zip(STATS_FIELDS, [float(value) if i >= 3 else int(value) for i, value in enumerate(stats)]))
+
+
+def stats_json(key_name: str, key: str, stats: List[float]):
+    if not stats:
+        return JsonResponse({'error': 'not found', key_name: key}, status=404,
+                            json_dumps_params={'ensure_ascii': False})
+    return JsonResponse({key_name: key, 'stats': format_stats(stats)}, json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+@api_cache_control
+@condition(etag_func=data_etag, last_modified_func=data_last_modified)
+def api_student_stats(request, name):
+    name = cache.normalize(name)
+    stats = cache.get_or_compute(
+        cache.KIND_STUDENT, name, 'stats',
+        lambda: StudentStats(name, stats_calculator=get_stats_calculator()).calculate_student_stats(),
+        data_version=get_request_data_version(request))
+    return stats_json('name', name, stats)
+
+
+@require_GET
+@api_cache_control
+@condition(etag_func=data_etag, last_modified_func=data_last_modified)
+def api_discipline_stats(request, discipline):
+    discipline = cache.normalize(discipline)
+    stats = cache.get_or_compute(
+        cache.KIND_DISCIPLINE, discipline, 'stats',
+        lambda: DisciplineStats(discipline, stats_calculator=get_stats_calculator()).calculate_discipline_stats(),
+        data_version=get_request_data_version(request))
+    return stats_json('discipline', discipline, stats)
+
+
+@require_GET
+@api_cache_control
+@condition(etag_func=debts_etag, last_modified_func=debts_last_modified)
+def api_debts(request):
+    after, size = get_page_params(request.GET)
+    rows, next_after = get_keyset_page(StudentWithDebts.objects.all(), after, size)
+    refreshed_at = get_request_debts_refreshed_at(request)
+    return JsonResponse({
+        'refreshed_at': refreshed_at.isoformat() if refreshed_at else None,
+        'next_after': next_after,
+        'results': [{'name': row.name, 'discipline': row.discipline, 'score': row.score} for row in rows],
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+def get_top_param(request, default: int = None) -> int:
+    top = default or getattr(settings, 'RANKING_TOP', 10)
+    try:
+        top = int(request.GET.get('top', top))
+    except (TypeError, ValueError):
+        pass
+    return min(max(top, 1), getattr(settings, 'RANKING_MAX_TOP', 1000))
+
+
+@require_GET
+@api_cache_control
+@condition(etag_func=data_etag, last_modified_func=data_last_modified)
+def api_ranking(request):
+    # Первые K студентов по среднему баллу из рейтинга в памяти процесса
+    leaderboard = get_leaderboard()
+    return JsonResponse({'total': len(leaderboard), 'results': leaderboard.top(get_top_param(request))},
+                        json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+@api_cache_control
+@condition(etag_func=data_etag, last_modified_func=data_last_modified)
+def api_discipline_ranking(request, discipline):
+    discipline = cache.normalize(discipline)
+    results = top_in_discipline(discipline, get_top_param(request))
+    if not results:
+        return JsonResponse({'error': 'not found', 'discipline': discipline}, status=404,
+                            json_dumps_params={'ensure_ascii': False})
+    return JsonResponse({'discipline': discipline, 'results': results}, json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+@api_cache_control
+@condition(etag_func=data_etag, last_modified_func=data_last_modified)
+def api_student_rank(request, name):
+    # Место в общем рейтинге (бинарный поиск) и в каждой дисциплине студента (по гистограммам)
+    name = cache.normalize(name)
+    overall = get_leaderboard().rank(name)
+    if overall is None:
+        return JsonResponse({'error': 'not found', 'name': name}, status=404, json_dumps_params={'ensure_ascii': False})
+    scores = dict(Student.objects.filter(name=name).values_list('discipline', 'score'))
+    return JsonResponse({'name': name, 'overall': overall, 'disciplines': discipline_ranks(scores)},
+                        json_dumps_params={'ensure_ascii': False})
+
+
+# Подсказки при вводе: ?kind=student|discipline
+SEARCH_KINDS = {'student': ScoreSummary.KIND_STUDENT, 'discipline': ScoreSummary.KIND_DISCIPLINE}
+
+
+@require_GET
+@api_cache_control
+@condition(etag_func=data_etag, last_modified_func=data_last_modified)
+def api_search(request):
+    # Имена, у которых с введенного текста начинается любое слово, из индекса в памяти процесса
+    kind = SEARCH_KINDS.get(request.GET.get('kind', 'student'))
+    if kind is None:
+        return JsonResponse({'error': 'неизвестный вид поиска', 'kinds': list(SEARCH_KINDS)}, status=400,
+                            json_dumps_params={'ensure_ascii': False})
+    query = request.GET.get('q', '')
+    limit = getattr(settings, 'SEARCH_LIMIT', 10)
+    try:
+        limit = int(request.GET.get('limit', limit))
+    except (TypeError, ValueError):
+        pass
+    limit = min(max(limit, 1), getattr(settings, 'SEARCH_MAX_LIMIT', 50))
+    results = suggest(kind, query, limit, get_request_data_version(request))
+    return JsonResponse({'query': query, 'results': results}, json_dumps_params={'ensure_ascii': False})
+
+
+def get_percentile_params(request) -> List[float]:
+    # ?p=90&p=99 - дополнительные перцентили, значения вне 0-100 отбрасываются
+    result = []
+    for value in request.GET.getlist('p'):
+        try:
+            q = float(value)
+        except ValueError:
+            continue
+        if 0 <= q <= 100:
+            result.append(q)
+    return result
+
+
+def distribution_json(key_name: str, key: str, histogram, request):
+    if not histogram.total:
+        return JsonResponse({'error': 'not found', key_name: key}, status=404,
+                            json_dumps_params={'ensure_ascii': False})
+    return JsonResponse({key_name: key, 'distribution': histogram.describe(get_percentile_params(request))},
+                        json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+@api_cache_control
+@condition(etag_func=data_etag, last_modified_func=data_last_modified)
+def api_student_distribution(request, name):
+    name = cache.normalize(name)
+    return distribution_json('name', name, get_histogram(ScoreSummary.KIND_STUDENT, name), request)
+
+
+@require_GET
+@api_cache_control
+@condition(etag_func=data_etag, last_modified_func=data_last_modified)
+def api_discipline_distribution(request, discipline):
+    discipline = cache.normalize(discipline)
+    return distribution_json('discipline', discipline, get_histogram(ScoreSummary.KIND_DISCIPLINE, discipline),
+                             request)
+
+
+@require_GET
+@api_cache_control
+@condition(etag_func=data_etag, last_modified_func=data_last_modified)
+def api_distribution(request):
+    # Распределение по всем оценкам - сумма гистограмм дисциплин
+    disciplines = get_batch_keys(request.GET.getlist('discipline')) or None
+    histogram = get_merged_histogram(ScoreSummary.KIND_DISCIPLINE, disciplines)
+    if disciplines and not histogram.total:
+        return JsonResponse({'error': 'not found', 'disciplines': disciplines}, status=404,
+                            json_dumps_params={'ensure_ascii': False})
+    return JsonResponse({'disciplines': disciplines, 'distribution': histogram.describe(get_percentile_params(request))},
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def batch_lookup(kind: str, key_name: str, keys: List[str]) -> List[dict]:
+    # Один запрос к ScoreSummary с IN по всем ключам: суммы групп уже посчитаны, строки Student не читаются.
+    # Порядок ответа совпадает с запросом
+    found = summary_stats(kind, keys) if keys else {}
+    return [
+        {key_name: key, 'stats': format_stats(found[key])} if key in found else {key_name: key, 'error': 'not found'}
+        for key in keys
+    ]
+
+
+def get_batch_keys(values) -> List[str]:
+    return list(dict.fromkeys(cache.normalize(value) for value in values if str(value).strip()))
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def api_batch_stats(request):
+    # GET ?student=...&discipline=... или POST {"students": [...], "disciplines": [...]}
+    if request.method == 'POST':
+        try:
+            body = json.loads(request.body or b'{}')
+            students, disciplines = body.get('students', []), body.get('disciplines', [])
+            if not isinstance(students, list) or not isinstance(disciplines, list):
+                raise ValueError
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'ожидается JSON вида {"students": [...], "disciplines": [...]}'},
+                                status=400, json_dumps_params={'ensure_ascii': False})
+    else:
+        students, disciplines = request.GET.getlist('student'), request.GET.getlist('discipline')
+
+    students, disciplines = get_batch_keys(students), get_batch_keys(disciplines)
+    max_items = getattr(settings, 'API_BATCH_MAX_ITEMS', 1000)
+    if len(students) + len(disciplines) > max_items:
+        return JsonResponse({'error': f'не больше {max_items} элементов за запрос'}, status=400,
+                            json_dumps_params={'ensure_ascii': False})
+
+    return JsonResponse({
+        'students': batch_lookup(ScoreSummary.KIND_STUDENT, 'name', students),
+        'disciplines': batch_lookup(ScoreSummary.KIND_DISCIPLINE, 'discipline', disciplines),
+    }, json_dumps_params={'ensure_ascii': False})
+
+# JSON API (end)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import sys
 import django_heroku
 import dj_database_url
 from pathlib import Path
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'students_scores.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -78,9 +80,10 @@ WSGI_APPLICATION = 'tp_kurs.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Псевдоним postgresql_psycopg2 удален еще в Django 3.0; backend postgresql работает и с psycopg 3
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': 'django_kurs_db',
         'USER' : 'postgres',
         'PASSWORD' : os.environ['DATABASE_PASSWORD'] if 'DATABASE_PASSWORD' in os.environ else 'ps_password',
@@ -90,9 +93,39 @@ DATABASES = {
 }
 
 DATABASE_URL = os.environ.get('DATABASE_URL')
-db_from_env = dj_database_url.config(default=DATABASE_URL, conn_max_age=500, ssl_require=True)
+# DATABASE_URL=sqlite:///bench.sqlite3 - локальная SQLite (например, для замеров), подключается без SSL
+DATABASE_IS_SQLITE = (DATABASE_URL or '').startswith('sqlite')
+db_from_env = dj_database_url.config(default=DATABASE_URL, ssl_require=not DATABASE_IS_SQLITE)
 DATABASES['default'].update(db_from_env)
 
+# Соединения с БД - одинаково для локальных настроек и DATABASE_URL.
+# DB_CONN_MAX_AGE - сколько секунд соединение переиспользуется между запросами (0 - новое на каждый запрос),
+# перед повторным использованием оно проверяется (DB_CONN_HEALTH_CHECKS), а не падает на первом запросе.
+# DB_POOL=1 - пул psycopg 3 в каждом процессе вместо постоянных соединений (OPTIONS['pool'], нужен Django 5.1+):
+# всего соединений до WEB_CONCURRENCY * DB_POOL_MAX_SIZE.
+# Под ASGI (GUNICORN_ASGI=1) постоянные соединения не используются: каждый запрос выполняется в своем потоке
+# sync_to_async, и соединения потоков не переиспользовались бы. Поэтому там по умолчанию пул и CONN_MAX_AGE=0.
+# DB_SERVER_SIDE_CURSORS=0 - для pgbouncer в режиме transaction: потоковые выгрузки читаются без серверного курсора
+ASGI_DEPLOYMENT = os.environ.get('GUNICORN_ASGI', '') == '1'
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 0 if ASGI_DEPLOYMENT else 600))
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1'
+DB_POOL = os.environ.get('DB_POOL', '1' if ASGI_DEPLOYMENT else '') == '1'
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 4))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_SERVER_SIDE_CURSORS = os.environ.get('DB_SERVER_SIDE_CURSORS', '1') == '1'
+
+DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+DATABASES['default']['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+if not DATABASE_IS_SQLITE:
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = not DB_SERVER_SIDE_CURSORS
+    if DB_POOL:
+        # Пул и постоянные соединения Django несовместимы: соединение возвращается в пул в конце запроса
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE, 'max_size': DB_POOL_MAX_SIZE, 'timeout': DB_POOL_TIMEOUT,
+        }
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -137,4 +170,72 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 STATIC_ROOT = os.path.join(BASE_DIR, STATIC_URL)
-django_heroku.settings(locals())
+
+# Размер страницы для списков студентов (keyset-пагинация)
+STUDENTS_PAGE_SIZE = int(os.environ.get('STUDENTS_PAGE_SIZE', 100))
+STUDENTS_MAX_PAGE_SIZE = int(os.environ.get('STUDENTS_MAX_PAGE_SIZE', 1000))
+
+# Кэш статистики и отрендеренных фрагментов страниц. Для нескольких процессов (воркеры gunicorn,
+# refresh_debts, команды загрузки) он должен быть общим, иначе инвалидация дойдет только до процесса,
+# сделавшего запись: в развертывании задается REDIS_URL. Без него - LocMemCache (локальный запуск с одним
+# процессом); CACHE_BACKEND/CACHE_LOCATION задают другой backend.
+# Тесты (manage.py test) всегда используют LocMemCache: cache.clear() в тестах не должен очищать Redis разработчика
+REDIS_URL = os.environ.get('REDIS_URL', '')
+TESTING = sys.argv[1:2] == ['test']
+if TESTING:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache' if REDIS_URL
+                                      else 'django.core.cache.backends.locmem.LocMemCache'),
+            'LOCATION': os.environ.get('CACHE_LOCATION', REDIS_URL),
+        }
+    }
+STUDENTS_CACHE_ALIAS = 'default'
+STUDENTS_CACHE_TIMEOUT = int(os.environ.get('STUDENTS_CACHE_TIMEOUT', 300))
+# LRU в памяти каждого процесса перед общим кэшем (ключ включает версию данных)
+STUDENTS_LOCAL_CACHE_SIZE = int(os.environ.get('STUDENTS_LOCAL_CACHE_SIZE', 1024))
+STUDENTS_LOCAL_CACHE_TTL = float(os.environ.get('STUDENTS_LOCAL_CACHE_TTL', 60))
+
+# Источник статистики на страницах студента и дисциплины:
+# summary - суммы из ScoreSummary, matrix - матрица гистограмм в памяти процесса,
+# database - агрегирующий запрос к Student, numpy - выгрузка оценок и расчет в NumPy,
+# snapshot - оценки группы из колоночного снимка (SNAPSHOT_DIR)
+STATS_BACKEND = os.environ.get('STATS_BACKEND', 'summary')
+# Колоночный снимок Student в .npy (команда build_snapshot), который воркеры открывают через mmap.
+# Пусто - снимок не используется. Устаревший снимок отклоняется (запросы идут в БД), пока
+# build_snapshot --interval не запишет новый
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', '')
+# Сколько последних поколений журнала изменений хранится: структура в памяти, отставшая сильнее,
+# перестраивается в фоне
+DATA_CHANGES_KEEP = int(os.environ.get('DATA_CHANGES_KEEP', 10000))
+# Каталог для сохраненной матрицы гистограмм (команда build_score_matrix); пусто - не сохранять
+SCORE_MATRIX_DIR = os.environ.get('SCORE_MATRIX_DIR', '')
+
+# Cache-Control: max-age для JSON API (ответы проверяются по ETag/Last-Modified)
+API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', 30))
+# Максимум студентов и дисциплин в одном пакетном запросе статистики
+API_BATCH_MAX_ITEMS = int(os.environ.get('API_BATCH_MAX_ITEMS', 1000))
+# Размер рейтинга по умолчанию (?top=) и его максимум
+RANKING_TOP = int(os.environ.get('RANKING_TOP', 10))
+RANKING_MAX_TOP = int(os.environ.get('RANKING_MAX_TOP', 1000))
+# Сколько мест рейтинга показывает сводная статистика (/overview/?top=)
+OVERVIEW_TOP = int(os.environ.get('OVERVIEW_TOP', 100))
+# Подсказки имен (/api/search): число по умолчанию и максимум; SEARCH_TRIGRAM=1 добавляет нечеткие
+# совпадения по индексу pg_trgm (только PostgreSQL)
+SEARCH_LIMIT = int(os.environ.get('SEARCH_LIMIT', 10))
+SEARCH_MAX_LIMIT = int(os.environ.get('SEARCH_MAX_LIMIT', 50))
+SEARCH_TRIGRAM = os.environ.get('SEARCH_TRIGRAM', '') == '1'
+
+# Метрики запросов (/metrics): заголовок Server-Timing в ответах и журнал запросов дольше
+# SLOW_REQUEST_MS миллисекунд с их SQL (0 - журнал выключен)
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '') == '1'
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 0))
+
+# Сколько строк за раз читается из серверного курсора при потоковой выгрузке
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# DATABASES уже собраны выше из DATABASE_URL: django_heroku заменил бы их своими (conn_max_age=600)
+# и сбросил бы настройки соединений
+django_heroku.settings(locals(), databases=False)